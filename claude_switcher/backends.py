@@ -0,0 +1,169 @@
+import argparse
+import importlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from claude_switcher.config import ConfigManager
+
+# 第三方服务后端通过该 entry point 组注册，例如:
+#   [project.entry-points."vibe_switcher.backends"]
+#   gemini = "vibe_switcher_gemini:GeminiBackend"
+ENTRY_POINT_GROUP = "vibe_switcher.backends"
+
+# 所有后端都支持的子命令；exec / tokens / pool 由后端在 actions 中声明
+BASE_ACTIONS = ("list", "switch", "add", "remove", "current")
+
+# 内置后端直接从这张表导入，不注册 entry point：执行内置命令时无需扫描已安装包的元数据，
+# 未安装包（直接运行 cli.py）时也可以使用
+BUILTIN_BACKENDS = {
+    "claude": "claude_switcher.shell:ShellConfigManager",
+    "codex": "claude_switcher.codex:CodexConfigManager",
+}
+
+
+class ServiceBackend(ABC):
+    """
+    服务后端接口
+
+    每个后端负责一种 AI 编程工具的配置文件。中转商配置、当前中转商、历史与事件日志
+    由 CLI 统一处理，后端只需说明配置保存在 config.json 的哪些字段，以及如何把
+    一个中转商渲染成需要写入的文件。
+
+    类属性:
+        service: 命令名称（如 gemini）
+        label: 显示名称
+        provider_section: config.json 中保存中转商的字段
+        current_key: config.json 中保存当前中转商的字段
+        credential_field: 中转商条目中的凭证字段（也是 add 子命令的参数名）
+        credential_label: 凭证的显示名称
+        config_label: 配置文件的显示名称（current 子命令使用）
+        actions: 支持的子命令；exec / tokens / pool 需要后端实现 exec_env，
+                 并在 credentials / pools 模块的字段表中登记
+        exec_description: exec 子命令的说明
+        switch_hint: 切换成功后输出的提示
+    """
+
+    service = ""
+    label = ""
+    provider_section = ""
+    current_key = ""
+    credential_field = "api_key"
+    credential_label = "凭证"
+    config_label = ""
+    actions = BASE_ACTIONS
+    exec_description = ""
+    switch_hint = ""
+
+    def __init__(self, home: Optional[Path] = None):
+        self.home = Path(home) if home else Path.home()
+
+    @classmethod
+    def add_arguments(cls, action: str, parser: argparse.ArgumentParser):
+        """为子命令添加后端特有的参数（如 claude switch 的 --all-shells），默认不添加"""
+
+    def configure(self, config_mgr: "ConfigManager", args: argparse.Namespace):
+        """执行命令前根据 config.json 与命令参数调整后端（同一实例会在 batch 模式中复用）"""
+
+    def provider_entry(self, existing: Dict, args: argparse.Namespace) -> Dict:
+        """根据 add 子命令的参数生成中转商条目，existing 为已有条目（新建时为空）"""
+        return dict(existing, **{self.credential_field: args.credential, "base_url": args.url})
+
+    def describe(self, provider: Dict) -> List[str]:
+        """list / add / current 中额外显示的中转商字段"""
+        return []
+
+    def config_files(self) -> List[Path]:
+        """current 子命令中显示的配置文件"""
+        return []
+
+    def exec_env(self, provider_name: str, provider: Dict, credential: str) -> Dict[str, str]:
+        """生成 exec 子命令注入子进程的环境变量（actions 包含 exec 时需要实现）"""
+        raise NotImplementedError
+
+    def request_settings(self, provider_name: str, provider: Dict) -> Dict[str, str]:
+        """
+        直接请求中转商接口时使用的设置（bench-provider 使用）
+
+        Returns:
+            {"base_url", "model", "wire_api"}
+        """
+        raise NotImplementedError
+
+    def after_switch(self, provider_name: str, provider: Dict, credential: str):
+        """切换成功并记录当前中转商后调用"""
+
+    def after_rollback(self, restored: List[str]):
+        """回滚恢复配置文件后调用"""
+
+    @abstractmethod
+    def render_targets(self, provider_name: str, provider: Dict, credential: str) -> Dict[Path, str]:
+        """
+        渲染切换到该中转商时需要写入的文件
+
+        Returns:
+            {文件路径: 文件内容}
+        """
+
+    @abstractmethod
+    def switch(self, provider_name: str, provider: Dict, credential: str) -> bool:
+        """写入配置文件，返回是否成功"""
+
+    @abstractmethod
+    def current(self) -> Optional[Dict]:
+        """
+        读取配置文件中实际生效的配置
+
+        Returns:
+            {"base_url", "credential", ...}，未配置时返回 None
+        """
+
+
+def _entry_points() -> Dict[str, object]:
+    """读取已安装包注册的后端 entry point（只读取元数据，不导入后端模块）"""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # Python 3.7 没有 importlib.metadata
+        return {}
+    try:
+        found = entry_points()
+        group = found.select(group=ENTRY_POINT_GROUP) if hasattr(found, "select") \
+            else found.get(ENTRY_POINT_GROUP, [])
+    except Exception:
+        return {}
+    return {entry.name: entry for entry in group}
+
+
+def discover_backends(include_plugins: bool = True) -> Dict[str, object]:
+    """
+    列出可用的后端
+
+    Returns:
+        {服务名称: "module:Class" 或 entry point 对象}，内置后端优先
+    """
+    backends: Dict[str, object] = dict(BUILTIN_BACKENDS)
+    if include_plugins:
+        for name, entry in _entry_points().items():
+            backends.setdefault(name, entry)
+    return backends
+
+
+def load_backend_class(name: str, backends: Optional[Dict[str, object]] = None):
+    """导入并返回后端类，只在真正使用该服务时调用"""
+    backends = backends if backends is not None else discover_backends(include_plugins=name not in BUILTIN_BACKENDS)
+    target = backends[name]
+    if isinstance(target, str):
+        module_name, _, attribute = target.partition(":")
+        cls = getattr(importlib.import_module(module_name), attribute)
+    else:
+        cls = target.load()
+    # 加载时就检查接口是否完整，而不是在切换过程中才失败
+    if not (isinstance(cls, type) and issubclass(cls, ServiceBackend)):
+        raise TypeError(f"后端 '{name}' 不是 ServiceBackend 的子类: {cls!r}")
+    if cls.__abstractmethods__:
+        missing = ", ".join(sorted(cls.__abstractmethods__))
+        raise TypeError(f"后端 '{name}' 未实现: {missing}")
+    return cls
+
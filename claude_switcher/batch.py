@@ -0,0 +1,126 @@
+import argparse
+import contextlib
+import io
+import json
+import shlex
+from typing import Dict, Iterable, List, Optional, TextIO
+
+
+class BatchRunner:
+    """在同一组内存中的管理器实例上批量执行命令，避免每条命令重复启动解释器和读写配置"""
+
+    def __init__(self, parser: argparse.ArgumentParser, managers: Dict, save_each: bool = False):
+        """
+        Args:
+            parser: CLI 的顶层参数解析器
+            managers: 注入到每条命令的管理器（config_mgr，以及按服务名称索引的后端实例 backends）
+            save_each: 是否在每条命令执行后立即写入 config.json
+        """
+        self.parser = parser
+        self.managers = managers
+        self.save_each = save_each
+
+    @staticmethod
+    def parse_line(line: str) -> Optional[List[str]]:
+        """
+        将一行输入解析为参数列表
+
+        支持三种格式:
+            claude switch fox                       # 普通命令行
+            ["claude", "switch", "fox"]             # JSON 数组
+            {"argv": ["claude", "switch", "fox"]}   # JSON 对象（也可用 "command" 字段传字符串）
+
+        Returns:
+            参数列表；空行和注释返回 None
+        """
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            return None
+
+        if stripped[0] in '[{':
+            request = json.loads(stripped)
+            if isinstance(request, list):
+                return [str(item) for item in request]
+            if 'argv' in request:
+                return [str(item) for item in request['argv']]
+            if 'command' in request:
+                return shlex.split(request['command'])
+            raise ValueError("JSON 请求需要包含 'argv' 或 'command' 字段")
+
+        argv = shlex.split(stripped)
+        # 允许带上程序名，便于直接复制已有脚本中的命令
+        if argv and argv[0] == 'vibe-switcher':
+            argv = argv[1:]
+        return argv
+
+    def run_command(self, argv: List[str]) -> Dict:
+        """执行单条命令，返回包含退出码和输出的结果"""
+        output = io.StringIO()
+        exit_code = 0
+        error = None
+
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                args = self.parser.parse_args(argv)
+                if getattr(args, 'service', None) == 'batch':
+                    raise ValueError("batch 命令不能嵌套执行")
+                if not hasattr(args, 'func'):
+                    raise ValueError("命令不完整，请指定具体操作")
+                for name, manager in self.managers.items():
+                    setattr(args, name, manager)
+                # exec 的子进程输出通过管道收集到结果中，不直接写入标准输出
+                args.capture_output = True
+                exit_code = args.func(args) or 0
+            except SystemExit as e:
+                # argparse 解析失败时会调用 sys.exit
+                exit_code = e.code if isinstance(e.code, int) else 2
+            except Exception as e:
+                exit_code = 1
+                error = str(e)
+
+        result = {
+            'argv': argv,
+            'exit_code': exit_code,
+            'output': output.getvalue().strip(),
+        }
+        if error:
+            result['error'] = error
+        return result
+
+    def run(self, lines: Iterable[str], out: TextIO, stop_on_error: bool = False) -> int:
+        """
+        逐行执行命令，每条命令输出一行 JSON 结果
+
+        Returns:
+            全部成功返回 0，否则返回 1
+        """
+        failed = False
+        config_mgr = self.managers.get('config_mgr')
+
+        try:
+            for lineno, line in enumerate(lines, 1):
+                try:
+                    argv = self.parse_line(line)
+                except ValueError as e:
+                    result = {'argv': None, 'exit_code': 2, 'output': '', 'error': f"无法解析: {e}"}
+                else:
+                    if argv is None:
+                        continue
+                    result = self.run_command(argv)
+                    if self.save_each and config_mgr is not None:
+                        config_mgr.flush()
+
+                result['line'] = lineno
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                out.flush()
+
+                if result['exit_code'] != 0:
+                    failed = True
+                    if stop_on_error:
+                        break
+        finally:
+            # 无论是否中途失败，都把已完成的修改一次性写回
+            if config_mgr is not None:
+                config_mgr.flush()
+
+        return 1 if failed else 0
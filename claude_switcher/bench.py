@@ -0,0 +1,319 @@
+import http.client
+import json
+import math
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# 报告中使用的分位数
+PERCENTILES = (50, 95, 99)
+
+DEFAULT_PROMPT = "Count from 1 to 50, separated by spaces."
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近秩法计算分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def error_class(status: Optional[int], exc: Optional[BaseException] = None) -> str:
+    """将失败归类，便于比较中转商的失败模式"""
+    if exc is not None:
+        if isinstance(exc, socket.timeout):
+            return "timeout"
+        if isinstance(exc, (ConnectionError, http.client.RemoteDisconnected, socket.gaierror)):
+            return "connection"
+        if isinstance(exc, http.client.IncompleteRead):
+            return "stream_incomplete"
+        return type(exc).__name__
+    if status == 429:
+        return "http_429"
+    if status is not None and status >= 500:
+        return "http_5xx"
+    return f"http_{status}"
+
+
+def build_request(service: str, base_url: str, credential: str, model: str, prompt: str,
+                  max_tokens: int, wire_api: str = "responses") -> Tuple[str, Dict, bytes]:
+    """
+    构造流式请求
+
+    Returns:
+        (url, headers, body)
+    """
+    base_url = base_url.rstrip('/')
+    headers = {"Content-Type": "application/json", "Accept": "text/event-stream", "User-Agent": "vibe-switcher"}
+    if service == "claude":
+        url = f"{base_url}/v1/messages"
+        headers.update({
+            "x-api-key": credential,
+            "Authorization": f"Bearer {credential}",
+            "anthropic-version": "2023-06-01",
+        })
+        payload = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+    elif wire_api == "chat":
+        url = f"{base_url}/chat/completions"
+        headers["Authorization"] = f"Bearer {credential}"
+        payload = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+    else:
+        url = f"{base_url}/responses"
+        headers["Authorization"] = f"Bearer {credential}"
+        payload = {
+            "model": model,
+            "max_output_tokens": max_tokens,
+            "stream": True,
+            "input": prompt,
+        }
+    return url, headers, json.dumps(payload).encode('utf-8')
+
+
+def parse_sse_event(data: str) -> Tuple[bool, Optional[int]]:
+    """
+    解析一条 SSE data
+
+    Returns:
+        (是否为输出文本的增量, 事件中携带的输出 token 总数)
+    """
+    if data == "[DONE]":
+        return False, None
+    try:
+        event = json.loads(data)
+    except ValueError:
+        return False, None
+    kind = event.get("type")
+    # Anthropic messages
+    if kind == "content_block_delta":
+        return True, None
+    if kind == "message_delta":
+        return False, (event.get("usage") or {}).get("output_tokens")
+    # OpenAI responses
+    if kind == "response.output_text.delta":
+        return True, None
+    if kind == "response.completed":
+        return False, ((event.get("response") or {}).get("usage") or {}).get("output_tokens")
+    # OpenAI chat completions
+    choices = event.get("choices") or []
+    if choices and (choices[0].get("delta") or {}).get("content"):
+        return True, (event.get("usage") or {}).get("completion_tokens")
+    return False, (event.get("usage") or {}).get("completion_tokens")
+
+
+class ConnectionPool:
+    """按 host 复用的 HTTP 连接池，连接数达到上限时等待空闲连接"""
+
+    def __init__(self, url: str, limit: int, timeout: float):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self._idle: "queue.Queue[Optional[http.client.HTTPConnection]]" = queue.Queue()
+        for _ in range(limit):
+            # None 表示尚未建立的连接名额
+            self._idle.put(None)
+
+    def acquire(self) -> http.client.HTTPConnection:
+        conn = self._idle.get()
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = cls(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def release(self, conn: http.client.HTTPConnection, reusable: bool):
+        if not reusable:
+            conn.close()
+            conn = None
+        self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if conn is not None:
+                conn.close()
+
+
+class StreamBenchmark:
+    """
+    对中转商发起并发流式请求并统计
+
+    - concurrency: 同时在途的请求数（工作线程数）
+    - connections: 连接上限，连接在请求之间复用；小于 concurrency 时多出的请求排队等待连接
+    - rate: 全局发起请求的速率上限（请求/秒），None 表示不限制
+    - 在 duration 秒后或完成 requests 个请求后停止（二者至少指定一个）
+    """
+
+    def __init__(self, url: str, headers: Dict, body: bytes, concurrency: int = 4,
+                 connections: Optional[int] = None, rate: Optional[float] = None,
+                 duration: Optional[float] = None, requests: Optional[int] = None, timeout: float = 60.0):
+        self.url = url
+        self.path = urlsplit(url).path or "/"
+        if urlsplit(url).query:
+            self.path += "?" + urlsplit(url).query
+        self.headers = headers
+        self.body = body
+        self.concurrency = concurrency
+        self.pool = ConnectionPool(url, connections or concurrency, timeout)
+        self.rate = rate
+        self.duration = duration
+        self.requests = requests
+        self._lock = threading.Lock()
+        self._issued = 0
+        self._next_start = 0.0
+        self._deadline = None
+
+    def _claim(self) -> bool:
+        """领取一个请求名额，并按速率上限等待到发起时间"""
+        with self._lock:
+            now = time.monotonic()
+            if self.requests is not None and self._issued >= self.requests:
+                return False
+            if self._deadline is not None and now >= self._deadline:
+                return False
+            self._issued += 1
+            start_at = now
+            if self.rate:
+                start_at = max(now, self._next_start)
+                self._next_start = start_at + 1.0 / self.rate
+        delay = start_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return self._deadline is None or time.monotonic() < self._deadline
+
+    def run_one(self) -> Dict:
+        """
+        发起一次流式请求
+
+        Returns:
+            {"ok", "status", "error", "ttft", "latency", "tokens"}
+        """
+        result = {"ok": False, "status": None, "error": None, "ttft": None, "latency": None, "tokens": 0}
+        conn = self.pool.acquire()
+        reusable = False
+        start = time.monotonic()
+        try:
+            conn.request("POST", self.path, body=self.body, headers=self.headers)
+            response = conn.getresponse()
+            result["status"] = response.status
+            if response.status != 200:
+                response.read()
+                reusable = not response.will_close
+                result["error"] = error_class(response.status)
+                return result
+
+            deltas = 0
+            reported = None
+            completed = False
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip().decode('utf-8', errors='replace')
+                if data == "[DONE]":
+                    completed = True
+                    continue
+                is_delta, tokens = parse_sse_event(data)
+                if is_delta:
+                    deltas += 1
+                    if result["ttft"] is None:
+                        result["ttft"] = time.monotonic() - start
+                if tokens is not None:
+                    reported = tokens
+                    completed = True
+            # 按行读到结尾后响应不一定被标记为结束，read() 完成收尾后连接才能复用
+            response.read()
+            reusable = not response.will_close
+
+            result["latency"] = time.monotonic() - start
+            result["tokens"] = reported if reported is not None else deltas
+            if not completed and not deltas:
+                result["error"] = "stream_incomplete"
+            else:
+                result["ok"] = True
+        except Exception as e:
+            result["error"] = error_class(result["status"], e)
+        finally:
+            self.pool.release(conn, reusable)
+        return result
+
+    def _worker(self) -> List[Dict]:
+        results = []
+        while self._claim():
+            results.append(self.run_one())
+        return results
+
+    def run(self) -> Dict:
+        """运行压测并返回汇总报告"""
+        start = time.monotonic()
+        if self.duration is not None:
+            self._deadline = start + self.duration
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = [executor.submit(self._worker) for _ in range(self.concurrency)]
+                results = [item for future in futures for item in future.result()]
+        finally:
+            self.pool.close()
+        return summarize(results, time.monotonic() - start)
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    """
+    汇总压测结果
+
+    Returns:
+        {"requests", "succeeded", "failed", "elapsed", "requests_per_sec", "tokens",
+         "tokens_per_sec", "stream_tokens_per_sec", "ttft", "latency", "errors"}
+        ttft / latency 为 {"p50", "p95", "p99", "mean"}
+    """
+    succeeded = [r for r in results if r["ok"]]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    def distribution(values: List[float]) -> Dict:
+        summary = {f"p{pct}": percentile(values, pct) for pct in PERCENTILES}
+        summary["mean"] = sum(values) / len(values) if values else None
+        return summary
+
+    # 单个流的生成速度：首个 token 之后的输出 token 数 / 生成耗时
+    stream_rates = [
+        r["tokens"] / (r["latency"] - r["ttft"])
+        for r in succeeded
+        if r["ttft"] is not None and r["latency"] > r["ttft"] and r["tokens"]
+    ]
+    total_tokens = sum(r["tokens"] for r in succeeded)
+
+    return {
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "elapsed": elapsed,
+        "requests_per_sec": len(results) / elapsed if elapsed > 0 else 0.0,
+        "tokens": total_tokens,
+        "tokens_per_sec": total_tokens / elapsed if elapsed > 0 else 0.0,
+        "stream_tokens_per_sec": distribution(stream_rates),
+        "ttft": distribution([r["ttft"] for r in succeeded if r["ttft"] is not None]),
+        "latency": distribution([r["latency"] for r in succeeded]),
+        "errors": errors,
+    }
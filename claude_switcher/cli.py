@@ -4,268 +4,1162 @@ Vibe Switcher - Claude Code 和 Codex API 中转商切换工具
 """
 
 import argparse
+import os
+import subprocess
 import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+from claude_switcher.backends import discover_backends, load_backend_class
 from claude_switcher.config import ConfigManager
-from claude_switcher.shell import ShellConfigManager
-from claude_switcher.codex import CodexConfigManager
+from claude_switcher.completion import subcommands
+from claude_switcher.credentials import CREDENTIAL_FAILURE_EXIT_CODES, CredentialRotator, credential_entries, credential_id
+from claude_switcher.events import EventLog
+from claude_switcher.history import HistoryManager
+from claude_switcher.liveenv import LiveEnv
+from claude_switcher.pools import POOL_PREFIX, STRATEGIES, PoolManager, parse_members
+from claude_switcher.state import StateFile
 
+if TYPE_CHECKING:
+    from claude_switcher.backends import ServiceBackend
 
-# ==================== Claude Code 命令 ====================
-def claude_list(args):
-    """列出所有 Claude Code 中转商"""
-    config_mgr = ConfigManager()
-    providers = config_mgr.get_providers()
-    current = config_mgr.get_current()
+
+def _config_mgr(args) -> ConfigManager:
+    """获取命令使用的 ConfigManager（batch 模式下复用同一个内存实例）"""
+    return getattr(args, 'config_mgr', None) or ConfigManager()
+
+
+def _backend(args, config_mgr: ConfigManager, service: Optional[str] = None) -> "ServiceBackend":
+    """
+    获取命令对应的服务后端（首次使用时才导入），并按本次命令的参数配置
+
+    batch / fleet 模式通过 args.backends 注入按服务名称索引的实例。
+    """
+    service = service or args.backend_service
+    backend = (getattr(args, 'backends', None) or {}).get(service) or load_backend_class(service)()
+    backend.configure(config_mgr, args)
+    return backend
+
+
+def _mask(value: str) -> str:
+    """凭证只显示首尾各 10 个字符"""
+    return value[:10] + "..." + value[-10:] if len(value) > 20 else value
+
+
+def _credentials(backend: "ServiceBackend", provider: Dict) -> List[str]:
+    """中转商配置的所有凭证（不支持多凭证的后端只有主凭证）"""
+    if "tokens" in backend.actions:
+        return [entry["value"] for entry in credential_entries(backend.service, provider)]
+    credential = provider.get(backend.credential_field)
+    return [credential] if credential else []
+
+
+def _pick_credential(config_mgr: ConfigManager, backend: "ServiceBackend", provider_name: str,
+                     provider: Dict) -> Optional[str]:
+    """选择本次使用的凭证，支持多凭证的后端按轮换方式选择"""
+    if "tokens" in backend.actions:
+        return CredentialRotator(config_mgr.config_dir).pick(backend.service, provider_name, provider)
+    return provider.get(backend.credential_field)
+
+
+def _from_pool(args, backend: "ServiceBackend") -> bool:
+    return "pool" in backend.actions and args.provider.startswith(POOL_PREFIX)
+
+
+def _resolve_provider(args, config_mgr: ConfigManager, backend: "ServiceBackend", out=None):
+    """
+    解析命令中的中转商名称，pool:<name> 形式会按池的策略选择一个成员
+
+    Returns:
+        实际使用的中转商名称；池不存在或策略无效时返回 None
+    """
+    out = out or sys.stdout
+    name = args.provider
+    if not _from_pool(args, backend):
+        return name
+
+    service = args.backend_service
+    pool_name = name[len(POOL_PREFIX):]
+    try:
+        member = PoolManager(config_mgr).pick(service, pool_name, getattr(args, 'strategy', None))
+    except KeyError:
+        print(f"错误: 未找到中转商池 '{pool_name}'", file=out)
+        print(f"\n请使用 'vibe-switcher {service} pool list' 查看可用的中转商池", file=out)
+        return None
+    except ValueError as e:
+        print(f"错误: {e}", file=out)
+        return None
+
+    print(f"从中转商池 {pool_name} 中选择: {member}", file=out)
+    return member
+
+
+def _record_pool_failure(args, config_mgr: ConfigManager, backend: "ServiceBackend", provider_name: str):
+    """通过中转商池选出的成员切换失败时，记录失败时间供 least-failures 策略使用"""
+    if _from_pool(args, backend):
+        PoolManager(config_mgr).record_failure(args.backend_service, provider_name)
+
+
+def _print_current_short(args, config_mgr: ConfigManager):
+    """
+    以单行形式输出当前中转商，供 PS1 / tmux 状态栏使用
+
+    名称直接从单行状态文件读取；只有格式中用到 {url} 时才读取 config.json。
+    """
+    service = args.backend_service
+    # 只用到后端的类属性，不需要创建实例
+    backend = load_backend_class(service)
+    fmt = args.format or "{name}"
+
+    # batch 模式下修改只保存在内存中，状态文件要到 flush 时才更新
+    state = StateFile(config_mgr.config_dir).read() if config_mgr.autosave else {}
+    if service in state:
+        name = state[service] or None
+    else:
+        name = config_mgr.get_backend_current(backend)
+
+    if not name:
+        return 1
+
+    url = ""
+    if "{url" in fmt:
+        provider = config_mgr.get_backend_providers(backend).get(name)
+        url = provider['base_url'] if provider else ""
+
+    try:
+        print(fmt.format(name=name, url=url, service=service))
+    except (KeyError, IndexError, ValueError) as e:
+        print(f"错误: 无效的输出格式 '{fmt}': {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+# ==================== 服务后端命令（Claude Code / Codex / 插件） ====================
+def backend_list(args):
+    """列出服务的所有中转商"""
+    config_mgr = _config_mgr(args)
+    backend = _backend(args, config_mgr)
+    providers = config_mgr.get_backend_providers(backend)
+    current = config_mgr.get_backend_current(backend)
+    label = backend.label or args.backend_service
 
     if not providers:
-        print("暂无配置的 Claude Code 中转商")
-        return
+        print(f"暂无配置的 {label} 中转商")
+        return 0
 
-    print("\n可用的 Claude Code 中转商:\n")
+    print(f"\n可用的 {label} 中转商:\n")
     for name, info in providers.items():
         marker = " ✓ (当前)" if name == current else ""
         print(f"  {name}{marker}")
-        print(f"    URL: {info['base_url']}")
-        if info['token']:
-            token_display = info['token'][:10] + "..." + info['token'][-10:] if len(info['token']) > 20 else info['token']
-            print(f"    Token: {token_display}")
-        else:
-            print(f"    Token: (未配置)")
+        print(f"    URL: {info.get('base_url', '')}")
+        for line in backend.describe(info):
+            print(f"    {line}")
+        credential = info.get(backend.credential_field)
+        print(f"    {backend.credential_label}: {_mask(credential) if credential else '(未配置)'}")
+        count = len(_credentials(backend, info))
+        if count > 1:
+            print(f"    轮换 {backend.credential_label}: {count} 个")
         print()
+    return 0
 
 
-def claude_switch(args):
-    """切换 Claude Code 中转商"""
-    config_mgr = ConfigManager()
-    shell_mgr = ShellConfigManager()
+def backend_switch(args):
+    """切换服务的中转商"""
+    config_mgr = _config_mgr(args)
+    backend = _backend(args, config_mgr)
+    service = args.backend_service
+    label = backend.label or service
 
-    provider_name = args.provider
-    provider = config_mgr.get_provider(provider_name)
+    provider_name = _resolve_provider(args, config_mgr, backend)
+    if provider_name is None:
+        return 1
+    previous = config_mgr.get_backend_current(backend)
+    event = EventLog(config_mgr.config_dir).start("switch", service, to=provider_name, **{"from": previous})
+    provider = config_mgr.get_backend_providers(backend).get(provider_name)
 
     if not provider:
-        print(f"错误: 未找到中转商 '{provider_name}'")
-        print("\n请使用 'vibe-switcher claude list' 查看可用的中转商")
+        print(f"错误: 未找到 {label} 中转商 '{provider_name}'")
+        print(f"\n请使用 'vibe-switcher {service} list' 查看可用的中转商")
+        event.finish(False, "provider_not_found")
+        _record_pool_failure(args, config_mgr, backend, provider_name)
+        return 1
+
+    credential = _pick_credential(config_mgr, backend, provider_name, provider)
+    if not credential:
+        print(f"错误: {label} 中转商 '{provider_name}' 的 {backend.credential_label} 未配置")
+        print(f"\n请使用以下命令配置 {backend.credential_label}:")
+        print(f"  vibe-switcher {service} add {provider_name} <{backend.credential_field}> {provider.get('base_url', '<url>')}")
+        event.finish(False, f"{backend.credential_field}_missing")
+        _record_pool_failure(args, config_mgr, backend, provider_name)
+        return 1
+    event.stage("load")
+
+    # 记录切换前的文件内容，供 rollback 使用
+    history = HistoryManager(config_mgr.config_dir)
+    try:
+        snapshots = history.snapshot_files(list(backend.render_targets(provider_name, provider, credential)))
+    except Exception as e:
+        print(f"错误: 渲染配置失败: {e}")
+        event.finish(False, "render_failed")
+        _record_pool_failure(args, config_mgr, backend, provider_name)
+        return 1
+    event.stage("snapshot")
+
+    try:
+        success = backend.switch(provider_name, provider, credential)
+    except Exception as e:
+        print(f"错误: 写入配置失败: {e}")
+        success = False
+    event.stage("write")
+    if not success:
+        # 多目标写入或 Codex 的两个文件可能只写入了一部分，同样记录快照以便回滚
+        history.record(service, previous, provider_name, snapshots, failed=True)
+        print("\n部分配置文件可能已被修改，可使用 'vibe-switcher rollback' 恢复到切换之前的状态")
+        event.finish(False, "write_failed")
+        _record_pool_failure(args, config_mgr, backend, provider_name)
         return 1
 
-    if not provider['token']:
-        print(f"错误: 中转商 '{provider_name}' 的 Token 未配置")
-        print(f"\n请使用以下命令配置 Token:")
-        print(f"  vibe-switcher claude add {provider_name} <your-token> {provider['base_url']}")
+    config_mgr.set_backend_current(backend, provider_name)
+    history.record(service, previous, provider_name, snapshots)
+    backend.after_switch(provider_name, provider, credential)
+    event.stage("commit")
+    event.finish(True)
+    print(f"\n✓ 已切换到 {label} 中转商: {provider_name}")
+    if backend.switch_hint:
+        print(f"  {backend.switch_hint}")
+    return 0
+
+
+def _run_child(command, env, capture: bool = False) -> int:
+    """
+    在指定环境变量下运行子命令，返回其退出码
+
+    Args:
+        capture: 为 True 时（batch 模式）通过管道收集子进程输出并打印，而不是让子进程直接写入
+                 标准输出，避免混入 batch 的 JSON 结果流；子进程的标准输入也不再继承 batch 的命令输入
+    """
+    if command and command[0] == '--':
+        command = command[1:]
+    if not command:
+        print("错误: 请在 -- 之后指定要执行的命令", file=sys.stderr)
+        return 2
+    try:
+        if capture:
+            completed = subprocess.run(command, env=env, stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            print(completed.stdout.decode('utf-8', errors='replace'), end='')
+            return completed.returncode
+        return subprocess.call(command, env=env)
+    except FileNotFoundError:
+        print(f"错误: 未找到命令 '{command[0]}'", file=sys.stderr)
+        return 127
+    except KeyboardInterrupt:
+        return 130
+
+
+def _record_exec_result(config_mgr: ConfigManager, backend: "ServiceBackend", provider_name: str, provider: Dict,
+                        credential: str, exit_code: int):
+    """
+    根据子进程退出码更新凭证状态：成功时清除失败计数，认证或限流失败时置入冷却期
+
+    只有一个凭证时没有可轮换的对象，不记录冷却。
+    """
+    if len(_credentials(backend, provider)) < 2:
+        return
+    service = backend.service
+    rotator = CredentialRotator(config_mgr.config_dir)
+    if exit_code == 0:
+        rotator.record_success(service, provider_name, credential)
+    elif exit_code in CREDENTIAL_FAILURE_EXIT_CODES:
+        cooldown = rotator.record_failure(service, provider_name, credential_id(credential))
+        print(f"凭证失败（退出码 {exit_code}），冷却 {cooldown:.0f} 秒", file=sys.stderr)
+
+
+def backend_exec(args):
+    """使用指定中转商运行命令，配置只通过子进程的环境变量传递，不修改配置文件"""
+    config_mgr = _config_mgr(args)
+    backend = _backend(args, config_mgr)
+    label = backend.label or args.backend_service
+
+    provider_name = _resolve_provider(args, config_mgr, backend, out=sys.stderr)
+    if provider_name is None:
         return 1
+    provider = config_mgr.get_backend_providers(backend).get(provider_name)
 
-    success = shell_mgr.update_config(provider['token'], provider['base_url'])
+    if not provider:
+        print(f"错误: 未找到 {label} 中转商 '{provider_name}'", file=sys.stderr)
+        return 1
 
-    if success:
-        config_mgr.set_current(provider_name)
-        print(f"\n✓ 已切换到 Claude Code 中转商: {provider_name}")
-        return 0
-    else:
+    credential = _pick_credential(config_mgr, backend, provider_name, provider)
+    if not credential:
+        print(f"错误: {label} 中转商 '{provider_name}' 的 {backend.credential_label} 未配置", file=sys.stderr)
         return 1
 
+    env = os.environ.copy()
+    try:
+        env.update(backend.exec_env(provider_name, provider, credential))
+    except OSError as e:
+        print(f"错误: 生成运行环境时出错: {e}", file=sys.stderr)
+        return 1
 
-def claude_add(args):
-    """添加或更新 Claude Code 中转商配置"""
-    config_mgr = ConfigManager()
+    exit_code = _run_child(args.command, env, capture=getattr(args, 'capture_output', False))
+    _record_exec_result(config_mgr, backend, provider_name, provider, credential, exit_code)
+    return exit_code
 
-    name = args.name
-    token = args.token
-    url = args.url
 
-    config_mgr.add_provider(name, token, url)
-    print(f"✓ 已添加/更新 Claude Code 中转商: {name}")
-    print(f"  URL: {url}")
-    print(f"  Token: {token[:10]}...{token[-10:] if len(token) > 20 else token}")
+def backend_add(args):
+    """添加或更新服务的中转商"""
+    config_mgr = _config_mgr(args)
+    backend = _backend(args, config_mgr)
+    label = backend.label or args.backend_service
 
+    existing = config_mgr.get_backend_providers(backend).get(args.name, {})
+    entry = backend.provider_entry(dict(existing), args)
+    config_mgr.add_backend_provider(backend, args.name, entry)
+    print(f"✓ 已添加/更新 {label} 中转商: {args.name}")
+    print(f"  URL: {args.url}")
+    print(f"  {backend.credential_label}: {_mask(args.credential)}")
+    for line in backend.describe(entry):
+        print(f"  {line}")
+    return 0
 
-def claude_remove(args):
-    """删除 Claude Code 中转商配置"""
-    config_mgr = ConfigManager()
 
-    name = args.name
+def backend_remove(args):
+    """删除服务的中转商"""
+    config_mgr = _config_mgr(args)
+    backend = _backend(args, config_mgr)
+    label = backend.label or args.backend_service
 
-    if config_mgr.remove_provider(name):
-        print(f"✓ 已删除 Claude Code 中转商: {name}")
+    if config_mgr.remove_backend_provider(backend, args.name):
+        print(f"✓ 已删除 {label} 中转商: {args.name}")
         return 0
-    else:
-        print(f"错误: 未找到中转商 '{name}'")
-        return 1
-
+    print(f"错误: 未找到 {label} 中转商 '{args.name}'")
+    return 1
 
-def claude_current(args):
-    """显示当前 Claude Code 配置"""
-    config_mgr = ConfigManager()
-    shell_mgr = ShellConfigManager()
 
-    current_name = config_mgr.get_current()
-    current_provider = config_mgr.get_current_provider()
+def backend_current(args):
+    """显示服务的当前配置"""
+    config_mgr = _config_mgr(args)
+    if getattr(args, 'short', False) or getattr(args, 'format', None):
+        return _print_current_short(args, config_mgr)
 
-    print("\n当前 Claude Code 配置:\n")
+    backend = _backend(args, config_mgr)
+    service = args.backend_service
+    label = backend.label or service
+    config_label = backend.config_label or f"{label} 配置"
+    current_name = config_mgr.get_backend_current(backend)
+    current_provider = config_mgr.get_backend_providers(backend).get(current_name) if current_name else None
 
-    if current_name and current_provider:
+    print(f"\n当前 {label} 配置:\n")
+    if current_provider:
         print(f"  中转商: {current_name}")
-        print(f"  URL: {current_provider['base_url']}")
-        if current_provider['token']:
-            token_display = current_provider['token'][:10] + "..." + current_provider['token'][-10:] \
-                if len(current_provider['token']) > 20 else current_provider['token']
-            print(f"  Token: {token_display}")
+        print(f"  URL: {current_provider.get('base_url', '')}")
+        for line in backend.describe(current_provider):
+            print(f"  {line}")
+        credential = current_provider.get(backend.credential_field)
+        if credential:
+            print(f"  {backend.credential_label}: {_mask(credential)}")
     else:
         print("  (未设置)")
 
-    print("\nShell 配置文件中的值:\n")
-    shell_config = shell_mgr.show_current_config()
-    if shell_config:
-        token, base_url = shell_config
-        token_display = token[:10] + "..." + token[-10:] if len(token) > 20 else token
-        print(f"  ANTHROPIC_AUTH_TOKEN: {token_display}")
-        print(f"  ANTHROPIC_BASE_URL: {base_url}")
-
-        if current_provider:
-            if token != current_provider['token'] or base_url != current_provider['base_url']:
-                print("\n⚠️  警告: Shell 配置与当前中转商不一致")
-                print("   请运行 'vibe-switcher claude switch <provider>' 来更新配置")
+    print(f"\n{config_label}文件中的值:\n")
+    actual = backend.current()
+    if actual:
+        if actual.get('provider'):
+            print(f"  Provider: {actual['provider']}")
+        print(f"  Base URL: {actual.get('base_url')}")
+        if actual.get('credential'):
+            print(f"  {backend.credential_label}: {_mask(actual['credential'])}")
+        if current_provider and (actual.get('credential') not in _credentials(backend, current_provider) or
+                                 actual.get('base_url') != current_provider.get('base_url')):
+            print(f"\n⚠️  警告: {config_label}与当前中转商不一致")
+            print(f"   请运行 'vibe-switcher {service} switch <provider>' 来更新配置")
     else:
         print("  (未配置)")
 
-    config_file = shell_mgr.detect_shell_config()
-    if config_file:
-        print(f"\n配置文件: {config_file}")
+    config_files = backend.config_files()
+    if config_files:
+        print("\n配置文件:")
+        for path in config_files:
+            print(f"  {path}")
+    return 0
 
 
-# ==================== Codex 命令 ====================
-def codex_list(args):
-    """列出所有 Codex 中转商"""
-    config_mgr = ConfigManager()
-    providers = config_mgr.get_codex_providers()
-    current = config_mgr.get_current_codex()
+def _add_backend_parsers(subparsers, service: str, backend_cls=None):
+    """
+    为服务后端注册子命令
 
-    if not providers:
-        print("暂无配置的 Codex 中转商")
+    Args:
+        backend_cls: 后端类，子命令与特有参数由它声明；为 None 时只注册服务名称，
+                     本次调用不涉及该服务，无需导入后端模块
+    """
+    if backend_cls is None:
+        subparsers.add_parser(service, help=f'{service} 相关操作')
         return
 
-    print("\n可用的 Codex 中转商:\n")
-    for name, info in providers.items():
-        marker = " ✓ (当前)" if name == current else ""
-        print(f"  {name}{marker}")
-        print(f"    URL: {info['base_url']}")
-        if info.get('network_access'):
-            print(f"    Network Access: {info['network_access']}")
-        if info['api_key']:
-            key_display = info['api_key'][:10] + "..." + info['api_key'][-10:] if len(info['api_key']) > 20 else info['api_key']
-            print(f"    API Key: {key_display}")
-        else:
-            print(f"    API Key: (未配置)")
-        print()
+    label = backend_cls.label or service
+    actions = backend_cls.actions
+    provider_help = '中转商名称，或 pool:<name>' if 'pool' in actions else '中转商名称'
+
+    service_parser = subparsers.add_parser(service, help=f'{label} 相关操作')
+    service_parser.set_defaults(service_parser=service_parser, backend_service=service)
+    service_subparsers = service_parser.add_subparsers(dest='action', help='操作类型')
+    parsers = {}
+
+    parsers['list'] = service_subparsers.add_parser(
+        'list',
+        help=f'列出所有 {label} 中转商',
+        description=f'列出所有已配置的 {label} 中转商，并显示当前正在使用的中转商'
+    )
+    parsers['list'].set_defaults(func=backend_list)
+
+    parsers['switch'] = service_subparsers.add_parser(
+        'switch',
+        help=f'切换 {label} 中转商: switch <provider>',
+        description=f'切换到指定的 {label} 中转商'
+    )
+    parsers['switch'].add_argument('provider', metavar='<provider>', help=f'要切换到的{provider_help}')
+    parsers['switch'].set_defaults(func=backend_switch)
+
+    if 'exec' in actions:
+        parsers['exec'] = service_subparsers.add_parser(
+            'exec',
+            help='使用指定中转商运行命令: exec <provider> -- <cmd...>',
+            description=backend_cls.exec_description,
+            usage=f'vibe-switcher {service} exec <provider> -- <cmd...>'
+        )
+        parsers['exec'].add_argument('provider', metavar='<provider>', help=f'使用的{provider_help}')
+        parsers['exec'].add_argument('command', nargs=argparse.REMAINDER, metavar='<cmd...>', help='要运行的命令')
+        parsers['exec'].set_defaults(func=backend_exec)
+
+    if 'pool' in actions:
+        for action in ('switch', 'exec'):
+            if action in parsers:
+                parsers[action].add_argument('--strategy', choices=STRATEGIES,
+                                             help='从中转商池选择时使用的策略（默认使用池的设置）')
+
+    field = backend_cls.credential_field
+    parsers['add'] = service_subparsers.add_parser(
+        'add',
+        help=f'添加或更新 {label} 中转商: add <name> <{field}> <url>',
+        description=f'添加新的 {label} 中转商配置，或更新已存在的中转商配置'
+    )
+    parsers['add'].add_argument('name', metavar='<name>', help='中转商名称（标识符）')
+    parsers['add'].add_argument('credential', metavar=f'<{field}>', help=f'{backend_cls.credential_label}（用于认证）')
+    parsers['add'].add_argument('url', metavar='<url>', help='API Base URL（中转商的接口地址）')
+    parsers['add'].set_defaults(func=backend_add)
+
+    parsers['remove'] = service_subparsers.add_parser(
+        'remove',
+        help=f'删除 {label} 中转商: remove <name>',
+        description=f'从配置中删除指定的 {label} 中转商'
+    )
+    parsers['remove'].add_argument('name', metavar='<name>', help='要删除的中转商名称')
+    parsers['remove'].set_defaults(func=backend_remove)
+
+    parsers['current'] = service_subparsers.add_parser(
+        'current',
+        help=f'显示当前 {label} 配置',
+        description=f'显示当前正在使用的 {label} 中转商配置，包括配置文件中的实际值'
+    )
+    parsers['current'].add_argument('--short', action='store_true', help='只输出当前中转商名称（读取单行状态文件，适合提示符）')
+    parsers['current'].add_argument('--format', metavar='<fmt>', help='自定义单行输出格式，可用字段: {name} {url} {service}')
+    parsers['current'].set_defaults(func=backend_current)
+
+    if 'tokens' in actions:
+        parsers['tokens'] = _add_credential_parser(service_subparsers, service, label)
+    if 'pool' in actions:
+        parsers['pool'] = _add_pool_parsers(service_subparsers, service, label)
 
+    # 后端特有的参数（如 claude switch --all-shells、codex add --network-access）
+    for action, action_parser in parsers.items():
+        backend_cls.add_arguments(action, action_parser)
 
-def codex_switch(args):
-    """切换 Codex 中转商"""
-    config_mgr = ConfigManager()
-    codex_mgr = CodexConfigManager()
 
-    provider_name = args.provider
-    provider = config_mgr.get_codex_provider(provider_name)
+# ==================== 多凭证轮换 ====================
+def credentials_show(args):
+    """查看或设置中转商的多个凭证及冷却状态"""
+    config_mgr = _config_mgr(args)
+    service = args.backend_service
+    provider = config_mgr.get_backend_providers(_backend(args, config_mgr)).get(args.provider)
 
     if not provider:
-        print(f"错误: 未找到 Codex 中转商 '{provider_name}'")
-        print("\n请使用 'vibe-switcher codex list' 查看可用的中转商")
+        print(f"错误: 未找到中转商 '{args.provider}'")
+        return 1
+
+    rotator = CredentialRotator(config_mgr.config_dir)
+    if args.set:
+        config_mgr.set_credentials(service, args.provider, args.set)
+        print(f"✓ 已为 {args.provider} 设置 {len(args.set)} 个凭证")
+        return 0
+    if args.fail:
+        cooldown = rotator.record_failure(service, args.provider)
+        if not cooldown:
+            print(f"错误: {args.provider} 还没有通过轮换选出过凭证")
+            return 1
+        print(f"✓ 最近使用的凭证已进入冷却，{cooldown:.0f} 秒内不会被选中")
+        return 0
+
+    statuses = rotator.status(service, args.provider, provider)
+    if not statuses:
+        print("  (未配置)")
+        return 0
+    print(f"\n{args.provider} 的凭证（轮换方式: {provider.get('rotation', 'round-robin')}）:\n")
+    for index, status in enumerate(statuses, 1):
+        marker = " ← 最近使用" if status["last"] else ""
+        print(f"  {index}. {_mask(status['value'])}{marker}")
+        details = []
+        if status["quota"] is not None:
+            details.append(f"剩余额度 {status['quota']}")
+        if status["failures"]:
+            details.append(f"连续失败 {status['failures']} 次")
+        if status["cooldown"]:
+            details.append(f"冷却剩余 {status['cooldown']:.0f} 秒")
+        if details:
+            print(f"     {', '.join(details)}")
+    return 0
+
+
+def _add_credential_parser(service_subparsers, service: str, label: str):
+    """为服务添加 tokens 子命令"""
+    credential_parser = service_subparsers.add_parser(
+        'tokens',
+        help=f'管理 {label} 中转商的多个凭证: tokens <provider> [--set <value...>] [--fail]',
+        description='中转商配置多个凭证时，switch / exec 会依次轮换（rotation 为 quota 时优先使用剩余额度最多的凭证），'
+                    '失败的凭证进入冷却期，连续失败时冷却时间指数增长',
+        usage=f'vibe-switcher {service} tokens <provider> [--set <value...>] [--fail]'
+    )
+    credential_parser.add_argument('provider', metavar='<provider>', help='中转商名称')
+    credential_parser.add_argument('--set', nargs='+', metavar='<value>', help='设置凭证列表（第一个同时作为主凭证）')
+    credential_parser.add_argument('--fail', action='store_true', help='将最近使用的凭证置入冷却期（如遇到 429）')
+    credential_parser.set_defaults(func=credentials_show)
+    return credential_parser
+
+
+# ==================== 中转商池 ====================
+def pool_list(args):
+    """列出中转商池"""
+    config_mgr = _config_mgr(args)
+    pools = config_mgr.get_pools(args.backend_service)
+
+    if not pools:
+        print("暂无中转商池")
+        return 0
+
+    print("\n中转商池列表:")
+    print("-" * 60)
+    for name, pool in pools.items():
+        members = ", ".join(f"{member}:{weight}" for member, weight in pool.get("members", {}).items())
+        print(f"  {POOL_PREFIX}{name}")
+        print(f"    成员: {members}")
+        print(f"    策略: {pool.get('strategy', 'weighted')}")
+        print()
+    return 0
+
+
+def pool_add(args):
+    """添加或更新中转商池"""
+    config_mgr = _config_mgr(args)
+    try:
+        members = parse_members(args.members)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return 1
+
+    known = config_mgr.get_backend_providers(_backend(args, config_mgr))
+    missing = [member for member in members if member not in known]
+    if missing:
+        print(f"错误: 未找到中转商 {', '.join(missing)}")
+        return 1
+
+    config_mgr.set_pool(args.backend_service, args.name, members, args.strategy)
+    print(f"✓ 已保存中转商池: {POOL_PREFIX}{args.name}")
+    return 0
+
+
+def pool_remove(args):
+    """删除中转商池"""
+    config_mgr = _config_mgr(args)
+    if config_mgr.remove_pool(args.backend_service, args.name):
+        print(f"✓ 已删除中转商池: {POOL_PREFIX}{args.name}")
+        return 0
+    print(f"错误: 未找到中转商池 '{args.name}'")
+    return 1
+
+
+def _add_pool_parsers(service_subparsers, service: str, label: str):
+    """为服务添加 pool list/add/remove 子命令"""
+    pool_parser = service_subparsers.add_parser(
+        'pool',
+        help=f'管理 {label} 中转商池: pool list|add|remove',
+        description=f'管理 {label} 中转商池，switch / exec 中可以使用 {POOL_PREFIX}<name> 按策略选择成员'
+    )
+    pool_parser.set_defaults(service_parser=pool_parser)
+    pool_subparsers = pool_parser.add_subparsers(dest='pool_action', help='操作类型')
+
+    pool_list_parser = pool_subparsers.add_parser('list', help='列出中转商池')
+    pool_list_parser.set_defaults(func=pool_list)
+
+    pool_add_parser = pool_subparsers.add_parser(
+        'add',
+        help='添加或更新中转商池: add <name> <member[:weight]...>',
+        usage=f'vibe-switcher {service} pool add <name> <member[:weight]...> [--strategy <strategy>]'
+    )
+    pool_add_parser.add_argument('name', metavar='<name>', help='中转商池名称')
+    pool_add_parser.add_argument('members', nargs='+', metavar='<member[:weight]>', help='成员及权重，如 duck:3 fox:1')
+    pool_add_parser.add_argument('--strategy', choices=STRATEGIES, default='weighted', help='默认选择策略（默认 weighted）')
+    pool_add_parser.set_defaults(func=pool_add)
+
+    pool_remove_parser = pool_subparsers.add_parser('remove', help='删除中转商池: remove <name>')
+    pool_remove_parser.add_argument('name', metavar='<name>', help='要删除的中转商池名称')
+    pool_remove_parser.set_defaults(func=pool_remove)
+    return pool_parser
+
+
+# ==================== 历史与回滚 ====================
+def history_list(args):
+    """列出最近的切换历史"""
+    config_mgr = _config_mgr(args)
+    history = HistoryManager(config_mgr.config_dir)
+
+    total = history.count()
+    if total == 0:
+        print("暂无切换历史")
+        return 0
+
+    print(f"\n切换历史（共 {total} 条，显示最近 {min(args.limit, total)} 条）:\n")
+    for n, entry in history.recent(args.limit):
+        action = " (回滚)" if entry["action"] == "rollback" else ""
+        if entry.get("failed"):
+            action += " (失败)"
+        before = entry["from"] or "(未设置)"
+        after = entry["to"] or "(未设置)"
+        print(f"  [{n}] {entry['ts']}  {entry['service']}  {before} -> {after}{action}")
+        for path in entry["files"]:
+            print(f"        {path}")
+    print("\n使用 'vibe-switcher rollback <N>' 撤销第 N 次切换")
+    return 0
+
+
+def history_rollback(args):
+    """回滚到指定切换之前的状态"""
+    config_mgr = _config_mgr(args)
+    history = HistoryManager(config_mgr.config_dir)
+
+    entry = history.resolve(args.target)
+    if entry is None:
+        print(f"错误: 未找到对应的切换记录: {args.target or '(最近一次)'}")
+        print("\n请使用 'vibe-switcher history' 查看切换历史")
         return 1
 
-    if not provider['api_key']:
-        print(f"错误: Codex 中转商 '{provider_name}' 的 API Key 未配置")
-        print(f"\n请使用以下命令配置 API Key:")
-        print(f"  vibe-switcher codex add {provider_name} <your-api-key> {provider['base_url']}")
-        if provider.get('network_access'):
-            print(f"  # network_access: {provider['network_access']}")
+    service = entry["service"]
+    files = [Path(path) for path in entry["files"]]
+
+    try:
+        # 回滚本身也记录为一次切换，便于再次撤销
+        snapshots = history.snapshot_files(files)
+        restored = history.restore_files(entry)
+    except Exception as e:
+        print(f"恢复文件时出错: {e}")
+        EventLog(config_mgr.config_dir).record(
+            "rollback", service, to=entry["from"], success=False, error=str(e)
+        )
         return 1
 
-    success = codex_mgr.update_codex_config(provider_name, provider, provider['api_key'])
+    for path in restored:
+        print(f"已恢复: {path}")
+
+    backend = _backend(args, config_mgr, service)
+    current = config_mgr.get_backend_current(backend)
+    updated = config_mgr.set_backend_current(backend, entry["from"])
+    if not updated:
+        print(f"⚠️  警告: 中转商 '{entry['from']}' 已不存在，未更新当前中转商记录")
+
+    history.record(service, current, entry["from"], snapshots, action="rollback")
+    EventLog(config_mgr.config_dir).record(
+        "rollback", service, to=entry["from"], success=True, **{"from": current}
+    )
+    print(f"\n✓ 已回滚 {service} 到 {entry['ts']} 切换之前的状态: {entry['from'] or '(未设置)'}")
+    backend.after_rollback(restored)
+    return 0
+
+
+# ==================== 健康检查 ====================
+def watch_run(args):
+    """后台健康检查，异常时自动切换中转商"""
+    from claude_switcher.watch import Watchdog
+
+    config_mgr = _config_mgr(args)
+    services = ["claude", "codex"] if args.services == "all" else [args.services]
+    backends = dict(getattr(args, 'backends', None) or {})
+    for service in services:
+        if service not in backends:
+            backends[service] = load_backend_class(service)()
+
+    def make_switcher(service):
+        def switch(provider_name):
+            # 被自动切换走的中转商记为一次失败，供中转商池的 least-failures 策略使用
+            previous = config_mgr.get_backend_current(backends[service])
+            if previous:
+                PoolManager(config_mgr).record_failure(service, previous)
+            return backend_switch(argparse.Namespace(
+                provider=provider_name,
+                backend_service=service,
+                config_mgr=config_mgr,
+                backends=backends,
+            ))
+        return switch
+
+    watchdog = Watchdog(
+        config_mgr,
+        {service: make_switcher(service) for service in services},
+        events=EventLog(config_mgr.config_dir),
+        interval=args.interval,
+        jitter=args.jitter,
+        samples=args.samples,
+        error_rate=args.error_rate,
+        latency=args.latency,
+        windows=args.windows,
+        cooldown=args.cooldown,
+        margin=args.margin,
+        timeout=args.timeout,
+    )
+
+    metrics_server = _start_metrics_server(args, config_mgr)
+    print(f"开始健康检查: {', '.join(services)}，间隔 {args.interval:g} 秒（Ctrl+C 退出）")
+    try:
+        watchdog.run(iterations=1 if args.once else None)
+    except KeyboardInterrupt:
+        print("\n已停止健康检查")
+    finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+    return 0
+
+
+# ==================== 使用统计 ====================
+def _format_duration(seconds: float) -> str:
+    """将秒数格式化为易读的时长"""
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d{hours}h"
+    if hours:
+        return f"{hours}h{minutes}m"
+    if minutes:
+        return f"{minutes}m{seconds}s"
+    return f"{seconds}s"
+
+
+def stats_show(args):
+    """汇总事件日志"""
+    import json
+    from claude_switcher.events import aggregate
+
+    config_mgr = _config_mgr(args)
+    stats = aggregate(EventLog(config_mgr.config_dir).iter_events(), service=args.services)
+
+    if args.json:
+        print(json.dumps(stats, indent=2, ensure_ascii=False))
+        return 0
 
-    if success:
-        config_mgr.set_current_codex(provider_name)
-        print(f"\n✓ 已切换到 Codex 中转商: {provider_name}")
+    if not stats:
+        print("暂无事件记录")
         return 0
+
+    print("\n中转商使用统计:\n")
+    for key in sorted(stats):
+        item = stats[key]
+        latency = item["median_switch_latency"]
+        print(f"  {key}")
+        print(f"    切换次数: {item['switches']}")
+        print(f"    使用时长: {_format_duration(item['time_in_use'])}")
+        print(f"    失败率: {item['failure_rate']:.1%} ({item['failures']}/{item['events']})")
+        if latency is not None:
+            print(f"    切换耗时中位数: {latency * 1000:.1f}ms")
+        print()
+    return 0
+
+
+# ==================== 指标导出 ====================
+def metrics_show(args):
+    """输出指标（Prometheus 文本格式），并更新指标文件"""
+    from claude_switcher.metrics import MetricsStore, render
+
+    config_mgr = _config_mgr(args)
+    store = MetricsStore(config_mgr.config_dir)
+    if args.rebuild:
+        state = store.rebuild(EventLog(config_mgr.config_dir).iter_events())
     else:
+        state = store.load()
+        store.write_textfile(state)
+    print(render(store.families(state)), end="")
+    print(f"# 指标文件: {store.textfile}", file=sys.stderr)
+    return 0
+
+
+def _start_metrics_server(args, config_mgr: ConfigManager, extra=None):
+    """按 --metrics-port 启动 /metrics 服务，未指定时返回 None"""
+    if args.metrics_port is None:
+        return None
+    from claude_switcher.metrics import MetricsStore
+    from claude_switcher.metrics_server import MetricsServer
+
+    try:
+        server = MetricsServer(args.metrics_host, args.metrics_port, MetricsStore(config_mgr.config_dir), extra)
+    except OSError as e:
+        print(f"⚠️  警告: 无法在 {args.metrics_host}:{args.metrics_port} 提供指标: {e}")
+        return None
+    host, port = server.server_address[:2]
+    print(f"指标: http://{host}:{port}/metrics")
+    return server.start()
+
+
+def _add_metrics_arguments(parser: argparse.ArgumentParser):
+    """为长时间运行的模式添加 --metrics-port"""
+    parser.add_argument('--metrics-port', type=int, metavar='<port>', help='在该端口提供 OpenMetrics /metrics（默认不启动）')
+    parser.add_argument('--metrics-host', default='127.0.0.1', metavar='<host>', help='指标服务监听地址（默认 127.0.0.1）')
+
+
+# ==================== 流式压测 ====================
+def _format_seconds(value) -> str:
+    return f"{value * 1000:.0f}ms" if value is not None else "-"
+
+
+def bench_provider(args):
+    """对中转商进行并发流式压测"""
+    import json
+    from claude_switcher.bench import DEFAULT_PROMPT, PERCENTILES, StreamBenchmark, build_request
+
+    config_mgr = _config_mgr(args)
+    service = args.bench_service
+    backend = _backend(args, config_mgr, service)
+    provider = config_mgr.get_backend_providers(backend).get(args.provider)
+    if not provider:
+        print(f"错误: 未找到中转商 '{args.provider}'")
+        return 1
+
+    credential = _pick_credential(config_mgr, backend, args.provider, provider)
+    if not credential:
+        print(f"错误: 中转商 '{args.provider}' 的凭证未配置")
+        return 1
+
+    if args.duration is None and args.requests is None:
+        args.requests = args.concurrency * 10
+
+    settings = backend.request_settings(args.provider, provider)
+    model = args.model or settings["model"]
+    wire_api = settings["wire_api"]
+
+    url, headers, body = build_request(
+        service, settings["base_url"], credential, model, args.prompt or DEFAULT_PROMPT, args.max_tokens, wire_api
+    )
+    benchmark = StreamBenchmark(
+        url, headers, body,
+        concurrency=args.concurrency,
+        connections=args.connections,
+        rate=args.rate,
+        duration=args.duration,
+        requests=args.requests,
+        timeout=args.timeout,
+    )
+
+    if not args.json:
+        limit = f"{args.duration:g} 秒" if args.duration is not None else f"{args.requests} 个请求"
+        print(f"压测 {service}/{args.provider} ({wire_api}, {model}): 并发 {args.concurrency}，{limit}")
+        print(f"  {url}")
+    report = benchmark.run()
+
+    if args.json:
+        print(json.dumps(dict(report, service=service, provider=args.provider, url=url), indent=2, ensure_ascii=False))
+        return 0 if report["succeeded"] else 1
+
+    print(f"\n请求: {report['requests']}，成功 {report['succeeded']}，失败 {report['failed']}，"
+          f"耗时 {report['elapsed']:.1f} 秒 ({report['requests_per_sec']:.2f} 请求/秒)")
+    print(f"输出 token: {report['tokens']} ({report['tokens_per_sec']:.1f} tokens/秒)")
+    for label, key in (("首 token 延迟", "ttft"), ("总延迟", "latency")):
+        dist = report[key]
+        print(f"{label}: " + ", ".join(f"p{pct} {_format_seconds(dist[f'p{pct}'])}" for pct in PERCENTILES))
+    rates = report["stream_tokens_per_sec"]
+    if rates["mean"] is not None:
+        print(f"单流生成速度: 平均 {rates['mean']:.1f} tokens/秒，p50 {rates['p50']:.1f}")
+    if report["errors"]:
+        print("错误分类:")
+        for name, count in sorted(report["errors"].items(), key=lambda item: -item[1]):
+            print(f"  {name}: {count}")
+    return 0 if report["succeeded"] else 1
+
+
+# ==================== 模拟中转商 ====================
+def mock_server(args):
+    """启动模拟 Anthropic / OpenAI 接口的中转商服务器"""
+    from claude_switcher.metrics import MetricFamily
+    from claude_switcher.mock import MockRelayServer, build_profiles, parse_route_overrides
+
+    try:
+        overrides = parse_route_overrides(args.route or [])
+    except ValueError as e:
+        print(f"错误: {e}")
         return 1
 
+    profiles = build_profiles({
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "tokens_per_sec": args.tokens_per_sec,
+        "output_tokens": args.output_tokens,
+        "error_rate": args.error_rate,
+        "rate_limit": args.rate_limit,
+    }, overrides)
+
+    try:
+        server = MockRelayServer(args.host, args.port, profiles, verbose=args.verbose)
+    except OSError as e:
+        print(f"错误: 无法监听 {args.host}:{args.port}: {e}")
+        return 1
 
-def codex_add(args):
-    """添加或更新 Codex 中转商配置"""
-    config_mgr = ConfigManager()
+    print(f"模拟中转商已启动: {server.base_url}（Ctrl+C 退出）")
+    for route, profile in profiles.items():
+        print(f"  {route}: {profile.describe()}")
+
+    if not args.no_register:
+        config_mgr = _config_mgr(args)
+        config_mgr.update_provider_entries(server.provider_entries(args.name))
+        print(f"\n已注册为中转商 '{args.name}'（Claude Code 与 Codex），可直接使用:")
+        print(f"  vibe-switcher bench-provider {args.name}")
+        print(f"  vibe-switcher claude exec {args.name} -- claude")
+
+    def mock_metrics():
+        family = MetricFamily("vibe_switcher_mock_requests", "counter", "Requests handled by the mock relay.")
+        for route, count in server.requests.items():
+            family.add(count, route=route)
+        return [family]
+
+    metrics_server = _start_metrics_server(args, _config_mgr(args), mock_metrics)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n已停止模拟中转商，共处理请求: "
+              + ", ".join(f"{route} {count}" for route, count in server.requests.items()))
+    finally:
+        server.server_close()
+        if metrics_server is not None:
+            metrics_server.stop()
+    return 0
+
+
+# ==================== 录制与回放 ====================
+def _parse_size(value: str) -> int:
+    """解析 256M / 1G / 4096 形式的大小"""
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    value = value.strip().lower().rstrip('b')
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def replay_run(args):
+    """启动录制 / 回放代理"""
+    from claude_switcher.metrics import MetricFamily
+    from claude_switcher.replay import DEFAULT_IGNORED_FIELDS, ReplayServer, ReplayStore
+
+    config_mgr = _config_mgr(args)
+    service = args.replay_service
+    # 只用到后端的类属性，不需要创建实例
+    backend = load_backend_class(service)
+    provider = config_mgr.get_backend_providers(backend).get(args.provider)
+    if not provider:
+        print(f"错误: 未找到中转商 '{args.provider}'")
+        return 1
 
-    name = args.name
-    api_key = args.api_key
-    url = args.url
-    network_access = args.network_access if hasattr(args, 'network_access') and args.network_access else ""
+    try:
+        max_bytes = _parse_size(args.max_size)
+    except ValueError:
+        print(f"错误: 无效的大小: {args.max_size}")
+        return 1
 
-    config_mgr.add_codex_provider(name, api_key, url, network_access)
-    print(f"✓ 已添加/更新 Codex 中转商: {name}")
-    print(f"  URL: {url}")
-    print(f"  API Key: {api_key[:10]}...{api_key[-10:] if len(api_key) > 20 else api_key}")
-    if network_access:
-        print(f"  Network Access: {network_access}")
+    store_dir = Path(args.store).expanduser() if args.store else config_mgr.config_dir / "replay"
+    store = ReplayStore(store_dir, max_bytes)
+    try:
+        server = ReplayServer(args.host, args.port, provider['base_url'], store, mode=args.mode,
+                              ignored_fields=args.ignore_field or DEFAULT_IGNORED_FIELDS,
+                              timeout=args.timeout, verbose=args.verbose)
+    except OSError as e:
+        store.close()
+        print(f"错误: 无法监听 {args.host}:{args.port}: {e}")
+        return 1
 
+    print(f"录制/回放代理已启动 ({args.mode}): {server.base_url} -> {provider['base_url']}（Ctrl+C 退出）")
+    print(f"  存储: {store_dir}（{len(store)} 条录制，上限 {args.max_size}）")
+
+    if not args.no_register:
+        entry = dict(provider, base_url=server.base_url)
+        config_mgr.update_provider_entries({backend.provider_section: {args.name: entry}})
+        print(f"\n已注册为 {service} 中转商 '{args.name}'，切换到它即可使用:")
+        print(f"  vibe-switcher {service} exec {args.name} -- {service}")
+
+    def replay_metrics():
+        requests = MetricFamily("vibe_switcher_replay_requests", "counter", "Replay proxy requests by outcome.")
+        for name, count in server.counters.items():
+            requests.add(count, result=name)
+        entries = MetricFamily("vibe_switcher_replay_store_bytes", "gauge", "Live bytes in the replay store.",
+                               unit="bytes")
+        entries.add(store.live_bytes)
+        return [requests, entries]
+
+    metrics_server = _start_metrics_server(args, config_mgr, replay_metrics)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止代理: " + ", ".join(f"{name} {count}" for name, count in server.counters.items()))
+    finally:
+        server.server_close()
+        store.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+    return 0
+
+
+# ==================== 注册表同步 ====================
+def sync_run(args):
+    """从团队共享的注册表同步中转商配置"""
+    from claude_switcher.sync import RegistrySync
+
+    config_mgr = _config_mgr(args)
+    try:
+        result = RegistrySync(config_mgr, timeout=args.timeout).sync(
+            args.source, prune=args.prune, force=args.force
+        )
+    except Exception as e:
+        print(f"同步失败: {e}", file=sys.stderr)
+        return 1
 
-def codex_remove(args):
-    """删除 Codex 中转商配置"""
-    config_mgr = ConfigManager()
+    if args.quiet:
+        return 0
 
-    name = args.name
+    if not result["changed"]:
+        print("注册表未变化，无需同步")
+        return 0
 
-    if config_mgr.remove_codex_provider(name):
-        print(f"✓ 已删除 Codex 中转商: {name}")
+    if not result["updated"] and not result["removed"]:
+        print("注册表已更新，但没有需要合并的中转商变更")
         return 0
-    else:
-        print(f"错误: 未找到 Codex 中转商 '{name}'")
+
+    for name in result["updated"]:
+        print(f"  已更新: {name}")
+    for name in result["removed"]:
+        print(f"  已删除: {name}")
+    print(f"\n✓ 同步完成: 更新 {len(result['updated'])} 个，删除 {len(result['removed'])} 个中转商")
+    return 0
+
+
+# ==================== 批量主机 ====================
+def fleet_switch(args):
+    """在多个主目录上并行执行切换"""
+    import json
+    from claude_switcher.fleet import resolve_homes, run_fleet
+
+    homes = resolve_homes(args.homes)
+    if not homes:
+        print("错误: 未找到任何目标主目录")
         return 1
 
+    provider_entry = None
+    if args.push_provider:
+        config_mgr = _config_mgr(args)
+        backend = load_backend_class(args.fleet_service)
+        provider_entry = config_mgr.get_backend_providers(backend).get(args.provider)
+        if provider_entry is None:
+            print(f"错误: 本地配置中未找到中转商 '{args.provider}'")
+            return 1
+
+    if not args.json:
+        print(f"开始切换 {len(homes)} 个目标的 {args.fleet_service} 中转商到 {args.provider}\n")
+
+    failed = 0
+    start = time.monotonic()
+    for result in run_fleet(homes, args.fleet_service, args.provider, provider_entry, workers=args.workers):
+        if not result["ok"]:
+            failed += 1
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        elif result["ok"]:
+            print(f"  ✓ {result['home']}  {result['elapsed'] * 1000:.1f}ms", flush=True)
+        else:
+            print(f"  ✗ {result['home']}  {result['elapsed'] * 1000:.1f}ms  {result['error']}", flush=True)
 
-def codex_current(args):
-    """显示当前 Codex 配置"""
-    config_mgr = ConfigManager()
-    codex_mgr = CodexConfigManager()
+    if not args.json:
+        elapsed = time.monotonic() - start
+        print(f"\n完成: 成功 {len(homes) - failed} 个，失败 {failed} 个，耗时 {elapsed:.2f}s")
+    return 1 if failed else 0
 
-    current_name = config_mgr.get_current_codex()
-    current_provider = config_mgr.get_current_codex_provider()
 
-    print("\n当前 Codex 配置:\n")
+# ==================== Shell 补全 ====================
+def completion_script(args):
+    """输出 shell 补全脚本"""
+    from claude_switcher.completion import CompletionCache, GENERATORS
 
-    if current_name and current_provider:
-        print(f"  中转商: {current_name}")
-        print(f"  URL: {current_provider['base_url']}")
-        if current_provider.get('network_access'):
-            print(f"  Network Access: {current_provider['network_access']}")
-        if current_provider['api_key']:
-            key_display = current_provider['api_key'][:10] + "..." + current_provider['api_key'][-10:] \
-                if len(current_provider['api_key']) > 20 else current_provider['api_key']
-            print(f"  API Key: {key_display}")
-    else:
-        print("  (未设置)")
+    config_mgr = _config_mgr(args)
+    # 安装补全时顺便生成缓存，兼容升级前已存在的配置文件
+    config_mgr.refresh_derived_files()
+    cache_dir = CompletionCache(config_mgr.config_dir).cache_dir
+    print(GENERATORS[args.shell](build_parser(), cache_dir), end="")
+    return 0
 
-    print("\nCodex 配置文件中的值:\n")
-    codex_config = codex_mgr.show_current_config()
-    if codex_config:
-        print(f"  Provider: {codex_config['provider']}")
-        print(f"  Base URL: {codex_config['base_url']}")
-        if codex_config['api_key']:
-            key_display = codex_config['api_key'][:10] + "..." + codex_config['api_key'][-10:] \
-                if len(codex_config['api_key']) > 20 else codex_config['api_key']
-            print(f"  API Key: {key_display}")
-
-        if current_provider:
-            if (codex_config['api_key'] != current_provider['api_key'] or
-                codex_config['base_url'] != current_provider['base_url']):
-                print("\n⚠️  警告: Codex 配置与当前中转商不一致")
-                print("   请运行 'vibe-switcher codex switch <provider>' 来更新配置")
-    else:
-        print("  (未配置)")
 
-    print(f"\n配置文件:")
-    print(f"  config.toml: {codex_mgr.config_toml}")
-    print(f"  auth.json: {codex_mgr.auth_json}")
+def prompt_script(args):
+    """输出读取当前中转商的纯 shell 函数"""
+    from claude_switcher.state import generate_prompt_function
+
+    config_mgr = _config_mgr(args)
+    # 生成状态文件，兼容升级前已存在的配置文件
+    config_mgr.refresh_derived_files()
+    state_file = StateFile(config_mgr.config_dir).state_file
+    print(generate_prompt_function(args.shell, state_file), end="")
+    return 0
+
+
+def hook_script(args):
+    """输出在每次提示符时同步 Claude Code 环境变量的 shell hook"""
+    from claude_switcher.liveenv import generate_hook
+
+    config_mgr = _config_mgr(args)
+    print(generate_hook(args.shell, LiveEnv(config_mgr.config_dir)), end="")
+    return 0
+
+
+# ==================== 批量命令 ====================
+def batch_run(args):
+    """从标准输入或文件批量执行命令"""
+    from claude_switcher.batch import BatchRunner
+
+    backends = discover_backends()
+    managers = {
+        'config_mgr': ConfigManager(autosave=False),
+        'backends': {service: load_backend_class(service, backends)() for service in backends},
+    }
+    runner = BatchRunner(build_parser(), managers, save_each=args.save_each)
+
+    if args.file and args.file != '-':
+        try:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                return runner.run(f, sys.stdout, stop_on_error=args.stop_on_error)
+        except OSError as e:
+            print(f"错误: 无法读取命令文件: {e}", file=sys.stderr)
+            return 1
+    return runner.run(sys.stdin, sys.stdout, stop_on_error=args.stop_on_error)
 
 
 # ==================== 主程序 ====================
-def main():
+def build_parser(include_plugins: bool = True, load: Optional[List[str]] = None) -> argparse.ArgumentParser:
+    """
+    构建命令行参数解析器
+
+    Args:
+        include_plugins: 是否注册通过 entry point 安装的插件后端
+        load: 导入后端并注册完整子命令的服务，默认为全部；其余服务只注册名称
+    """
     parser = argparse.ArgumentParser(
         description="Vibe Switcher - Claude Code 和 Codex API 中转商切换工具",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -274,9 +1168,14 @@ def main():
   # Claude Code 操作
   vibe-switcher claude list                    # 列出所有 Claude Code 中转商
   vibe-switcher claude switch duck             # 切换到 duck 中转商
+  vibe-switcher claude switch duck --all-shells  # 同时更新所有 shell 的配置文件
   vibe-switcher claude add fox <token> <url>   # 添加中转商
   vibe-switcher claude remove fox              # 删除中转商
   vibe-switcher claude current                 # 查看当前配置
+  vibe-switcher claude exec duck -- claude     # 使用 duck 运行命令（不修改配置文件）
+  vibe-switcher claude tokens duck --set t1 t2  # 为中转商配置多个轮换使用的 Token
+  vibe-switcher claude pool add fast duck:3 fox:1  # 定义加权中转商池
+  vibe-switcher claude switch pool:fast        # 按权重从池中选择中转商
 
   # Codex 操作
   vibe-switcher codex list                     # 列出所有 Codex 中转商
@@ -284,118 +1183,295 @@ def main():
   vibe-switcher codex add fox <key> <url>      # 添加中转商
   vibe-switcher codex remove fox               # 删除中转商
   vibe-switcher codex current                  # 查看当前配置
-        """
-    )
+  vibe-switcher codex exec duck -- codex       # 使用 duck 运行命令（不修改 ~/.codex）
 
-    subparsers = parser.add_subparsers(dest='service', help='选择服务类型')
+  # 插件后端（通过 vibe_switcher.backends entry point 安装）
+  vibe-switcher gemini switch fox              # 切换插件后端的中转商
 
-    # ==================== Claude Code 子命令 ====================
-    claude_parser = subparsers.add_parser('claude', help='Claude Code 相关操作')
-    claude_subparsers = claude_parser.add_subparsers(dest='action', help='操作类型')
+  # 历史与回滚
+  vibe-switcher history                        # 查看切换历史
+  vibe-switcher rollback                       # 撤销最近一次切换
+  vibe-switcher rollback 3                     # 撤销倒数第 3 次切换
+  vibe-switcher rollback 20241002_153045       # 回滚到指定时间点之前的状态
 
-    # claude list
-    claude_list_parser = claude_subparsers.add_parser(
-        'list',
-        help='列出所有 Claude Code 中转商',
-        description='列出所有已配置的 Claude Code 中转商，并显示当前正在使用的中转商'
-    )
-    claude_list_parser.set_defaults(func=claude_list)
+  # 健康检查
+  vibe-switcher watch                          # 持续探测当前中转商，异常时自动切换
+  vibe-switcher watch --service claude --interval 30 --windows 2
 
-    # claude switch
-    claude_switch_parser = claude_subparsers.add_parser(
-        'switch',
-        help='切换 Claude Code 中转商: switch <provider>',
-        description='切换到指定的 Claude Code 中转商',
-        usage='vibe-switcher claude switch <provider>'
-    )
-    claude_switch_parser.add_argument('provider', metavar='<provider>', help='要切换到的中转商名称')
-    claude_switch_parser.set_defaults(func=claude_switch)
+  # 使用统计
+  vibe-switcher stats                          # 各中转商的切换次数、使用时长、失败率
 
-    # claude add
-    claude_add_parser = claude_subparsers.add_parser(
-        'add',
-        help='添加或更新 Claude Code 中转商: add <name> <token> <url>',
-        description='添加新的 Claude Code 中转商配置，或更新已存在的中转商配置',
-        usage='vibe-switcher claude add <name> <token> <url>'
-    )
-    claude_add_parser.add_argument('name', metavar='<name>', help='中转商名称（标识符）')
-    claude_add_parser.add_argument('token', metavar='<token>', help='API Token（用于认证）')
-    claude_add_parser.add_argument('url', metavar='<url>', help='API Base URL（中转商的接口地址）')
-    claude_add_parser.set_defaults(func=claude_add)
+  # 指标导出
+  vibe-switcher metrics --rebuild              # 从事件日志重建指标文件
+  vibe-switcher watch --metrics-port 9464      # 健康检查同时提供 /metrics
 
-    # claude remove
-    claude_remove_parser = claude_subparsers.add_parser(
-        'remove',
-        help='删除 Claude Code 中转商: remove <name>',
-        description='从配置中删除指定的 Claude Code 中转商',
-        usage='vibe-switcher claude remove <name>'
-    )
-    claude_remove_parser.add_argument('name', metavar='<name>', help='要删除的中转商名称')
-    claude_remove_parser.set_defaults(func=claude_remove)
+  # 流式压测
+  vibe-switcher bench-provider duck --concurrency 8 --duration 30
 
-    # claude current
-    claude_current_parser = claude_subparsers.add_parser(
-        'current',
-        help='显示当前 Claude Code 配置',
-        description='显示当前正在使用的 Claude Code 中转商配置，包括配置文件中的实际值'
-    )
-    claude_current_parser.set_defaults(func=claude_current)
+  # 模拟中转商
+  vibe-switcher mock-server --port 8300 --route messages:error_rate=0.1
 
-    # ==================== Codex 子命令 ====================
-    codex_parser = subparsers.add_parser('codex', help='Codex 相关操作')
-    codex_subparsers = codex_parser.add_subparsers(dest='action', help='操作类型')
+  # 录制与回放
+  vibe-switcher replay duck --mode record      # 录制经过的请求，之后用 --mode replay 回放
 
-    # codex list
-    codex_list_parser = codex_subparsers.add_parser(
-        'list',
-        help='列出所有 Codex 中转商',
-        description='列出所有已配置的 Codex 中转商，并显示当前正在使用的中转商'
+  # 注册表同步
+  vibe-switcher sync https://example.com/providers.json
+
+  # 批量主机
+  vibe-switcher fleet switch duck --homes '/srv/containers/*/home' --push-provider
+
+  # Shell 补全
+  vibe-switcher completion bash > ~/.local/share/bash-completion/completions/vibe-switcher
+
+  # 提示符
+  vibe-switcher claude current --short         # 只输出当前中转商名称
+  vibe-switcher prompt zsh > ~/.vibe-prompt.zsh  # 生成读取状态文件的 shell 函数
+  eval "$(vibe-switcher hook zsh)"             # 切换后已打开的终端在下一次提示符时自动生效
+
+  # 批量操作
+  vibe-switcher batch < commands.txt           # 批量执行命令，每行输出一条 JSON 结果
+        """
     )
-    codex_list_parser.set_defaults(func=codex_list)
 
-    # codex switch
-    codex_switch_parser = codex_subparsers.add_parser(
+    subparsers = parser.add_subparsers(dest='service', help='选择服务类型')
+
+    # ==================== 服务后端子命令 ====================
+    # 内置的 claude / codex 与插件后端使用同一套子命令，只导入本次调用涉及的后端
+    backends = discover_backends(include_plugins)
+    for service in backends:
+        backend_cls = load_backend_class(service, backends) if load is None or service in load else None
+        _add_backend_parsers(subparsers, service, backend_cls)
+
+    # ==================== 历史与回滚 ====================
+    history_parser = subparsers.add_parser(
+        'history',
+        help='查看切换历史',
+        description='按时间倒序列出切换记录，序号可直接用于 rollback'
+    )
+    history_parser.add_argument('-n', '--limit', type=int, default=20, metavar='<n>', help='显示的记录数（默认 20）')
+    history_parser.set_defaults(func=history_list)
+
+    rollback_parser = subparsers.add_parser(
+        'rollback',
+        help='回滚切换: rollback [N|timestamp]',
+        description='将某次切换涉及的文件原子地恢复为切换前的内容，并还原当前中转商记录。'
+                    'N 表示倒数第 N 次切换（默认 1）；时间戳（如 20241002_153045）表示回滚到该时间点的状态',
+        usage='vibe-switcher rollback [N|timestamp]'
+    )
+    rollback_parser.add_argument('target', nargs='?', metavar='N|timestamp', help='倒数第 N 次切换或时间戳')
+    rollback_parser.set_defaults(func=history_rollback)
+
+    # ==================== 健康检查 ====================
+    watch_parser = subparsers.add_parser(
+        'watch',
+        help='后台健康检查，异常时自动切换中转商',
+        description='周期性探测当前 Claude Code / Codex 中转商。连续多个窗口失败率或延迟超过阈值时，'
+                    '自动切换到延迟最低的健康备选中转商；切换后有冷却期，避免来回切换',
+        usage='vibe-switcher watch [--service claude|codex|all] [--interval <秒>] [选项]'
+    )
+    watch_parser.add_argument('--service', dest='services', choices=['claude', 'codex', 'all'], default='all', help='检查的服务（默认 all）')
+    watch_parser.add_argument('--interval', type=float, default=60.0, metavar='<秒>', help='检查间隔（默认 60）')
+    watch_parser.add_argument('--jitter', type=float, default=0.1, metavar='<比例>', help='间隔随机抖动比例（默认 0.1，即 ±10%%）')
+    watch_parser.add_argument('--samples', type=int, default=3, metavar='<n>', help='每个窗口的探测次数（默认 3）')
+    watch_parser.add_argument('--error-rate', type=float, default=0.5, metavar='<比例>', help='窗口失败率阈值（默认 0.5）')
+    watch_parser.add_argument('--latency', type=float, default=3.0, metavar='<秒>', help='窗口延迟中位数阈值（默认 3）')
+    watch_parser.add_argument('--windows', type=int, default=3, metavar='<k>', help='连续异常窗口数达到该值时切换（默认 3）')
+    watch_parser.add_argument('--cooldown', type=float, default=600.0, metavar='<秒>', help='切换后的冷却时间（默认 600）')
+    watch_parser.add_argument('--margin', type=float, default=0.8, metavar='<比例>', help='备选中转商延迟须低于阈值的该比例（默认 0.8）')
+    watch_parser.add_argument('--timeout', type=float, default=5.0, metavar='<秒>', help='单次探测超时（默认 5）')
+    watch_parser.add_argument('--once', action='store_true', help='只检查一轮后退出')
+    _add_metrics_arguments(watch_parser)
+    watch_parser.set_defaults(func=watch_run)
+
+    # ==================== 使用统计 ====================
+    stats_parser = subparsers.add_parser(
+        'stats',
+        help='查看切换与探测统计',
+        description='流式汇总事件日志，输出各中转商的切换次数、使用时长、失败率和切换耗时中位数'
+    )
+    stats_parser.add_argument('--service', dest='services', choices=['claude', 'codex'], help='只统计指定服务')
+    stats_parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+    stats_parser.set_defaults(func=stats_show)
+
+    # ==================== 指标导出 ====================
+    metrics_parser = subparsers.add_parser(
+        'metrics',
+        help='输出 Prometheus 指标（切换次数与耗时、探测延迟、失败数、当前中转商）',
+        description='输出 Prometheus 文本格式的指标并更新指标文件（默认 ~/.config/claude-switcher/metrics.prom，'
+                    '可通过 config.json 的 metrics_textfile 指向 node_exporter 的 textfile 目录）',
+        usage='vibe-switcher metrics [--rebuild]'
+    )
+    metrics_parser.add_argument('--rebuild', action='store_true', help='根据完整的事件日志重新计算指标')
+    metrics_parser.set_defaults(func=metrics_show)
+
+    # ==================== 流式压测 ====================
+    bench_parser = subparsers.add_parser(
+        'bench-provider',
+        help='对中转商进行并发流式压测: bench-provider <name>',
+        description='向中转商并发发送流式请求（Claude 使用 Anthropic messages，Codex 按 wire_api 使用 responses 或 chat），'
+                    '统计首 token 延迟、tokens/秒、p50/p95/p99 延迟和错误分类',
+        usage='vibe-switcher bench-provider <name> [--service claude|codex] [--concurrency <n>] '
+              '[--duration <秒> | --requests <n>] [选项]'
+    )
+    bench_parser.add_argument('provider', metavar='<name>', help='中转商名称')
+    bench_parser.add_argument('--service', dest='bench_service', choices=['claude', 'codex'], default='claude', help='服务类型（默认 claude）')
+    bench_parser.add_argument('--concurrency', type=int, default=4, metavar='<n>', help='同时在途的请求数（默认 4）')
+    bench_parser.add_argument('--connections', type=int, metavar='<n>', help='连接上限，连接在请求之间复用（默认等于并发数）')
+    bench_parser.add_argument('--rate', type=float, metavar='<n>', help='每秒最多发起的请求数（默认不限制）')
+    bench_limit = bench_parser.add_mutually_exclusive_group()
+    bench_limit.add_argument('--duration', type=float, metavar='<秒>', help='压测持续时间')
+    bench_limit.add_argument('--requests', type=int, metavar='<n>', help='请求总数（默认为并发数的 10 倍）')
+    bench_parser.add_argument('--model', metavar='<model>', help='请求使用的模型（默认取中转商配置）')
+    bench_parser.add_argument('--prompt', metavar='<text>', help='请求内容')
+    bench_parser.add_argument('--max-tokens', type=int, default=128, metavar='<n>', help='每个请求的最大输出 token 数（默认 128）')
+    bench_parser.add_argument('--timeout', type=float, default=60.0, metavar='<秒>', help='单个请求的超时时间（默认 60）')
+    bench_parser.add_argument('--json', action='store_true', help='以 JSON 格式输出报告')
+    bench_parser.set_defaults(func=bench_provider)
+
+    # ==================== 模拟中转商 ====================
+    mock_parser = subparsers.add_parser(
+        'mock-server',
+        help='启动模拟中转商，用于离线压测和测试',
+        description='模拟 Anthropic messages 与 OpenAI responses / chat completions 接口（含 SSE 流式响应），'
+                    '启动后注册为 config.json 中的中转商。全局参数作用于所有接口，--route 可按接口覆盖',
+        usage='vibe-switcher mock-server [--port <port>] [--name <name>] [--route <route>:<key>=<value>,...] [选项]'
+    )
+    mock_parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认 127.0.0.1）')
+    mock_parser.add_argument('--port', type=int, default=8300, help='监听端口（默认 8300，0 表示随机端口）')
+    mock_parser.add_argument('--name', default='mock', metavar='<name>', help='注册的中转商名称（默认 mock）')
+    mock_parser.add_argument('--no-register', action='store_true', help='不注册到 config.json')
+    mock_parser.add_argument('--latency', type=float, metavar='<秒>', help='首 token 前的延迟（默认 0.2）')
+    mock_parser.add_argument('--jitter', type=float, metavar='<秒>', help='延迟的随机抖动幅度（默认 0.05）')
+    mock_parser.add_argument('--tokens-per-sec', type=float, metavar='<n>', help='输出速度（默认 50）')
+    mock_parser.add_argument('--output-tokens', type=int, metavar='<n>', help='每个响应的输出 token 数（默认 64）')
+    mock_parser.add_argument('--error-rate', type=float, metavar='<0-1>', help='返回 500 的概率（默认 0）')
+    mock_parser.add_argument('--rate-limit', type=float, metavar='<n>', help='每秒允许的请求数，超出返回 429（默认不限制）')
+    mock_parser.add_argument('--route', action='append', metavar='<route>:<key>=<value>,...',
+                             help='按接口覆盖参数，如 messages:latency=0.5,rate_limit=2（接口: messages / responses / chat）')
+    mock_parser.add_argument('--verbose', action='store_true', help='输出每个请求的访问日志')
+    _add_metrics_arguments(mock_parser)
+    mock_parser.set_defaults(func=mock_server)
+
+    # ==================== 录制与回放 ====================
+    replay_parser = subparsers.add_parser(
+        'replay',
+        help='启动录制/回放代理: replay <provider> [--mode record|replay|auto]',
+        description='在本地启动一个缓存代理，把 ANTHROPIC_BASE_URL 或 Codex 的 base_url 指向它。'
+                    'record 模式转发到中转商并录制响应（包括 SSE 流），replay 模式只从磁盘回放，'
+                    'auto 模式命中时回放、未命中时转发并录制。请求按规范化的请求体哈希匹配',
+        usage='vibe-switcher replay <provider> [--service claude|codex] [--mode record|replay|auto] [选项]'
+    )
+    replay_parser.add_argument('provider', metavar='<provider>', help='上游中转商名称')
+    replay_parser.add_argument('--service', dest='replay_service', choices=['claude', 'codex'], default='claude', help='服务类型（默认 claude）')
+    replay_parser.add_argument('--mode', choices=['record', 'replay', 'auto'], default='auto', help='运行模式（默认 auto）')
+    replay_parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认 127.0.0.1）')
+    replay_parser.add_argument('--port', type=int, default=8400, help='监听端口（默认 8400，0 表示随机端口）')
+    replay_parser.add_argument('--name', default='replay', metavar='<name>', help='注册的中转商名称（默认 replay）')
+    replay_parser.add_argument('--no-register', action='store_true', help='不注册到 config.json')
+    replay_parser.add_argument('--store', metavar='<dir>', help='录制存储目录（默认 ~/.config/claude-switcher/replay）')
+    replay_parser.add_argument('--max-size', default='256M', metavar='<size>', help='存储大小上限，超出时淘汰最久未使用的录制（默认 256M）')
+    replay_parser.add_argument('--ignore-field', action='append', metavar='<field>', help='计算请求哈希时忽略的请求体字段（默认 metadata、user）')
+    replay_parser.add_argument('--timeout', type=float, default=300.0, metavar='<秒>', help='转发请求的超时时间（默认 300）')
+    replay_parser.add_argument('--verbose', action='store_true', help='输出每个请求的访问日志')
+    _add_metrics_arguments(replay_parser)
+    replay_parser.set_defaults(func=replay_run)
+
+    # ==================== 注册表同步 ====================
+    sync_parser = subparsers.add_parser(
+        'sync',
+        help='同步团队共享的中转商注册表: sync <url|path>',
+        description='从 URL 或本地文件同步 providers / codex_providers。URL 使用 ETag / If-Modified-Since '
+                    '条件请求，未变化时跳过解析；只合并内容有变化的中转商，本地 Token / API Key 和当前中转商保持不变',
+        usage='vibe-switcher sync <url|path> [--prune] [--force] [--quiet]'
+    )
+    sync_parser.add_argument('source', metavar='<url|path>', help='注册表地址或本地文件路径')
+    sync_parser.add_argument('--prune', action='store_true', help='删除此前同步引入、但注册表中已不存在的中转商')
+    sync_parser.add_argument('--force', action='store_true', help='忽略缓存的校验信息，重新获取并合并')
+    sync_parser.add_argument('--timeout', type=float, default=10.0, metavar='<秒>', help='请求超时（默认 10）')
+    sync_parser.add_argument('--quiet', '-q', action='store_true', help='不输出结果（适合放在 shell 启动脚本中）')
+    sync_parser.set_defaults(func=sync_run)
+
+    # ==================== 批量主机 ====================
+    fleet_parser = subparsers.add_parser('fleet', help='在多个用户主目录或容器卷上并行切换')
+    fleet_parser.set_defaults(service_parser=fleet_parser)
+    fleet_subparsers = fleet_parser.add_subparsers(dest='action', help='操作类型')
+
+    fleet_switch_parser = fleet_subparsers.add_parser(
         'switch',
-        help='切换 Codex 中转商: switch <provider>',
-        description='切换到指定的 Codex 中转商',
-        usage='vibe-switcher codex switch <provider>'
+        help='并行切换: switch <provider> --homes <file|glob>',
+        description='使用进程池在多个主目录上执行 Claude Code / Codex 切换，输出每个目标的耗时和错误；'
+                    '任一目标失败时退出码为 1',
+        usage='vibe-switcher fleet switch <provider> --homes <file|glob> [--service claude|codex] [--workers <n>]'
     )
-    codex_switch_parser.add_argument('provider', metavar='<provider>', help='要切换到的中转商名称')
-    codex_switch_parser.set_defaults(func=codex_switch)
-
-    # codex add
-    codex_add_parser = codex_subparsers.add_parser(
-        'add',
-        help='添加或更新 Codex 中转商: add <name> <api_key> <url> [--network-access <value>]',
-        description='添加新的 Codex 中转商配置，或更新已存在的中转商配置',
-        usage='vibe-switcher codex add <name> <api_key> <url> [--network-access <value>]'
+    fleet_switch_parser.add_argument('provider', metavar='<provider>', help='要切换到的中转商名称')
+    fleet_switch_parser.add_argument('--homes', action='append', required=True, metavar='<file|glob>',
+                                     help='目标主目录：每行一个目录的文件，或 glob 模式（可重复指定）')
+    fleet_switch_parser.add_argument('--service', dest='fleet_service', choices=['claude', 'codex'], default='claude',
+                                     help='切换的服务（默认 claude）')
+    fleet_switch_parser.add_argument('--workers', type=int, metavar='<n>', help='并行进程数（默认为 CPU 核数）')
+    fleet_switch_parser.add_argument('--push-provider', action='store_true',
+                                     help='先将本地配置中的该中转商写入每个目标的 config.json')
+    fleet_switch_parser.add_argument('--json', action='store_true', help='每个目标输出一行 JSON 结果')
+    fleet_switch_parser.set_defaults(func=fleet_switch)
+
+    # ==================== Shell 补全 ====================
+    completion_parser = subparsers.add_parser(
+        'completion',
+        help='输出 shell 补全脚本: completion <bash|zsh|fish>',
+        description='输出 bash/zsh/fish 补全脚本。中转商名称从预先生成的缓存文件读取，'
+                    '按 TAB 时不会启动 Python',
+        usage='vibe-switcher completion <bash|zsh|fish>'
     )
-    codex_add_parser.add_argument('name', metavar='<name>', help='中转商名称（标识符）')
-    codex_add_parser.add_argument('api_key', metavar='<api_key>', help='API Key（用于认证）')
-    codex_add_parser.add_argument('url', metavar='<url>', help='API Base URL（中转商的接口地址）')
-    codex_add_parser.add_argument('--network-access', metavar='<value>', help='Network Access 设置（可选，如 "enabled" 或 "disabled"）', default="")
-    codex_add_parser.set_defaults(func=codex_add)
-
-    # codex remove
-    codex_remove_parser = codex_subparsers.add_parser(
-        'remove',
-        help='删除 Codex 中转商: remove <name>',
-        description='从配置中删除指定的 Codex 中转商',
-        usage='vibe-switcher codex remove <name>'
+    completion_parser.add_argument('shell', choices=['bash', 'zsh', 'fish'], help='shell 类型')
+    completion_parser.set_defaults(func=completion_script)
+
+    prompt_parser = subparsers.add_parser(
+        'prompt',
+        help='输出提示符辅助函数: prompt <bash|zsh|fish>',
+        description='输出纯 shell 函数 vibe_switcher_current [claude|codex]，'
+                    '直接读取单行状态文件，可在 PS1 / tmux 状态栏中使用而无需启动 Python',
+        usage='vibe-switcher prompt <bash|zsh|fish>'
     )
-    codex_remove_parser.add_argument('name', metavar='<name>', help='要删除的中转商名称')
-    codex_remove_parser.set_defaults(func=codex_remove)
-
-    # codex current
-    codex_current_parser = codex_subparsers.add_parser(
-        'current',
-        help='显示当前 Codex 配置',
-        description='显示当前正在使用的 Codex 中转商配置，包括配置文件中的实际值'
+    prompt_parser.add_argument('shell', choices=['bash', 'zsh', 'fish'], help='shell 类型')
+    prompt_parser.set_defaults(func=prompt_script)
+
+    hook_parser = subparsers.add_parser(
+        'hook',
+        help='输出同步环境变量的 shell hook: hook <bash|zsh|fish>',
+        description='输出 precmd / PROMPT_COMMAND hook。每次显示提示符时只读取一行代数文件，'
+                    '切换后代数变化时才重新导出 Claude Code 环境变量，已打开的终端无需重新 source rc 文件',
+        usage='vibe-switcher hook <bash|zsh|fish>'
     )
-    codex_current_parser.set_defaults(func=codex_current)
+    hook_parser.add_argument('shell', choices=['bash', 'zsh', 'fish'], help='shell 类型')
+    hook_parser.set_defaults(func=hook_script)
+
+    # ==================== 批量命令 ====================
+    batch_parser = subparsers.add_parser(
+        'batch',
+        help='批量执行命令（从标准输入或文件读取）',
+        description='逐行读取命令（普通命令行或 JSON 请求）并在同一进程中执行，'
+                    '每条命令输出一行 JSON 结果；config.json 默认在结束时统一写入一次',
+        usage='vibe-switcher batch [--file <path>] [--save-each] [--stop-on-error]'
+    )
+    batch_parser.add_argument('--file', '-f', metavar='<path>', help='命令文件路径（默认读取标准输入）')
+    batch_parser.add_argument('--save-each', action='store_true', help='每条命令执行后立即写入 config.json')
+    batch_parser.add_argument('--stop-on-error', action='store_true', help='遇到失败的命令时停止执行')
+    batch_parser.set_defaults(func=batch_run)
+
+    return parser
+
+
+def main():
+    argv = sys.argv[1:]
+    command = argv[0] if argv else None
+    # 只导入本次调用的服务后端；内置命令不读取插件后端的 entry point 元数据
+    parser = build_parser(include_plugins=False, load=[command])
+    if command not in subcommands(parser):
+        # 插件后端命令或帮助信息（显示帮助时导入所有后端）
+        parser = build_parser(load=[command] if command and not command.startswith('-') else None)
 
     # 解析参数
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # 如果没有指定服务类型，显示帮助信息
     if not args.service:
@@ -404,10 +1480,7 @@ def main():
 
     # 如果没有指定操作，显示对应服务的帮助
     if not hasattr(args, 'func'):
-        if args.service == 'claude':
-            claude_parser.print_help()
-        elif args.service == 'codex':
-            codex_parser.print_help()
+        args.service_parser.print_help()
         return 0
 
     # 执行对应的命令
@@ -1,22 +1,78 @@
+import argparse
+import hashlib
 import json
+import os
 import shutil
+import tempfile
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
+from claude_switcher.backends import BASE_ACTIONS, ServiceBackend
+from claude_switcher.fileutil import atomic_write, inherit_owner, make_dirs
+from claude_switcher.rules import load_rules
 
-class CodexConfigManager:
+if TYPE_CHECKING:
+    from claude_switcher.config import ConfigManager
+
+# 为 exec 模式生成独立 CODEX_HOME 时，从 ~/.codex 共享（符号链接）的条目
+SHARED_CODEX_ENTRIES = ("AGENTS.md", "prompts")
+
+
+class CodexConfigManager(ServiceBackend):
     """管理 Codex 配置文件（config.toml 和 auth.json）的修改"""
 
-    def __init__(self):
-        self.home = Path.home()
+    service = "codex"
+    label = "Codex"
+    provider_section = "codex_providers"
+    current_key = "current_codex"
+    credential_field = "api_key"
+    credential_label = "API Key"
+    config_label = "Codex 配置"
+    actions = BASE_ACTIONS + ("exec", "tokens", "pool")
+    exec_description = ('为中转商生成（并缓存）独立的 CODEX_HOME 目录，通过环境变量指向它后运行命令，'
+                        '不修改 ~/.codex，适合多个任务并行使用不同中转商')
+
+    def __init__(self, home: Optional[Path] = None):
+        """
+        Args:
+            home: 用户主目录，默认为当前用户的 HOME
+        """
+        self.home = Path(home) if home else Path.home()
         self.codex_dir = self.home / ".codex"
         self.config_toml = self.codex_dir / "config.toml"
         self.auth_json = self.codex_dir / "auth.json"
+        self.home_cache_dir = self.home / ".cache" / "vibe-switcher" / "codex-home"
+        self.rules = load_rules()
+
+    @classmethod
+    def add_arguments(cls, action: str, parser: argparse.ArgumentParser):
+        if action == "add":
+            parser.add_argument('--network-access', metavar='<value>', default="",
+                                help='Network Access 设置（可选，如 "enabled" 或 "disabled"）')
+
+    def configure(self, config_mgr: "ConfigManager", args: argparse.Namespace):
+        """使用 config.json 中的 provider_rules"""
+        self.use_rules(config_mgr.get_provider_rules())
+
+    def provider_entry(self, existing: Dict, args: argparse.Namespace) -> Dict:
+        entry = super().provider_entry(existing, args)
+        entry["network_access"] = getattr(args, 'network_access', "") or ""
+        # 为新建的中转商设置默认值，便于后续扩展
+        entry.setdefault("wire_api", "responses")
+        return entry
+
+    def describe(self, provider: Dict) -> List[str]:
+        if provider.get('network_access'):
+            return [f"Network Access: {provider['network_access']}"]
+        return []
+
+    def config_files(self) -> List[Path]:
+        return [self.config_toml, self.auth_json]
 
     def _ensure_codex_dir(self):
         """确保 .codex 目录存在"""
-        self.codex_dir.mkdir(parents=True, exist_ok=True)
+        make_dirs(self.codex_dir)
 
     def backup_file(self, file_path: Path) -> Path:
         """备份文件"""
@@ -24,6 +80,7 @@ class CodexConfigManager:
         backup_file = file_path.parent / f"{file_path.name}.claude_switcher_backup_{timestamp}"
         if file_path.exists():
             shutil.copy2(file_path, backup_file)
+            inherit_owner(backup_file)
         return backup_file
 
     def read_file(self, file_path: Path) -> str:
@@ -34,9 +91,8 @@ class CodexConfigManager:
         return ""
 
     def write_file(self, file_path: Path, content: str):
-        """写入文件"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        """写入文件（原子替换）"""
+        atomic_write(file_path, content)
 
     def _detect_project_path(self) -> str:
         """检测当前项目路径，默认取调用命令时的工作目录"""
@@ -45,18 +101,14 @@ class CodexConfigManager:
         except Exception:
             return str(self.home)
 
+    def use_rules(self, overrides: Optional[Dict] = None):
+        """使用 config.json 中的 provider_rules 覆盖默认适配规则"""
+        self.rules = load_rules(overrides)
+
     def _prepare_provider_settings(self, provider_name: str, provider_config: Dict) -> Dict:
         """根据中转商配置生成统一的设置字典"""
-        # 名称映射：支持简写名称到完整名称的映射
-        name_mapping = {
-            "yes": "yescode"
-        }
-        # 如果 provider_config 中有 model_provider，优先使用；否则使用名称映射或原始名称
-        if "model_provider" in provider_config and provider_config["model_provider"]:
-            actual_model_provider = provider_config["model_provider"]
-        else:
-            actual_model_provider = name_mapping.get(provider_name, provider_name)
-        
+        actual_model_provider = self.rules.model_provider(provider_name, provider_config)
+
         settings = {
             "model_provider": actual_model_provider,
             "model": provider_config.get("model", "gpt-5-codex"),
@@ -70,55 +122,10 @@ class CodexConfigManager:
             "auth_keys": provider_config.get("auth_keys"),
         }
 
-        # 针对特定服务商的默认设置（根据实际 model_provider 判断）
-        if actual_model_provider == "duck" or provider_name == "duck":
-            # duck 需要 network_access, disable_response_storage, requires_openai_auth
-            settings["requires_openai_auth"] = True
-            settings["disable_response_storage"] = True
-            if not settings.get("network_access"):
-                settings["network_access"] = "enabled"
-            # duck 不需要 env_key
-            if "env_key" in settings:
-                del settings["env_key"]
-            # duck 的 auth.json 只需要 OPENAI_API_KEY
-            if not settings.get("auth_keys"):
-                settings["auth_keys"] = {
-                    "OPENAI_API_KEY": "api_key"
-                }
-        elif actual_model_provider == "yescode" or provider_name in ("yescode", "yes"):
-            # yescode 不需要 requires_openai_auth, disable_response_storage, network_access
-            settings["requires_openai_auth"] = None
-            settings["disable_response_storage"] = None
-            settings["network_access"] = None
-            settings["env_key"] = "YESCODE_API_KEY"
-            
-            # yescode 强制使用正确的 base_url
-            correct_base_url = "https://cotest.yes.vg/v1"
-            provider_config["base_url"] = correct_base_url
-
-            # yescode 官方配置示例中没有 projects 配置块，如果需要可以显式配置
-            # 不自动添加 projects 配置，以匹配官方示例
-
-            # auth.json 需要同时写入 OPENAI_API_KEY 与专属的 env_key
-            # 如果配置中没有 auth_keys，则设置默认值
-            if not settings.get("auth_keys"):
-                env_key = settings["env_key"]
-                settings["auth_keys"] = {
-                    "OPENAI_API_KEY": "api_key",
-                    env_key: "api_key"
-                }
-            # 如果配置中有 auth_keys，确保它包含必要的键
-            elif settings.get("auth_keys"):
-                auth_keys = settings["auth_keys"]
-                env_key = settings["env_key"]
-                # 确保 OPENAI_API_KEY 和 env_key 都存在
-                if "OPENAI_API_KEY" not in auth_keys:
-                    auth_keys["OPENAI_API_KEY"] = "api_key"
-                if env_key not in auth_keys:
-                    auth_keys[env_key] = "api_key"
-        else:
-            settings.setdefault("requires_openai_auth", True)
-            settings.setdefault("disable_response_storage", True)
+        # 针对特定服务商的适配（见 provider_rules.json）
+        rule = self.rules.match(actual_model_provider, provider_name)
+        if rule:
+            self.rules.apply(rule, settings, provider_config)
 
         if not settings.get("auth_keys"):
             # 默认仅写入 OPENAI_API_KEY
@@ -195,8 +202,8 @@ class CodexConfigManager:
 
         return "\n".join(lines) + "\n"
 
-    def update_auth_json(self, provider_name: str, provider_config: Dict, api_key: str):
-        """更新 auth.json 文件"""
+    def build_auth_data(self, provider_name: str, provider_config: Dict, api_key: str) -> Dict:
+        """生成 auth.json 内容"""
         settings = self._prepare_provider_settings(provider_name, provider_config)
         auth_data = {}
 
@@ -207,8 +214,76 @@ class CodexConfigManager:
                 # 允许从 provider_config 中读取其他字段
                 auth_data[key_name] = provider_config.get(source, "")
 
-        with open(self.auth_json, 'w', encoding='utf-8') as f:
-            json.dump(auth_data, f, indent=2, ensure_ascii=False)
+        return auth_data
+
+    def update_auth_json(self, provider_name: str, provider_config: Dict, api_key: str):
+        """更新 auth.json 文件"""
+        auth_data = self.build_auth_data(provider_name, provider_config, api_key)
+
+        atomic_write(self.auth_json, json.dumps(auth_data, indent=2, ensure_ascii=False))
+
+    def render_codex_home(self, provider_name: str, provider_config: Dict, api_key: str) -> Path:
+        """
+        为 exec 模式生成独立的 CODEX_HOME 目录，不修改 ~/.codex
+
+        目录按渲染结果的哈希缓存，同一配置只生成一次；多个进程并发生成时通过
+        原子 rename 发布，无需加锁。
+
+        Returns:
+            CODEX_HOME 目录路径
+        """
+        # 使用副本渲染，避免适配逻辑修改调用方持有的配置
+        provider_config = dict(provider_config)
+        toml_content = self.generate_config_toml(provider_name, provider_config)
+        auth_content = json.dumps(
+            self.build_auth_data(provider_name, provider_config, api_key),
+            indent=2, ensure_ascii=False
+        )
+
+        digest = hashlib.sha256((toml_content + "\0" + auth_content).encode('utf-8')).hexdigest()[:16]
+        codex_home = self.home_cache_dir / f"{provider_name}-{digest}"
+        if codex_home.is_dir():
+            return codex_home
+
+        self.home_cache_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{provider_name}-", dir=str(self.home_cache_dir)))
+        try:
+            (staging / "config.toml").write_text(toml_content, encoding='utf-8')
+            (staging / "auth.json").write_text(auth_content, encoding='utf-8')
+            os.chmod(staging / "auth.json", 0o600)
+            for entry in SHARED_CODEX_ENTRIES:
+                if (self.codex_dir / entry).exists():
+                    os.symlink(self.codex_dir / entry, staging / entry)
+            os.rename(staging, codex_home)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            # 其他进程已抢先生成了同一目录
+            if not codex_home.is_dir():
+                raise
+        return codex_home
+
+    def exec_env(self, provider_name: str, provider_config: Dict, api_key: str) -> Dict[str, str]:
+        """
+        生成 exec 模式下注入子进程的环境变量
+
+        Returns:
+            包含 CODEX_HOME 以及中转商 env_key（如 YESCODE_API_KEY）的字典
+        """
+        env = {"CODEX_HOME": str(self.render_codex_home(provider_name, provider_config, api_key))}
+        settings = self._prepare_provider_settings(provider_name, dict(provider_config))
+        if settings.get("env_key"):
+            env[settings["env_key"]] = api_key
+        return env
+
+    def request_settings(self, provider_name: str, provider: Dict) -> Dict[str, str]:
+        """按适配规则确定模型、接口类型和 base_url（规则可能强制使用特定的 base_url）"""
+        provider = dict(provider)
+        settings = self._prepare_provider_settings(provider_name, provider)
+        return {
+            "base_url": provider["base_url"],
+            "model": settings["model"],
+            "wire_api": settings.get("wire_api") or "responses",
+        }
 
     def update_codex_config(self, provider_name: str, provider_config: Dict, api_key: str) -> bool:
         """
@@ -250,6 +325,26 @@ class CodexConfigManager:
             print(f"更新 Codex 配置时出错: {e}")
             return False
 
+    def render_targets(self, provider_name: str, provider: Dict, credential: str) -> Dict[Path, str]:
+        """渲染切换后的 config.toml 与 auth.json"""
+        # 使用副本渲染，避免适配逻辑修改调用方持有的配置
+        provider = dict(provider)
+        auth_data = self.build_auth_data(provider_name, provider, credential)
+        return {
+            self.config_toml: self.generate_config_toml(provider_name, provider),
+            self.auth_json: json.dumps(auth_data, indent=2, ensure_ascii=False),
+        }
+
+    def switch(self, provider_name: str, provider: Dict, credential: str) -> bool:
+        # 使用副本：batch 模式下 provider 是 ConfigManager 缓存中的条目，适配规则强制的 base_url 不能写回配置
+        return self.update_codex_config(provider_name, dict(provider), credential)
+
+    def current(self) -> Optional[Dict]:
+        result = self.show_current_config()
+        if result is None:
+            return None
+        return {"base_url": result["base_url"], "credential": result["api_key"], "provider": result["provider"]}
+
     def show_current_config(self) -> Optional[Dict]:
         """
         显示当前 Codex 配置
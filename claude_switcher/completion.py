@@ -0,0 +1,178 @@
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+from claude_switcher.fileutil import atomic_write, shell_path
+from claude_switcher.pools import POOL_PREFIX, POOL_SECTIONS
+
+# 需要补全中转商名称的操作
+PROVIDER_ACTIONS = ("switch", "remove", "exec", "tokens")
+
+# 服务类型与 config.json 中中转商字段的对应关系
+PROVIDER_SECTIONS = {
+    "claude": "providers",
+    "codex": "codex_providers",
+}
+
+
+class CompletionCache:
+    """
+    维护 shell 补全使用的中转商名称缓存
+
+    每个服务一个纯文本文件，每行一个中转商名称。补全脚本直接读取这些文件，
+    按 TAB 时既不启动 Python，也不解析完整的 config.json。
+    """
+
+    def __init__(self, config_dir: Path):
+        self.cache_dir = config_dir / "completion"
+
+    def cache_file(self, service: str) -> Path:
+        return self.cache_dir / service
+
+    def update(self, config: Dict):
+        """根据配置重新生成缓存（包含 pool:<name> 形式的中转商池），名称列表未变化时不写入"""
+        for service, section in PROVIDER_SECTIONS.items():
+            names = list(config.get(section) or {})
+            names += [POOL_PREFIX + name for name in config.get(POOL_SECTIONS[service]) or {}]
+            content = "".join(f"{name}\n" for name in names)
+            cache_file = self.cache_file(service)
+            try:
+                if cache_file.read_text(encoding='utf-8') == content:
+                    continue
+            except OSError:
+                pass
+            atomic_write(cache_file, content)
+
+
+def subcommands(parser: argparse.ArgumentParser) -> Dict[str, argparse.ArgumentParser]:
+    """获取解析器的子命令"""
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return dict(action.choices)
+    return {}
+
+
+def _command_tree(parser: argparse.ArgumentParser) -> Dict[str, List[str]]:
+    """从 CLI 解析器中提取 {顶层命令: [二级命令]}，保证补全脚本与实际命令一致"""
+    return {name: list(subcommands(sub)) for name, sub in subcommands(parser).items()}
+
+
+def generate_bash(parser: argparse.ArgumentParser, cache_dir: Path) -> str:
+    """生成 bash 补全脚本（只使用 shell 内建命令）"""
+    tree = _command_tree(parser)
+    services = " ".join(PROVIDER_SECTIONS)
+    cases = "\n".join(
+        f'            {name}) words="{" ".join(actions)}" ;;'
+        for name, actions in tree.items() if actions
+    )
+    provider_actions = "|".join(PROVIDER_ACTIONS)
+    return f'''# vibe-switcher bash completion
+_vibe_switcher_complete() {{
+    local cur="${{COMP_WORDS[COMP_CWORD]}}"
+    local words="" word
+    COMPREPLY=()
+
+    if [[ $COMP_CWORD -eq 1 ]]; then
+        words="{" ".join(tree)}"
+    elif [[ $COMP_CWORD -eq 2 ]]; then
+        case "${{COMP_WORDS[1]}}" in
+{cases}
+        esac
+    elif [[ $COMP_CWORD -eq 3 ]]; then
+        case "${{COMP_WORDS[1]}}" in
+            {services.replace(" ", "|")})
+                case "${{COMP_WORDS[2]}}" in
+                    {provider_actions})
+                        local cache_file={shell_path(cache_dir)}/"${{COMP_WORDS[1]}}"
+                        if [[ -r "$cache_file" ]]; then
+                            local name
+                            while IFS= read -r name; do
+                                words="$words $name"
+                            done < "$cache_file"
+                        fi
+                        ;;
+                esac
+                ;;
+        esac
+    fi
+
+    for word in $words; do
+        [[ "$word" == "$cur"* ]] && COMPREPLY+=("$word")
+    done
+}}
+complete -F _vibe_switcher_complete vibe-switcher
+'''
+
+
+def generate_zsh(parser: argparse.ArgumentParser, cache_dir: Path) -> str:
+    """生成 zsh 补全脚本"""
+    tree = _command_tree(parser)
+    cases = "\n".join(
+        f'                {name}) compadd -- {" ".join(actions)} ;;'
+        for name, actions in tree.items() if actions
+    )
+    services = "|".join(PROVIDER_SECTIONS)
+    provider_actions = "|".join(PROVIDER_ACTIONS)
+    return f'''#compdef vibe-switcher
+# vibe-switcher zsh completion
+_vibe_switcher() {{
+    case $CURRENT in
+        2)
+            compadd -- {" ".join(tree)}
+            ;;
+        3)
+            case $words[2] in
+{cases}
+            esac
+            ;;
+        4)
+            if [[ $words[2] == ({services}) && $words[3] == ({provider_actions}) ]]; then
+                local cache_file={shell_path(cache_dir)}/$words[2]
+                [[ -r $cache_file ]] && compadd -- ${{(f)"$(<$cache_file)"}}
+            fi
+            ;;
+    esac
+}}
+compdef _vibe_switcher vibe-switcher
+'''
+
+
+def generate_fish(parser: argparse.ArgumentParser, cache_dir: Path) -> str:
+    """生成 fish 补全脚本"""
+    tree = _command_tree(parser)
+    top = " ".join(tree)
+    lines = [
+        "# vibe-switcher fish completion",
+        "function __vibe_switcher_providers",
+        "    set -l tokens (commandline -opc)",
+        f"    set -l cache_file {shell_path(cache_dir)}/$tokens[2]",
+        "    test -r $cache_file; or return",
+        "    while read -l name",
+        "        echo $name",
+        "    end < $cache_file",
+        "end",
+        "",
+        "function __vibe_switcher_needs_provider",
+        "    set -l tokens (commandline -opc)",
+        f"    test (count $tokens) -eq 3; and contains -- $tokens[2] {' '.join(PROVIDER_SECTIONS)}; "
+        f"and contains -- $tokens[3] {' '.join(PROVIDER_ACTIONS)}",
+        "end",
+        "",
+        "complete -c vibe-switcher -f",
+        f"complete -c vibe-switcher -n '__fish_use_subcommand' -a '{top}'",
+    ]
+    for name, actions in tree.items():
+        if actions:
+            lines.append(
+                f"complete -c vibe-switcher -n '__fish_seen_subcommand_from {name}; "
+                f"and not __fish_seen_subcommand_from {' '.join(actions)}' -a '{' '.join(actions)}'"
+            )
+    lines.append("complete -c vibe-switcher -n '__vibe_switcher_needs_provider' -a '(__vibe_switcher_providers)'")
+    return "\n".join(lines) + "\n"
+
+
+GENERATORS = {
+    "bash": generate_bash,
+    "zsh": generate_zsh,
+    "fish": generate_fish,
+}
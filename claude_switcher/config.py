@@ -1,20 +1,36 @@
 import json
 import os
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from claude_switcher.completion import PROVIDER_SECTIONS, CompletionCache
+from claude_switcher.credentials import CREDENTIAL_FIELDS
+from claude_switcher.fileutil import atomic_write, make_dirs
+from claude_switcher.pools import POOL_SECTIONS
+from claude_switcher.state import StateFile
 
 
 class ConfigManager:
     """管理 Claude Switcher 配置文件"""
 
-    def __init__(self):
-        self.config_dir = Path.home() / ".config" / "claude-switcher"
+    def __init__(self, autosave: bool = True, home: Optional[Path] = None):
+        """
+        Args:
+            autosave: 为 True 时每次修改立即写盘；为 False 时修改只保存在内存中，
+                      需调用 flush() 统一写入（batch 模式使用）
+            home: 用户主目录，默认为当前用户的 HOME（fleet 模式下指向目标主目录）
+        """
+        self.home = Path(home) if home else Path.home()
+        self.config_dir = self.home / ".config" / "claude-switcher"
         self.config_file = self.config_dir / "config.json"
+        self.autosave = autosave
+        self._cache: Optional[Dict] = None
+        self._dirty = False
         self._ensure_config_exists()
 
     def _ensure_config_exists(self):
         """确保配置目录和文件存在"""
-        self.config_dir.mkdir(parents=True, exist_ok=True)
+        make_dirs(self.config_dir)
 
         if not self.config_file.exists():
             # 创建默认配置
@@ -75,19 +91,58 @@ class ConfigManager:
                     "base_url": "ANTHROPIC_BASE_URL"
                 }
             }
-            self._save_config(default_config)
+            self._write_config_file(default_config)
             # 设置文件权限为 600（仅所有者可读写）
             os.chmod(self.config_file, 0o600)
 
     def _load_config(self) -> Dict:
-        """加载配置文件"""
+        """加载配置文件（非 autosave 模式下只读取一次并缓存在内存中）"""
+        if not self.autosave and self._cache is not None:
+            return self._cache
         with open(self.config_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            config = json.load(f)
+        if not self.autosave:
+            self._cache = config
+        return config
 
     def _save_config(self, config: Dict):
-        """保存配置文件"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        """保存配置文件（非 autosave 模式下仅标记为待写入）"""
+        if self.autosave:
+            self._write_config_file(config)
+        else:
+            self._cache = config
+            self._dirty = True
+
+    def _write_config_file(self, config: Dict):
+        """将配置写入磁盘（原子替换）"""
+        atomic_write(self.config_file, json.dumps(config, indent=2, ensure_ascii=False))
+        self._update_derived_files(config)
+
+    def _update_derived_files(self, config: Dict):
+        """更新由配置派生、供 shell 直接读取的小文件（补全缓存、当前状态行）"""
+        CompletionCache(self.config_dir).update(config)
+        if StateFile(self.config_dir).update(config):
+            # 当前中转商变化时（包括删除当前中转商这类不产生事件的修改）同步指标文件中的 active_provider
+            from claude_switcher.metrics import MetricsStore
+            textfile = config.get("metrics_textfile")
+            MetricsStore(self.config_dir, Path(textfile).expanduser() if textfile else None).write_textfile()
+
+    def refresh_derived_files(self):
+        """根据当前配置重新生成派生文件"""
+        self._update_derived_files(self._load_config())
+
+    def flush(self) -> bool:
+        """
+        将内存中的修改写入配置文件
+
+        Returns:
+            是否实际写入了文件
+        """
+        if self._dirty and self._cache is not None:
+            self._write_config_file(self._cache)
+            self._dirty = False
+            return True
+        return False
 
     def get_providers(self) -> Dict:
         """获取所有中转商配置"""
@@ -99,110 +154,129 @@ class ConfigManager:
         providers = self.get_providers()
         return providers.get(name)
 
-    def add_provider(self, name: str, token: str, base_url: str):
-        """添加新的中转商"""
+    def get_current(self) -> Optional[str]:
+        """获取当前激活的中转商名称"""
         config = self._load_config()
-        config["providers"][name] = {
-            "token": token,
-            "base_url": base_url
-        }
-        self._save_config(config)
+        return config.get("current")
 
-    def remove_provider(self, name: str) -> bool:
-        """删除中转商"""
+    def get_env_vars(self) -> Dict[str, str]:
+        """获取环境变量名称配置"""
         config = self._load_config()
-        if name in config["providers"]:
-            del config["providers"][name]
-            # 如果删除的是当前激活的，清空 current
-            if config.get("current") == name:
-                config["current"] = None
-            self._save_config(config)
-            return True
-        return False
+        return config.get("env_vars", {})
 
-    def set_current(self, name: str) -> bool:
-        """设置当前激活的中转商"""
+    def get_shell_targets(self) -> str:
+        """获取 Claude Code 切换时更新的 shell 配置目标（detect: 自动检测的一个文件；all: 所有目标）"""
         config = self._load_config()
-        if name in config["providers"]:
-            config["current"] = name
-            self._save_config(config)
-            return True
-        return False
+        return config.get("shell_targets", "detect")
 
-    def get_current(self) -> Optional[str]:
-        """获取当前激活的中转商名称"""
+    def update_provider_entries(self, updates: Dict[str, Dict], removals: Optional[Dict] = None):
+        """
+        批量更新中转商条目，所有变更在一次写入中提交
+
+        Args:
+            updates: {配置段: {名称: 条目}}，配置段为 providers 或 codex_providers
+            removals: {配置段: [名称]}
+        """
         config = self._load_config()
-        return config.get("current")
+        for section, entries in updates.items():
+            config.setdefault(section, {}).update(entries)
+        for section, names in (removals or {}).items():
+            for name in names:
+                config.get(section, {}).pop(name, None)
+        self._save_config(config)
 
-    def get_current_provider(self) -> Optional[Dict]:
-        """获取当前激活的中转商配置"""
-        current = self.get_current()
-        if current:
-            return self.get_provider(current)
-        return None
+    def set_credentials(self, service: str, name: str, values: List[str]) -> bool:
+        """设置中转商的多个凭证，第一个同时作为主凭证"""
+        config = self._load_config()
+        provider = config.get(PROVIDER_SECTIONS[service], {}).get(name)
+        if provider is None:
+            return False
+        single_key, list_key = CREDENTIAL_FIELDS[service]
+        provider[single_key] = values[0]
+        provider[list_key] = list(values)
+        self._save_config(config)
+        return True
 
-    def get_env_vars(self) -> Dict[str, str]:
-        """获取环境变量名称配置"""
+    def get_provider_rules(self) -> Dict:
+        """获取用户自定义的 Codex 中转商适配规则（覆盖内置规则表）"""
         config = self._load_config()
-        return config.get("env_vars", {})
+        return config.get("provider_rules", {})
 
-    # Codex 相关方法
-    def get_codex_providers(self) -> Dict:
-        """获取所有 Codex 中转商配置"""
+    # 服务后端相关方法（配置字段由后端类的 provider_section / current_key 决定）
+    def get_backend_providers(self, backend) -> Dict:
+        """获取后端的所有中转商配置"""
         config = self._load_config()
-        return config.get("codex_providers", {})
+        return config.get(backend.provider_section, {})
 
-    def get_codex_provider(self, name: str) -> Optional[Dict]:
-        """获取指定 Codex 中转商配置"""
-        providers = self.get_codex_providers()
-        return providers.get(name)
+    def add_backend_provider(self, backend, name: str, entry: Dict):
+        """添加或更新后端的中转商（entry 为完整的中转商条目）"""
+        config = self._load_config()
+        config.setdefault(backend.provider_section, {})[name] = entry
+        self._save_config(config)
 
-    def add_codex_provider(self, name: str, api_key: str, base_url: str, network_access: str = ""):
-        """添加新的 Codex 中转商"""
-        config = self._load_config()
-        if "codex_providers" not in config:
-            config["codex_providers"] = {}
-
-        provider = config["codex_providers"].get(name, {})
-        provider.update({
-            "api_key": api_key,
-            "base_url": base_url,
-            "network_access": network_access
-        })
-        # 为新建的中转商设置默认值，便于后续扩展
-        provider.setdefault("wire_api", "responses")
-        config["codex_providers"][name] = provider
+    def remove_backend_provider(self, backend, name: str) -> bool:
+        """删除后端的中转商"""
+        config = self._load_config()
+        providers = config.get(backend.provider_section, {})
+        if name not in providers:
+            return False
+        del providers[name]
+        if config.get(backend.current_key) == name:
+            config[backend.current_key] = None
         self._save_config(config)
+        return True
 
-    def remove_codex_provider(self, name: str) -> bool:
-        """删除 Codex 中转商"""
+    def set_backend_current(self, backend, name: Optional[str]) -> bool:
+        """设置后端当前激活的中转商（传入 None 表示清空）"""
         config = self._load_config()
-        if "codex_providers" in config and name in config["codex_providers"]:
-            del config["codex_providers"][name]
-            # 如果删除的是当前激活的，清空 current_codex
-            if config.get("current_codex") == name:
-                config["current_codex"] = None
+        if name is None or name in config.get(backend.provider_section, {}):
+            config[backend.current_key] = name
             self._save_config(config)
             return True
         return False
 
-    def set_current_codex(self, name: str) -> bool:
-        """设置当前激活的 Codex 中转商"""
+    def get_backend_current(self, backend) -> Optional[str]:
+        """获取后端当前激活的中转商名称"""
+        config = self._load_config()
+        return config.get(backend.current_key)
+
+    # 中转商池相关方法
+    def get_pools(self, service: str) -> Dict:
+        """获取指定服务的所有中转商池"""
+        config = self._load_config()
+        return config.get(POOL_SECTIONS[service], {})
+
+    def set_pool(self, service: str, name: str, members: Dict[str, int], strategy: str = "weighted"):
+        """添加或更新中转商池"""
         config = self._load_config()
-        if "codex_providers" in config and name in config["codex_providers"]:
-            config["current_codex"] = name
+        config.setdefault(POOL_SECTIONS[service], {})[name] = {
+            "members": members,
+            "strategy": strategy
+        }
+        self._save_config(config)
+
+    def remove_pool(self, service: str, name: str) -> bool:
+        """删除中转商池"""
+        config = self._load_config()
+        pools = config.get(POOL_SECTIONS[service], {})
+        if name in pools:
+            del pools[name]
             self._save_config(config)
             return True
         return False
 
+    # Codex 相关方法
+    def get_codex_providers(self) -> Dict:
+        """获取所有 Codex 中转商配置"""
+        config = self._load_config()
+        return config.get("codex_providers", {})
+
+    def get_codex_provider(self, name: str) -> Optional[Dict]:
+        """获取指定 Codex 中转商配置"""
+        providers = self.get_codex_providers()
+        return providers.get(name)
+
     def get_current_codex(self) -> Optional[str]:
         """获取当前激活的 Codex 中转商名称"""
         config = self._load_config()
         return config.get("current_codex")
-
-    def get_current_codex_provider(self) -> Optional[Dict]:
-        """获取当前激活的 Codex 中转商配置"""
-        current = self.get_current_codex()
-        if current:
-            return self.get_codex_provider(current)
-        return None
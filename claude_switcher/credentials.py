@@ -0,0 +1,171 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from claude_switcher.fileutil import atomic_write
+
+# 各服务的主凭证字段与多凭证列表字段
+CREDENTIAL_FIELDS = {
+    "claude": ("token", "tokens"),
+    "codex": ("api_key", "api_keys"),
+}
+
+# 轮换方式：依次轮换 / 优先使用剩余额度最多的凭证
+ROTATIONS = ("round-robin", "quota")
+
+# 失败凭证的冷却时间：第 n 次连续失败冷却 base * 2^(n-1) 秒，不超过上限
+DEFAULT_BASE_COOLDOWN = 60.0
+DEFAULT_MAX_COOLDOWN = 3600.0
+
+# exec 的子进程以这些退出码结束时视为凭证失败：sysexits.h 的 EX_TEMPFAIL（限流等临时失败）
+# 与 EX_NOPERM（认证失败），包装脚本可以据此让 vibe-switcher 将当前凭证置入冷却期
+CREDENTIAL_FAILURE_EXIT_CODES = (75, 77)
+
+
+def credential_entries(service: str, provider: Dict) -> List[Dict]:
+    """
+    获取中转商的所有凭证
+
+    多凭证列表中的元素可以是字符串，也可以是 {"value": ..., "quota": 剩余额度}；
+    未配置列表时使用主凭证字段。
+
+    Returns:
+        [{"value", "quota"}]，不包含空凭证
+    """
+    single_key, list_key = CREDENTIAL_FIELDS[service]
+    entries = []
+    for item in provider.get(list_key) or [provider.get(single_key)]:
+        if isinstance(item, dict):
+            value, quota = item.get("value"), item.get("quota")
+        else:
+            value, quota = item, None
+        if value:
+            entries.append({"value": value, "quota": quota})
+    return entries
+
+
+def credential_id(value: str) -> str:
+    """状态文件中只保存凭证的哈希，不保存凭证本身"""
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:12]
+
+
+class CredentialRotator:
+    """
+    在同一中转商的多个凭证之间轮换
+
+    轮换位置、最近使用的凭证以及每个凭证的失败次数和冷却截止时间保存在
+    credential_state.json 中。处于冷却期的凭证会被跳过；全部处于冷却期时，
+    选择最早结束冷却的凭证。
+    """
+
+    def __init__(self, config_dir: Path, base_cooldown: float = DEFAULT_BASE_COOLDOWN,
+                 max_cooldown: float = DEFAULT_MAX_COOLDOWN):
+        self.state_file = config_dir / "credential_state.json"
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict):
+        atomic_write(self.state_file, json.dumps(state, ensure_ascii=False, separators=(',', ':')), mode=0o600)
+
+    def pick(self, service: str, provider_name: str, provider: Dict) -> Optional[str]:
+        """
+        选择本次使用的凭证
+
+        Returns:
+            凭证值；中转商未配置任何凭证时返回 None
+        """
+        entries = credential_entries(service, provider)
+        if not entries:
+            return None
+        if len(entries) == 1:
+            return entries[0]["value"]
+
+        now = time.time()
+        state = self._load_state()
+        entry_state = state.setdefault(f"{service}/{provider_name}", {})
+        tokens = entry_state.setdefault("tokens", {})
+        start = entry_state.get("next", 0) % len(entries)
+        # 从上次轮换到的位置开始排列，保证相同条件下依次轮换
+        ordered = entries[start:] + entries[:start]
+
+        def until(entry: Dict) -> float:
+            return tokens.get(credential_id(entry["value"]), {}).get("until", 0)
+
+        available = [entry for entry in ordered if until(entry) <= now]
+        if not available:
+            chosen = min(ordered, key=until)
+        elif provider.get("rotation") == "quota":
+            # 未标注额度的凭证排在有额度的凭证之后
+            chosen = max(available, key=lambda e: e["quota"] if e["quota"] is not None else float("-inf"))
+        else:
+            chosen = available[0]
+
+        entry_state["next"] = (entries.index(chosen) + 1) % len(entries)
+        entry_state["last"] = credential_id(chosen["value"])
+        self._save_state(state)
+        return chosen["value"]
+
+    def last_used(self, service: str, provider_name: str) -> Optional[str]:
+        """返回最近一次为该中转商选出的凭证哈希"""
+        return self._load_state().get(f"{service}/{provider_name}", {}).get("last")
+
+    def record_failure(self, service: str, provider_name: str, token_id: Optional[str] = None) -> float:
+        """
+        将凭证置入冷却期，连续失败时冷却时间指数增长
+
+        Args:
+            token_id: 凭证哈希，默认为最近一次选出的凭证
+
+        Returns:
+            冷却秒数；没有可记录的凭证时返回 0
+        """
+        state = self._load_state()
+        entry_state = state.setdefault(f"{service}/{provider_name}", {})
+        token_id = token_id or entry_state.get("last")
+        if not token_id:
+            return 0.0
+
+        token_state = entry_state.setdefault("tokens", {}).setdefault(token_id, {})
+        token_state["failures"] = token_state.get("failures", 0) + 1
+        cooldown = min(self.max_cooldown, self.base_cooldown * 2 ** (token_state["failures"] - 1))
+        token_state["until"] = time.time() + cooldown
+        self._save_state(state)
+        return cooldown
+
+    def record_success(self, service: str, provider_name: str, value: str):
+        """凭证使用成功，清除其失败计数"""
+        state = self._load_state()
+        tokens = state.get(f"{service}/{provider_name}", {}).get("tokens", {})
+        if tokens.pop(credential_id(value), None) is not None:
+            self._save_state(state)
+
+    def status(self, service: str, provider_name: str, provider: Dict) -> List[Dict]:
+        """
+        返回每个凭证的状态
+
+        Returns:
+            [{"value", "quota", "failures", "cooldown", "last"}]，cooldown 为剩余冷却秒数
+        """
+        now = time.time()
+        entry_state = self._load_state().get(f"{service}/{provider_name}", {})
+        tokens = entry_state.get("tokens", {})
+        result = []
+        for entry in credential_entries(service, provider):
+            token_id = credential_id(entry["value"])
+            token_state = tokens.get(token_id, {})
+            result.append(dict(
+                entry,
+                failures=token_state.get("failures", 0),
+                cooldown=max(0.0, token_state.get("until", 0) - now),
+                last=token_id == entry_state.get("last"),
+            ))
+        return result
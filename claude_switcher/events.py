@@ -0,0 +1,179 @@
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from claude_switcher.fileutil import inherit_owner, make_dirs
+
+# 单个日志文件的默认大小上限与保留的轮转文件数
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+
+# 会改变当前中转商的事件类型
+SWITCH_KINDS = ("switch", "rollback")
+
+
+class EventLog:
+    """
+    追加写入的结构化事件日志（JSONL），记录每次切换、探测及其失败
+
+    日志达到 max_bytes 后按 events.jsonl -> events.jsonl.1 -> ... 的方式轮转，
+    最多保留 backups 个历史文件，因此总大小有上限。
+    """
+
+    def __init__(self, config_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES, backups: int = DEFAULT_BACKUPS):
+        self.config_dir = config_dir
+        self.log_file = config_dir / "events.jsonl"
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotated(self, index: int) -> Path:
+        return self.log_file.with_name(f"{self.log_file.name}.{index}")
+
+    def _rotate(self):
+        """轮转日志文件"""
+        for index in range(self.backups - 1, 0, -1):
+            source = self._rotated(index)
+            if source.exists():
+                os.replace(source, self._rotated(index + 1))
+        if self.backups > 0:
+            os.replace(self.log_file, self._rotated(1))
+        else:
+            self.log_file.unlink()
+
+    def record(self, kind: str, service: str, **fields):
+        """
+        追加一条事件
+
+        Args:
+            kind: 事件类型（switch / rollback / probe）
+            service: 服务类型（claude / codex）
+            fields: 其他字段，如 provider、from、to、durations、success、error
+        """
+        event = {"ts": round(time.time(), 3), "kind": kind, "service": service}
+        event.update(fields)
+        line = (json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+        try:
+            make_dirs(self.log_file.parent)
+            if self.log_file.exists() and self.log_file.stat().st_size + len(line) > self.max_bytes:
+                self._rotate()
+            created = not self.log_file.exists()
+            with open(self.log_file, 'ab') as f:
+                f.write(line)
+            if created:
+                inherit_owner(self.log_file)
+        except OSError:
+            # 事件日志只用于统计，写入失败不影响主流程
+            pass
+
+        # 指标模块依赖本模块的 SWITCH_KINDS，在这里导入避免循环导入
+        from claude_switcher.metrics import MetricsStore
+        try:
+            MetricsStore(self.config_dir).observe(event)
+        except OSError:
+            pass
+
+    def start(self, kind: str, service: str, **fields) -> "EventRecorder":
+        """开始记录一个分阶段计时的事件"""
+        return EventRecorder(self, kind, service, fields)
+
+    def files(self) -> List[Path]:
+        """按从旧到新的顺序返回所有日志文件"""
+        candidates = [self._rotated(index) for index in range(self.backups, 0, -1)] + [self.log_file]
+        return [path for path in candidates if path.exists()]
+
+    def iter_events(self) -> Iterator[Dict]:
+        """按时间顺序逐行读取事件，不会一次性加载整个日志"""
+        for path in self.files():
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # 跳过写入中断产生的不完整行
+                        continue
+
+
+class EventRecorder:
+    """分阶段计时，结束时写入一条事件"""
+
+    def __init__(self, log: EventLog, kind: str, service: str, fields: Dict):
+        self.log = log
+        self.kind = kind
+        self.service = service
+        self.fields = fields
+        self.durations: Dict[str, float] = {}
+        self._start = self._last = time.monotonic()
+
+    def stage(self, name: str):
+        """记录从上一阶段结束到现在的耗时"""
+        now = time.monotonic()
+        self.durations[name] = round(now - self._last, 6)
+        self._last = now
+
+    def finish(self, success: bool, error: Optional[str] = None, **fields):
+        """写入事件"""
+        self.fields.update(fields)
+        self.durations["total"] = round(time.monotonic() - self._start, 6)
+        if error:
+            self.fields["error"] = error
+        self.log.record(self.kind, self.service, durations=self.durations, success=success, **self.fields)
+
+
+def aggregate(events: Iterator[Dict], service: Optional[str] = None, now: Optional[float] = None) -> Dict:
+    """
+    流式汇总事件
+
+    Returns:
+        {"service/provider": {"switches", "time_in_use", "events", "failures",
+                              "failure_rate", "median_switch_latency"}}
+    """
+    now = time.time() if now is None else now
+    stats: Dict[str, Dict] = {}
+    active: Dict[str, tuple] = {}
+
+    def entry(svc: str, provider: str) -> Dict:
+        key = f"{svc}/{provider}"
+        if key not in stats:
+            stats[key] = {"switches": 0, "time_in_use": 0.0, "events": 0, "failures": 0, "switch_latencies": []}
+        return stats[key]
+
+    for event in events:
+        svc = event.get("service")
+        if not svc or (service and svc != service):
+            continue
+        is_switch = event.get("kind") in SWITCH_KINDS
+        provider = event.get("to") if is_switch else event.get("provider")
+
+        if is_switch and event.get("success"):
+            # 结束上一个中转商的使用时段
+            if svc in active:
+                previous, since = active.pop(svc)
+                entry(svc, previous)["time_in_use"] += max(0.0, event["ts"] - since)
+            if provider:
+                active[svc] = (provider, event["ts"])
+
+        if not provider:
+            continue
+        item = entry(svc, provider)
+        item["events"] += 1
+        if not event.get("success"):
+            item["failures"] += 1
+        elif event.get("kind") == "switch":
+            item["switches"] += 1
+            total = (event.get("durations") or {}).get("total")
+            if total is not None:
+                item["switch_latencies"].append(total)
+
+    for svc, (provider, since) in active.items():
+        entry(svc, provider)["time_in_use"] += max(0.0, now - since)
+
+    for item in stats.values():
+        latencies = item.pop("switch_latencies")
+        item["median_switch_latency"] = statistics.median(latencies) if latencies else None
+        item["failure_rate"] = item["failures"] / item["events"] if item["events"] else 0.0
+
+    return stats
@@ -0,0 +1,90 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Union
+
+# 进程 umask 只在导入时读取一次（os.umask 的读取方式会短暂修改全局状态，不能在多线程写入时调用）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# fleet 以 root 身份修改多个用户的主目录：此时新建或替换的文件需要交还给目标目录的属主，
+# 否则 config.json（600 权限）等文件之后无法被该用户读取。非 root 运行时文件本来就属于当前用户。
+_IS_ROOT = hasattr(os, "geteuid") and os.geteuid() == 0
+
+
+def make_dirs(path: Path):
+    """创建目录及缺少的上级目录；以 root 身份运行时，新建的目录沿用最近的已有上级目录的属主"""
+    path = Path(path)
+    missing = []
+    existing = path
+    while not existing.exists() and existing != existing.parent:
+        missing.append(existing)
+        existing = existing.parent
+    path.mkdir(parents=True, exist_ok=True)
+    if _IS_ROOT and missing:
+        owner = existing.stat()
+        for directory in missing:
+            os.chown(directory, owner.st_uid, owner.st_gid)
+
+
+def inherit_owner(path: Path):
+    """以 root 身份运行时，将文件的属主设为所在目录的属主（用于追加写入、复制等方式新建的文件）"""
+    if not _IS_ROOT:
+        return
+    owner = Path(path).parent.stat()
+    current = os.stat(path)
+    if (current.st_uid, current.st_gid) != (owner.st_uid, owner.st_gid):
+        os.chown(path, owner.st_uid, owner.st_gid)
+
+
+def atomic_write(path: Path, data: Union[str, bytes], mode: Optional[int] = None):
+    """
+    原子写入文件：先写入同目录下的临时文件，再通过 os.replace 替换目标文件
+
+    Args:
+        path: 目标文件路径
+        data: 文件内容（str 按 UTF-8 编码）
+        mode: 文件权限；为 None 时沿用原文件权限（原文件不存在则使用默认权限）
+
+    以 root 身份运行时，替换后的文件保持原文件的属主，新建的文件沿用所在目录的属主。
+    """
+    # 解析符号链接，避免用普通文件覆盖掉指向 dotfiles 仓库的链接
+    path = Path(path).resolve()
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    existing = path.stat() if path.exists() else None
+    if mode is None and existing is not None:
+        mode = existing.st_mode & 0o777
+
+    make_dirs(path.parent)
+    owner = existing if existing is not None else (path.parent.stat() if _IS_ROOT else None)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_name, mode)
+        else:
+            # mkstemp 默认创建 600 权限的文件，这里恢复为受 umask 约束的常规权限
+            os.chmod(tmp_name, 0o666 & ~_UMASK)
+        if _IS_ROOT:
+            os.chown(tmp_name, owner.st_uid, owner.st_gid)
+        os.replace(tmp_name, str(path))
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def shell_path(path: Path) -> str:
+    """将路径转换为 shell 脚本中使用的形式（位于 HOME 下时使用 $HOME 前缀）"""
+    path = Path(path)
+    try:
+        return '"$HOME/' + str(path.relative_to(Path.home())) + '"'
+    except ValueError:
+        return '"' + str(path) + '"'
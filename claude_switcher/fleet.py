@@ -0,0 +1,105 @@
+import argparse
+import contextlib
+import glob
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+
+
+def resolve_homes(specs: List[str]) -> List[str]:
+    """
+    解析目标主目录列表
+
+    每个参数可以是一个文件（每行一个目录，忽略空行和 # 注释），也可以是 glob 模式。
+    文件中列出的目录即使不存在也会保留，以便在结果中报告为失败。
+    """
+    homes: List[str] = []
+    for spec in specs:
+        path = Path(spec).expanduser()
+        if path.is_file():
+            with open(path, 'r', encoding='utf-8') as f:
+                candidates = [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+        else:
+            candidates = [match for match in sorted(glob.glob(str(path))) if Path(match).is_dir()]
+        for candidate in candidates:
+            home = str(Path(candidate).expanduser())
+            if home not in homes:
+                homes.append(home)
+    return homes
+
+
+def _error_line(output: str) -> Optional[str]:
+    """从命令输出中提取错误信息"""
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    for line in lines:
+        if line.startswith("错误") or "出错" in line:
+            return line
+    return lines[-1] if lines else None
+
+
+def apply_switch(home: str, service: str, provider: str, provider_entry: Optional[Dict] = None) -> Dict:
+    """
+    在一个主目录上执行切换（在进程池的子进程中运行）
+
+    Args:
+        home: 目标主目录
+        service: 服务类型（claude / codex）
+        provider: 中转商名称
+        provider_entry: 若提供，先将该中转商配置写入目标的 config.json
+
+    Returns:
+        {"home", "ok", "exit_code", "elapsed", "error"}
+    """
+    # 延迟导入，避免与 cli 模块循环导入
+    from claude_switcher.backends import load_backend_class
+    from claude_switcher.cli import backend_switch
+    from claude_switcher.config import ConfigManager
+
+    start = time.monotonic()
+    output = io.StringIO()
+    exit_code = 1
+    error = None
+
+    try:
+        if not Path(home).is_dir():
+            raise FileNotFoundError(f"目录不存在: {home}")
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            config_mgr = ConfigManager(home=Path(home))
+            backend = load_backend_class(service)(home=Path(home))
+            if provider_entry is not None:
+                config_mgr.update_provider_entries({backend.provider_section: {provider: provider_entry}})
+            args = argparse.Namespace(
+                provider=provider,
+                backend_service=service,
+                config_mgr=config_mgr,
+                backends={service: backend},
+            )
+            exit_code = backend_switch(args) or 0
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    if exit_code != 0 and error is None:
+        error = _error_line(output.getvalue()) or f"退出码 {exit_code}"
+
+    return {
+        "home": home,
+        "ok": exit_code == 0 and error is None,
+        "exit_code": exit_code,
+        "elapsed": time.monotonic() - start,
+        "error": error,
+    }
+
+
+def run_fleet(homes: List[str], service: str, provider: str, provider_entry: Optional[Dict] = None,
+              workers: Optional[int] = None) -> Iterator[Dict]:
+    """使用进程池并行切换所有目标，按完成顺序返回结果"""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(apply_switch, home, service, provider, provider_entry)
+            for home in homes
+        ]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,38 @@
+import time
+import urllib.error
+import urllib.request
+from typing import Dict
+
+
+def probe_url(url: str, timeout: float = 5.0) -> Dict:
+    """
+    探测中转商接口是否可用
+
+    发送一次 GET 请求并记录收到响应头的耗时。能返回响应即认为服务在线
+    （401/404 等说明中转服务本身可达），429 与 5xx 视为失败。
+
+    Returns:
+        {"ok": bool, "latency": 秒, "status": HTTP 状态码或 None, "error": 错误描述或 None}
+    """
+    request = urllib.request.Request(url, method="GET", headers={"User-Agent": "vibe-switcher"})
+    start = time.monotonic()
+    status = None
+    error = None
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception as e:
+        error = type(e).__name__ if not str(e) else f"{type(e).__name__}: {e}"
+    latency = time.monotonic() - start
+
+    if status is not None and (status == 429 or status >= 500):
+        error = f"HTTP {status}"
+
+    return {
+        "ok": error is None,
+        "latency": latency,
+        "status": status,
+        "error": error,
+    }
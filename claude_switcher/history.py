@@ -0,0 +1,223 @@
+import hashlib
+import json
+import re
+import struct
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from claude_switcher.fileutil import atomic_write, inherit_owner, make_dirs
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，退化为不加锁
+    fcntl = None
+
+# 索引文件中每条记录占用的字节数（大端无符号 64 位整数，表示记录在目录文件中的偏移）
+_INDEX_ENTRY = struct.Struct(">Q")
+
+
+class HistoryManager:
+    """
+    管理切换历史
+
+    由三部分组成:
+        catalog.jsonl  追加写入的切换记录，每行一条 JSON
+        catalog.idx    定长偏移索引，第 i 条记录的偏移位于 i * 8 字节处
+        objects/       按内容哈希存放的文件快照（zlib 压缩，相同内容只保存一份）
+
+    查找第 N 条记录只需一次索引读取和一次目录读取，与历史记录数量无关。
+    """
+
+    def __init__(self, config_dir: Path):
+        self.history_dir = config_dir / "history"
+        self.catalog_file = self.history_dir / "catalog.jsonl"
+        self.index_file = self.history_dir / "catalog.idx"
+        self.objects_dir = self.history_dir / "objects"
+        self.lock_file = self.history_dir / "catalog.lock"
+
+    def _ensure_history_dir(self):
+        """确保历史目录存在"""
+        make_dirs(self.objects_dir)
+
+    @contextmanager
+    def _locked(self):
+        """watch 与手动切换可能同时追加记录，目录与索引的追加需要互斥"""
+        created = not self.lock_file.exists()
+        with open(self.lock_file, 'a') as f:
+            if created:
+                inherit_owner(self.lock_file)
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def snapshot(self, file_path: Path) -> Optional[str]:
+        """
+        保存文件当前内容的快照
+
+        Returns:
+            内容哈希；文件不存在时返回 None
+        """
+        if not file_path.exists():
+            return None
+
+        data = file_path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not object_path.exists():
+            self._ensure_history_dir()
+            atomic_write(object_path, zlib.compress(data), mode=0o600)
+        return digest
+
+    def snapshot_files(self, file_paths: List[Path]) -> Dict[str, Optional[str]]:
+        """批量保存快照，返回 {文件路径: 内容哈希}"""
+        return {str(path): self.snapshot(path) for path in file_paths}
+
+    def load_object(self, digest: str) -> bytes:
+        """读取快照内容"""
+        return zlib.decompress(self._object_path(digest).read_bytes())
+
+    def record(self, service: str, before: Optional[str], after: Optional[str],
+               files: Dict[str, Optional[str]], action: str = "switch", failed: bool = False) -> int:
+        """
+        追加一条切换记录
+
+        Args:
+            service: 服务类型（claude / codex）
+            before: 切换前的中转商
+            after: 切换后的中转商
+            files: 被修改的文件及其修改前内容的哈希
+            action: 记录类型（switch / rollback）
+            failed: 切换失败，但配置文件可能已被部分修改（仍可通过 rollback 恢复）
+
+        Returns:
+            记录序号（从 0 开始）
+        """
+        self._ensure_history_dir()
+        # 时间戳在锁内生成，保证追加顺序与时间顺序一致（find_by_timestamp 依赖这一点）
+        with self._locked():
+            entry = {
+                "ts": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                "action": action,
+                "service": service,
+                "from": before,
+                "to": after,
+                "files": files,
+            }
+            if failed:
+                entry["failed"] = True
+            line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+            # 先写目录再写索引：中途失败时目录中多出的行没有索引指向，不会被读到
+            created = not self.index_file.exists()
+            seq = self.count()
+            with open(self.catalog_file, 'ab') as f:
+                f.seek(0, 2)
+                offset = f.tell()
+                f.write(line)
+            with open(self.index_file, 'ab') as f:
+                f.write(_INDEX_ENTRY.pack(offset))
+            if created:
+                inherit_owner(self.catalog_file)
+                inherit_owner(self.index_file)
+
+        return seq
+
+    def count(self) -> int:
+        """历史记录总数"""
+        if not self.index_file.exists():
+            return 0
+        return self.index_file.stat().st_size // _INDEX_ENTRY.size
+
+    def get(self, seq: int) -> Optional[Dict]:
+        """按序号读取记录"""
+        if seq < 0 or seq >= self.count():
+            return None
+        with open(self.index_file, 'rb') as f:
+            f.seek(seq * _INDEX_ENTRY.size)
+            (offset,) = _INDEX_ENTRY.unpack(f.read(_INDEX_ENTRY.size))
+        with open(self.catalog_file, 'rb') as f:
+            f.seek(offset)
+            entry = json.loads(f.readline().decode('utf-8'))
+        entry["seq"] = seq
+        return entry
+
+    def recent(self, limit: int) -> Iterator[Tuple[int, Dict]]:
+        """
+        从最新的记录开始倒序遍历
+
+        Yields:
+            (N, entry)，N 为 rollback 使用的倒数序号（1 表示最近一次）
+        """
+        total = self.count()
+        for n in range(1, min(limit, total) + 1):
+            yield n, self.get(total - n)
+
+    @staticmethod
+    def _normalize_timestamp(value: str) -> str:
+        """将 2024-10-02T15:30:45 / 20241002_153045 / 20241002 等格式统一为 14 位数字"""
+        digits = re.sub(r'\D', '', value)
+        return digits[:14].ljust(14, '0')
+
+    def find_by_timestamp(self, value: str) -> Optional[Dict]:
+        """
+        二分查找时间不早于给定时间的第一条记录
+
+        回滚到该记录之前的状态，即恢复到给定时间点的配置。
+        记录按追加顺序写入，时间戳单调递增。
+        """
+        target = self._normalize_timestamp(value)
+        low, high = 0, self.count()
+        while low < high:
+            mid = (low + high) // 2
+            if self._normalize_timestamp(self.get(mid)["ts"]) < target:
+                low = mid + 1
+            else:
+                high = mid
+        return self.get(low)
+
+    def resolve(self, target: Optional[str]) -> Optional[Dict]:
+        """
+        解析 rollback 目标
+
+        Args:
+            target: None 表示最近一次；纯数字且少于 8 位表示倒数第 N 次；其余按时间戳处理
+        """
+        if target is None:
+            return self.get(self.count() - 1)
+        if target.isdigit() and len(target) < 8:
+            n = int(target)
+            if n < 1:
+                return None
+            return self.get(self.count() - n)
+        return self.find_by_timestamp(target)
+
+    def restore_files(self, entry: Dict) -> List[str]:
+        """
+        将记录中的文件原子地恢复为切换前的内容
+
+        Returns:
+            已恢复的文件列表
+        """
+        restored = []
+        for path_str, digest in entry["files"].items():
+            path = Path(path_str)
+            if digest is None:
+                # 切换前文件不存在，恢复时删除
+                if path.exists():
+                    path.unlink()
+                    restored.append(path_str)
+                continue
+            atomic_write(path, self.load_object(digest))
+            restored.append(path_str)
+        return restored
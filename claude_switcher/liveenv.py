@@ -0,0 +1,108 @@
+from pathlib import Path
+from typing import Dict, Optional
+
+from claude_switcher.fileutil import atomic_write, shell_path
+
+# 环境变量名的默认值（可在 config.json 的 env_vars 中修改）
+DEFAULT_ENV_VARS = {
+    "token": "ANTHROPIC_AUTH_TOKEN",
+    "base_url": "ANTHROPIC_BASE_URL",
+}
+
+
+def _quote(value: str, fish: bool) -> str:
+    """按 shell 语法用单引号包裹（fish 的单引号内支持 \\ 与 \' 转义，POSIX 不支持）"""
+    if fish:
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+    return "'" + value.replace("'", "'\\''") + "'"
+
+
+class LiveEnv:
+    """
+    将 Claude Code 的环境变量同步到已打开的终端
+
+    切换时写入两个很小的环境文件（POSIX 与 fish 语法）并递增代数文件中的计数。
+    shell hook 在每次显示提示符时只读取代数文件这一行，计数变化时才 source 环境文件，
+    无需重新加载体积较大的 rc 文件。
+    """
+
+    def __init__(self, config_dir: Path):
+        self.env_dir = config_dir / "env"
+        self.generation_file = self.env_dir / "generation"
+        self.posix_file = self.env_dir / "claude.env"
+        self.fish_file = self.env_dir / "claude.fish"
+
+    def generation(self) -> int:
+        try:
+            return int(self.generation_file.read_text(encoding='utf-8').strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def render(token: Optional[str], base_url: Optional[str], env_vars: Dict[str, str], fish: bool) -> str:
+        """生成环境文件内容；token 为 None 时清除变量"""
+        names = {key: env_vars.get(key, default) for key, default in DEFAULT_ENV_VARS.items()}
+        values = {"token": token, "base_url": base_url}
+        lines = ["# Generated by vibe-switcher"]
+        for key, name in names.items():
+            if token is None:
+                lines.append(f"set -e {name}" if fish else f"unset {name}")
+            elif fish:
+                lines.append(f"set -gx {name} {_quote(values[key], fish)}")
+            else:
+                lines.append(f"export {name}={_quote(values[key], fish)}")
+        return "\n".join(lines) + "\n"
+
+    def publish(self, token: Optional[str], base_url: Optional[str], env_vars: Dict[str, str]) -> int:
+        """
+        写入环境文件并递增代数
+
+        Returns:
+            新的代数
+        """
+        atomic_write(self.posix_file, self.render(token, base_url, env_vars, fish=False), mode=0o600)
+        atomic_write(self.fish_file, self.render(token, base_url, env_vars, fish=True), mode=0o600)
+        generation = self.generation() + 1
+        # 环境文件写完后再更新代数，hook 看到新代数时读到的一定是新内容
+        atomic_write(self.generation_file, f"{generation}\n")
+        return generation
+
+
+def generate_hook(shell: str, live_env: LiveEnv) -> str:
+    """
+    生成 precmd / PROMPT_COMMAND hook
+
+    hook 只使用 shell 内建命令，每次提示符只读取一行代数文件，不启动任何进程。
+    """
+    generation = shell_path(live_env.generation_file)
+    if shell == "fish":
+        return f'''# vibe-switcher live env hook
+function __vibe_switcher_sync --on-event fish_prompt
+    test -r {generation}; or return
+    read -l _vs_gen < {generation}
+    if test "$_vs_gen" != "$__vibe_switcher_gen"
+        set -g __vibe_switcher_gen $_vs_gen
+        source {shell_path(live_env.fish_file)}
+    end
+end
+'''
+
+    function = f'''# vibe-switcher live env hook
+__vibe_switcher_sync() {{
+    local _vs_gen
+    {{ IFS= read -r _vs_gen; }} 2>/dev/null < {generation} || return 0
+    if [ "$_vs_gen" != "${{__vibe_switcher_gen-}}" ]; then
+        __vibe_switcher_gen=$_vs_gen
+        . {shell_path(live_env.posix_file)}
+    fi
+}}
+'''
+    if shell == "zsh":
+        return function + '''autoload -Uz add-zsh-hook
+add-zsh-hook precmd __vibe_switcher_sync
+'''
+    return function + '''case ";${PROMPT_COMMAND-};" in
+    *";__vibe_switcher_sync;"*) ;;
+    *) PROMPT_COMMAND="__vibe_switcher_sync${PROMPT_COMMAND:+;$PROMPT_COMMAND}" ;;
+esac
+'''
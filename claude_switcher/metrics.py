@@ -0,0 +1,245 @@
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from claude_switcher.events import SWITCH_KINDS
+from claude_switcher.fileutil import atomic_write, inherit_owner, make_dirs
+from claude_switcher.state import StateFile
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，退化为不加锁
+    fcntl = None
+
+# 切换耗时与探测延迟的直方图桶上限（秒）
+SWITCH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROBE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+
+PREFIX = "vibe_switcher"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _observe(histogram: Dict, value: float, buckets: Tuple[float, ...]) -> Dict:
+    """向直方图记录一个值（counts 为非累积计数，最后一项对应 +Inf）"""
+    counts = histogram.setdefault("counts", [0] * (len(buckets) + 1))
+    index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+    counts[index] += 1
+    histogram["sum"] = histogram.get("sum", 0.0) + value
+    return histogram
+
+
+class MetricFamily:
+    """
+    一个指标族
+
+    counter 的样本名带 _total 后缀：Prometheus 文本格式中指标族名称也带 _total，
+    OpenMetrics 中指标族名称不带后缀。
+    """
+
+    def __init__(self, name: str, kind: str, help_text: str, unit: str = ""):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.unit = unit
+        self.samples: List[str] = []
+
+    def add(self, value: float, suffix: str = "", **labels):
+        if self.kind == "counter" and not suffix:
+            suffix = "_total"
+        self.samples.append(f"{self.name}{suffix}{_labels(labels)} {_number(value)}")
+
+    def add_histogram(self, histogram: Dict, buckets: Tuple[float, ...], **labels):
+        cumulative = 0
+        for bound, count in zip(list(buckets) + ["+Inf"], histogram["counts"]):
+            cumulative += count
+            le = bound if bound == "+Inf" else repr(float(bound))
+            self.add(cumulative, "_bucket", **dict(labels, le=le))
+        self.add(cumulative, "_count", **labels)
+        self.add(round(histogram["sum"], 6), "_sum", **labels)
+
+    def render(self, openmetrics: bool = False) -> List[str]:
+        name = self.name
+        if self.kind == "counter" and not openmetrics:
+            name += "_total"
+        lines = [f"# HELP {name} {self.help_text}", f"# TYPE {name} {self.kind}"]
+        if self.unit and openmetrics:
+            lines.append(f"# UNIT {name} {self.unit}")
+        return lines + self.samples
+
+
+def render(families: Iterable[MetricFamily], openmetrics: bool = False) -> str:
+    """
+    生成指标文本
+
+    Args:
+        openmetrics: 为 True 时生成 OpenMetrics 格式（/metrics 服务），否则生成
+                     node_exporter textfile collector 解析的 Prometheus 文本格式
+    """
+    lines = []
+    for family in families:
+        lines.extend(family.render(openmetrics))
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsStore:
+    """
+    由事件日志增量维护的指标，并导出为 Prometheus 文本格式的指标文件
+
+    每条事件写入事件日志时调用 observe 更新 metrics.json 中的计数与直方图，
+    随后原子地重写文本文件，node_exporter 的 textfile collector 可以直接采集。
+    文本文件默认位于配置目录下的 metrics.prom，可通过 config.json 的 metrics_textfile 修改。
+    """
+
+    def __init__(self, config_dir: Path, textfile: Optional[Path] = None):
+        self.config_dir = config_dir
+        self.state_file = config_dir / "metrics.json"
+        self.lock_file = config_dir / "metrics.lock"
+        self._textfile = textfile
+
+    @property
+    def textfile(self) -> Path:
+        if self._textfile is None:
+            try:
+                with open(self.config_dir / "config.json", 'r', encoding='utf-8') as f:
+                    configured = json.load(f).get("metrics_textfile")
+            except (OSError, ValueError):
+                configured = None
+            self._textfile = Path(configured).expanduser() if configured else self.config_dir / "metrics.prom"
+        return self._textfile
+
+    @contextmanager
+    def _locked(self):
+        """多个进程（watch 与手动切换）可能同时更新计数"""
+        make_dirs(self.config_dir)
+        created = not self.lock_file.exists()
+        with open(self.lock_file, 'a') as f:
+            if created:
+                inherit_owner(self.lock_file)
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def load(self) -> Dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def apply(state: Dict, event: Dict):
+        """
+        将一条事件计入指标
+
+        state 结构:
+            switches: {service: {kind: {"success": n, "failure": n}}}
+            switch_duration: {service: 直方图}
+            probe_latency: {service: {provider: 直方图}}
+            failures: {service: {provider: {kind: n}}}
+        """
+        service = event.get("service")
+        kind = event.get("kind")
+        if not service or not kind:
+            return
+        success = bool(event.get("success"))
+        durations = event.get("durations") or {}
+        is_switch = kind in SWITCH_KINDS
+        provider = event.get("to") if is_switch else event.get("provider")
+
+        if is_switch:
+            results = state.setdefault("switches", {}).setdefault(service, {}).setdefault(kind, {})
+            result = "success" if success else "failure"
+            results[result] = results.get(result, 0) + 1
+            if success and durations.get("total") is not None:
+                _observe(state.setdefault("switch_duration", {}).setdefault(service, {}),
+                         durations["total"], SWITCH_BUCKETS)
+        elif kind == "probe" and provider and durations.get("probe") is not None:
+            _observe(state.setdefault("probe_latency", {}).setdefault(service, {}).setdefault(provider, {}),
+                     durations["probe"], PROBE_BUCKETS)
+
+        if not success and provider:
+            counts = state.setdefault("failures", {}).setdefault(service, {}).setdefault(provider, {})
+            counts[kind] = counts.get(kind, 0) + 1
+
+    def families(self, state: Optional[Dict] = None) -> List[MetricFamily]:
+        """根据指标状态与当前中转商生成指标族"""
+        state = self.load() if state is None else state
+
+        switches = MetricFamily(f"{PREFIX}_switches", "counter", "Provider switches by service, kind and result.")
+        for service, kinds in sorted(state.get("switches", {}).items()):
+            for kind, results in sorted(kinds.items()):
+                for result, count in sorted(results.items()):
+                    switches.add(count, service=service, kind=kind, result=result)
+
+        durations = MetricFamily(f"{PREFIX}_switch_duration_seconds", "histogram",
+                                 "Duration of successful switches.", unit="seconds")
+        for service, histogram in sorted(state.get("switch_duration", {}).items()):
+            durations.add_histogram(histogram, SWITCH_BUCKETS, service=service)
+
+        probes = MetricFamily(f"{PREFIX}_probe_latency_seconds", "histogram",
+                              "Median provider probe latency per health-check window.", unit="seconds")
+        for service, providers in sorted(state.get("probe_latency", {}).items()):
+            for provider, histogram in sorted(providers.items()):
+                probes.add_histogram(histogram, PROBE_BUCKETS, service=service, provider=provider)
+
+        failures = MetricFamily(f"{PREFIX}_failures", "counter", "Failed switches and probes by provider.")
+        for service, providers in sorted(state.get("failures", {}).items()):
+            for provider, kinds in sorted(providers.items()):
+                for kind, count in sorted(kinds.items()):
+                    failures.add(count, service=service, provider=provider, kind=kind)
+
+        active = MetricFamily(f"{PREFIX}_active_provider", "gauge", "Currently active provider (always 1).")
+        for service, provider in sorted(StateFile(self.config_dir).read().items()):
+            if provider:
+                active.add(1, service=service, provider=provider)
+
+        return [switches, durations, probes, failures, active]
+
+    def write_textfile(self, state: Optional[Dict] = None):
+        """原子地重写文本文件，内容未变化时不写入"""
+        content = render(self.families(state))
+        try:
+            if self.textfile.read_text(encoding='utf-8') == content:
+                return
+        except OSError:
+            pass
+        atomic_write(self.textfile, content)
+
+    def observe(self, event: Dict):
+        """记录一条事件并更新文本文件"""
+        with self._locked():
+            state = self.load()
+            self.apply(state, event)
+            atomic_write(self.state_file, json.dumps(state, separators=(',', ':')))
+            self.write_textfile(state)
+
+    def rebuild(self, events: Iterable[Dict]) -> Dict:
+        """从完整的事件日志重新计算指标"""
+        state: Dict = {}
+        for event in events:
+            self.apply(state, event)
+        with self._locked():
+            atomic_write(self.state_file, json.dumps(state, separators=(',', ':')))
+            self.write_textfile(state)
+        return state
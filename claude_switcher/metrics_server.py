@@ -0,0 +1,57 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+
+from claude_switcher.metrics import MetricFamily, MetricsStore, render
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics 返回 OpenMetrics 文本"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render(self.server.collect(), openmetrics=True).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    在后台线程中提供 /metrics，供长时间运行的模式（watch、mock-server、replay）直接被采集
+
+    除指标文件中的内容外，extra 可以追加当前进程自身的指标（如模拟服务器的请求数）。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, store: MetricsStore,
+                 extra: Optional[Callable[[], List[MetricFamily]]] = None):
+        super().__init__((host, port), MetricsHandler)
+        self.store = store
+        self.extra = extra
+        self._thread: Optional[threading.Thread] = None
+
+    def collect(self) -> List[MetricFamily]:
+        families = self.store.families()
+        if self.extra is not None:
+            families.extend(self.extra())
+        return families
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
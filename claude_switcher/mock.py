@@ -0,0 +1,304 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# 模拟的接口，以及各接口对应的请求路径
+ROUTES = {
+    "messages": ("/v1/messages",),
+    "responses": ("/responses", "/v1/responses"),
+    "chat": ("/chat/completions", "/v1/chat/completions"),
+}
+
+# 每个接口可单独配置的参数及默认值
+PROFILE_DEFAULTS = {
+    "latency": 0.2,          # 首 token 前的延迟（秒）
+    "jitter": 0.05,          # 延迟的随机抖动幅度（秒）
+    "tokens_per_sec": 50.0,  # 输出 token 的速度
+    "output_tokens": 64,     # 每个响应的输出 token 数（不超过请求中的上限）
+    "error_rate": 0.0,       # 返回 500 的概率
+    "rate_limit": 0.0,       # 每秒允许的请求数，超出时返回 429；0 表示不限制
+}
+
+MOCK_WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit")
+
+
+def parse_route_overrides(specs: List[str]) -> Dict[str, Dict]:
+    """
+    解析按接口覆盖的参数
+
+    格式为 "<route>:<key>=<value>,<key>=<value>"，如 "messages:latency=0.5,error_rate=0.1"。
+    """
+    overrides: Dict[str, Dict] = {}
+    for spec in specs:
+        route, _, assignments = spec.partition(':')
+        if route not in ROUTES:
+            raise ValueError(f"未知的接口: {route}（可选: {', '.join(ROUTES)}）")
+        for assignment in assignments.split(','):
+            if not assignment.strip():
+                continue
+            key, _, value = assignment.partition('=')
+            key = key.strip().replace('-', '_')
+            if key not in PROFILE_DEFAULTS:
+                raise ValueError(f"未知的参数: {key}（可选: {', '.join(PROFILE_DEFAULTS)}）")
+            overrides.setdefault(route, {})[key] = type(PROFILE_DEFAULTS[key])(value)
+    return overrides
+
+
+class RouteProfile:
+    """单个接口的模拟行为，包含用于 429 限流的令牌桶"""
+
+    def __init__(self, latency: float, jitter: float, tokens_per_sec: float, output_tokens: int,
+                 error_rate: float, rate_limit: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._allowance = rate_limit
+        self._last = time.monotonic()
+
+    def admit(self) -> bool:
+        """令牌桶限流，返回本次请求是否被允许"""
+        if self.rate_limit <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate_limit, self._allowance + (now - self._last) * self.rate_limit)
+            self._last = now
+            if self._allowance < 1.0:
+                return False
+            self._allowance -= 1.0
+            return True
+
+    def first_token_delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def token_interval(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def describe(self) -> str:
+        limit = f"{self.rate_limit:g}/s" if self.rate_limit > 0 else "不限"
+        return (f"延迟 {self.latency:g}±{self.jitter:g}s, {self.tokens_per_sec:g} tokens/s, "
+                f"{self.output_tokens} tokens, 错误率 {self.error_rate:.0%}, 限流 {limit}")
+
+
+def build_profiles(defaults: Dict, overrides: Optional[Dict[str, Dict]] = None) -> Dict[str, RouteProfile]:
+    """根据全局参数和按接口覆盖的参数生成各接口的配置"""
+    profiles = {}
+    for route in ROUTES:
+        values = dict(PROFILE_DEFAULTS)
+        values.update({key: value for key, value in defaults.items() if value is not None})
+        values.update((overrides or {}).get(route, {}))
+        profiles[route] = RouteProfile(**values)
+    return profiles
+
+
+def _sse(event: Optional[str], data) -> bytes:
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n".encode('utf-8')
+
+
+class MockRelayHandler(BaseHTTPRequestHandler):
+    """模拟中转商接口，流式响应使用 chunked 编码，连接可以复用"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "vibe-switcher-mock"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        # 供健康探测使用
+        self._send_json(200, {"status": "ok", "routes": list(ROUTES)})
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        route = next((name for name, paths in ROUTES.items() if path in paths), None)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if route is None:
+            self._send_json(404, {"error": {"type": "not_found", "message": f"unknown path {path}"}})
+            return
+        try:
+            request = json.loads(raw.decode('utf-8') or "{}")
+        except ValueError:
+            self._send_json(400, {"error": {"type": "invalid_request_error", "message": "invalid JSON"}})
+            return
+
+        profile = self.server.profiles[route]
+        self.server.count(route)
+        if not profile.admit():
+            self._send_json(429, {"error": {"type": "rate_limit_error", "message": "rate limited"}},
+                            {"Retry-After": "1"})
+            return
+        if random.random() < profile.error_rate:
+            self._send_json(500, {"error": {"type": "api_error", "message": "injected failure"}})
+            return
+
+        limit = request.get("max_tokens") or request.get("max_output_tokens") or profile.output_tokens
+        words = [MOCK_WORDS[i % len(MOCK_WORDS)] + " " for i in range(min(int(limit), profile.output_tokens))]
+        model = request.get("model") or "mock-model"
+
+        time.sleep(profile.first_token_delay())
+        handler = {"messages": self._messages, "responses": self._responses, "chat": self._chat}[route]
+        if not request.get("stream"):
+            time.sleep(profile.token_interval() * len(words))
+            self._send_json(200, handler(model, words, None))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            handler(model, words, profile.token_interval())
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _stream(self, interval: float, events):
+        """逐个发送 SSE 事件；token 增量事件之间按 tokens/秒 间隔"""
+        for is_token, chunk in events:
+            if is_token and interval:
+                time.sleep(interval)
+            self._write_chunk(chunk)
+
+    def _messages(self, model: str, words: List[str], interval: Optional[float]):
+        """Anthropic messages 接口"""
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        usage = {"input_tokens": 10, "output_tokens": len(words)}
+        if interval is None:
+            return {
+                "id": message_id, "type": "message", "role": "assistant", "model": model,
+                "content": [{"type": "text", "text": "".join(words)}],
+                "stop_reason": "end_turn", "stop_sequence": None, "usage": usage,
+            }
+
+        def events():
+            yield False, _sse("message_start", {"type": "message_start", "message": {
+                "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+                "stop_reason": None, "stop_sequence": None, "usage": dict(usage, output_tokens=0)}})
+            yield False, _sse("content_block_start", {
+                "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+            for word in words:
+                yield True, _sse("content_block_delta", {
+                    "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": word}})
+            yield False, _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            yield False, _sse("message_delta", {
+                "type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": len(words)}})
+            yield False, _sse("message_stop", {"type": "message_stop"})
+
+        self._stream(interval, events())
+
+    def _responses(self, model: str, words: List[str], interval: Optional[float]):
+        """OpenAI responses 接口"""
+        response_id = f"resp_{uuid.uuid4().hex[:24]}"
+        item_id = f"msg_{uuid.uuid4().hex[:24]}"
+        text = "".join(words)
+        completed = {
+            "id": response_id, "object": "response", "model": model, "status": "completed",
+            "output": [{"id": item_id, "type": "message", "role": "assistant", "status": "completed",
+                        "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+            "usage": {"input_tokens": 10, "output_tokens": len(words), "total_tokens": 10 + len(words)},
+        }
+        if interval is None:
+            return completed
+
+        def events():
+            yield False, _sse("response.created", {"type": "response.created", "response": dict(
+                completed, status="in_progress", output=[], usage=None)})
+            for word in words:
+                yield True, _sse("response.output_text.delta", {
+                    "type": "response.output_text.delta", "item_id": item_id,
+                    "output_index": 0, "content_index": 0, "delta": word})
+            yield False, _sse("response.output_text.done", {
+                "type": "response.output_text.done", "item_id": item_id,
+                "output_index": 0, "content_index": 0, "text": text})
+            yield False, _sse("response.completed", {"type": "response.completed", "response": completed})
+
+        self._stream(interval, events())
+
+    def _chat(self, model: str, words: List[str], interval: Optional[float]):
+        """OpenAI chat completions 接口"""
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        usage = {"prompt_tokens": 10, "completion_tokens": len(words), "total_tokens": 10 + len(words)}
+        if interval is None:
+            return {
+                "id": completion_id, "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(words)}}],
+                "usage": usage,
+            }
+
+        def chunk(delta: Dict, finish_reason: Optional[str] = None, **extra) -> Dict:
+            return dict({"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}, **extra)
+
+        def events():
+            yield False, _sse(None, chunk({"role": "assistant"}))
+            for word in words:
+                yield True, _sse(None, chunk({"content": word}))
+            yield False, _sse(None, chunk({}, "stop", usage=usage))
+            yield False, _sse(None, "[DONE]")
+
+        self._stream(interval, events())
+
+
+class MockRelayServer(ThreadingHTTPServer):
+    """模拟中转商服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, profiles: Dict[str, RouteProfile], verbose: bool = False):
+        super().__init__((host, port), MockRelayHandler)
+        self.profiles = profiles
+        self.verbose = verbose
+        self.requests: Dict[str, int] = {route: 0 for route in ROUTES}
+        self._count_lock = threading.Lock()
+
+    def count(self, route: str):
+        with self._count_lock:
+            self.requests[route] += 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def provider_entries(self, name: str) -> Dict[str, Dict]:
+        """注册到 config.json 的中转商条目"""
+        return {
+            "providers": {name: {"token": "mock-token", "base_url": self.base_url}},
+            "codex_providers": {name: {
+                "api_key": "mock-key",
+                "base_url": f"{self.base_url}/v1",
+                "network_access": "",
+                "requires_openai_auth": True,
+                "disable_response_storage": True,
+                "wire_api": "responses",
+            }},
+        }
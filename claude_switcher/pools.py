@@ -0,0 +1,183 @@
+import hashlib
+import json
+import random
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from claude_switcher.fileutil import atomic_write
+
+if TYPE_CHECKING:
+    # config 模块依赖本模块的常量，这里只在类型检查时导入
+    from claude_switcher.config import ConfigManager
+
+# 在 switch / exec 中引用中转商池时使用的前缀，如 pool:fast
+POOL_PREFIX = "pool:"
+
+# 服务类型与 config.json 中中转商池字段的对应关系
+POOL_SECTIONS = {
+    "claude": "pools",
+    "codex": "codex_pools",
+}
+
+# 选择策略：按权重随机 / 最久未使用 / 最近失败时间最早
+STRATEGIES = ("weighted", "lru", "least-failures")
+
+
+def parse_members(specs: List[str]) -> Dict[str, int]:
+    """
+    解析成员定义
+
+    支持 "duck:3 fox:1" 或 "duck:3, fox:1" 形式，省略权重时默认为 1。
+    """
+    members: Dict[str, int] = {}
+    for spec in specs:
+        for item in spec.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            name, _, weight = item.partition(':')
+            weight_value = int(weight) if weight else 1
+            if weight_value <= 0:
+                raise ValueError(f"成员 '{name}' 的权重必须为正整数")
+            members[name.strip()] = weight_value
+    if not members:
+        raise ValueError("中转商池至少需要一个成员")
+    return members
+
+
+def build_alias_table(weights: List[float]) -> Tuple[List[float], List[int]]:
+    """
+    使用 Vose 算法构建别名表，之后每次按权重抽样只需 O(1)
+
+    Returns:
+        (prob, alias)
+    """
+    n = len(weights)
+    total = float(sum(weights))
+    scaled = [w * n / total for w in weights]
+    prob = [0.0] * n
+    alias = [0] * n
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s = small.pop()
+        g = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = g
+        scaled[g] = scaled[g] + scaled[s] - 1.0
+        if scaled[g] < 1.0:
+            small.append(g)
+        else:
+            large.append(g)
+
+    for i in large + small:
+        prob[i] = 1.0
+        alias[i] = i
+
+    return prob, alias
+
+
+def pool_hash(pool: Dict) -> str:
+    """计算中转商池定义的哈希，定义变化时才重建别名表"""
+    encoded = json.dumps(pool.get("members", {}), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+class PoolManager:
+    """
+    从中转商池中选择成员
+
+    别名表、最近使用顺序和失败时间保存在 pool_state.json 中，
+    只有池的成员定义变化时才会重建别名表。
+    """
+
+    def __init__(self, config_mgr: "ConfigManager"):
+        self.config_mgr = config_mgr
+        self.state_file = config_mgr.config_dir / "pool_state.json"
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict):
+        atomic_write(self.state_file, json.dumps(state, ensure_ascii=False, separators=(',', ':')))
+
+    def _compiled(self, state: Dict, service: str, name: str, pool: Dict) -> Dict:
+        """获取池的预计算数据，定义变化时重建"""
+        key = f"{service}/{name}"
+        digest = pool_hash(pool)
+        compiled = state.get(key)
+        if compiled and compiled.get("hash") == digest:
+            return compiled
+
+        members = list(pool["members"])
+        prob, alias = build_alias_table([pool["members"][m] for m in members])
+        previous = compiled or {}
+        compiled = {
+            "hash": digest,
+            "members": members,
+            "prob": prob,
+            "alias": alias,
+            # 保留仍在池中成员的使用顺序与失败记录
+            "order": [m for m in previous.get("order", []) if m in members]
+                     + [m for m in members if m not in previous.get("order", [])],
+            "failures": {m: t for m, t in previous.get("failures", {}).items() if m in members},
+        }
+        state[key] = compiled
+        return compiled
+
+    def pick(self, service: str, name: str, strategy: Optional[str] = None) -> str:
+        """
+        从池中选择一个成员
+
+        Args:
+            service: 服务类型（claude / codex）
+            name: 池名称（不含 pool: 前缀）
+            strategy: 选择策略，None 表示使用池定义中的策略
+
+        Raises:
+            KeyError: 池不存在
+            ValueError: 策略无效
+        """
+        pool = self.config_mgr.get_pools(service).get(name)
+        if not pool or not pool.get("members"):
+            raise KeyError(name)
+        strategy = strategy or pool.get("strategy") or "weighted"
+        if strategy not in STRATEGIES:
+            raise ValueError(f"未知的选择策略: {strategy}")
+
+        state = self._load_state()
+        compiled = self._compiled(state, service, name, pool)
+        members = compiled["members"]
+
+        if strategy == "weighted":
+            index = random.randrange(len(members))
+            if random.random() >= compiled["prob"][index]:
+                index = compiled["alias"][index]
+            chosen = members[index]
+        elif strategy == "lru":
+            chosen = compiled["order"][0]
+        else:
+            # 从未失败的成员视为失败时间为 0；相同时按最久未使用的顺序选择
+            rank = {member: i for i, member in enumerate(compiled["order"])}
+            chosen = min(members, key=lambda m: (compiled["failures"].get(m, 0), rank[m]))
+
+        compiled["order"] = [m for m in compiled["order"] if m != chosen] + [chosen]
+        self._save_state(state)
+        return chosen
+
+    def record_failure(self, service: str, member: str):
+        """记录成员失败时间（对包含该成员的所有池生效）"""
+        state = self._load_state()
+        now = time.time()
+        changed = False
+        for name, pool in self.config_mgr.get_pools(service).items():
+            if member in pool.get("members", {}):
+                self._compiled(state, service, name, pool)["failures"][member] = now
+                changed = True
+        if changed:
+            self._save_state(state)
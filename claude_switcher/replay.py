@@ -0,0 +1,291 @@
+import hashlib
+import http.client
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from claude_switcher.fileutil import atomic_write
+
+# 运行模式：只录制 / 只回放 / 命中时回放、未命中时转发并录制
+MODES = ("record", "replay", "auto")
+
+# 计算请求哈希时忽略的字段（会话 ID 等每次运行都会变化的内容）
+DEFAULT_IGNORED_FIELDS = ("metadata", "user")
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 转发请求时不透传的请求头
+HOP_HEADERS = {"host", "content-length", "connection", "keep-alive", "accept-encoding",
+               "transfer-encoding", "upgrade", "proxy-connection"}
+
+# 回放时保留的响应头
+KEPT_RESPONSE_HEADERS = ("content-type", "retry-after", "request-id", "x-request-id")
+
+_HEADER_LEN = struct.Struct(">I")
+
+
+def request_key(method: str, path: str, body: bytes, ignored: Iterable[str] = DEFAULT_IGNORED_FIELDS) -> str:
+    """
+    计算规范化的请求哈希
+
+    查询参数排序；JSON 请求体按键排序并去掉忽略的字段，因此键顺序、空白和会话 ID
+    不同的相同请求会得到同一个哈希。请求头（包括凭证）不参与计算。
+    """
+    parts = urlsplit(path)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    try:
+        payload = json.loads(body.decode('utf-8')) if body else None
+    except ValueError:
+        canonical = body
+    else:
+        if isinstance(payload, dict):
+            payload = {key: value for key, value in payload.items() if key not in ignored}
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    digest = hashlib.sha256()
+    digest.update(f"{method.upper()} {parts.path.rstrip('/')}?{query}\n".encode('utf-8'))
+    digest.update(canonical)
+    return digest.hexdigest()
+
+
+def encode_entry(status: int, headers: Dict[str, str], body: bytes) -> bytes:
+    header = json.dumps({"status": status, "headers": headers}, separators=(',', ':')).encode('utf-8')
+    return _HEADER_LEN.pack(len(header)) + header + body
+
+
+def decode_entry(data: bytes) -> Tuple[int, Dict[str, str], bytes]:
+    (length,) = _HEADER_LEN.unpack_from(data)
+    header = json.loads(data[_HEADER_LEN.size:_HEADER_LEN.size + length].decode('utf-8'))
+    return header["status"], header["headers"], data[_HEADER_LEN.size + length:]
+
+
+class ReplayStore:
+    """
+    内存映射的录制存储，总大小有上限，超出时按 LRU 淘汰
+
+    响应追加写入 store.dat，通过 mmap 读取；index.json 按最近使用顺序（最旧在前）
+    记录每个条目的偏移和长度。淘汰只修改索引，数据文件中的失效空间超过上限后整体压缩一次。
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.data_file = directory / "store.dat"
+        self.index_file = directory / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._map: Optional[mmap.mmap] = None
+        self._dirty = False
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.data_file, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = []
+        for key, offset, length in entries:
+            # 忽略指向数据文件之外的条目（写入中断）
+            if offset + length <= size:
+                self._index[key] = (offset, length)
+        self.live_bytes = sum(length for _, length in self._index.values())
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _mapping(self, end: int) -> mmap.mmap:
+        """确保映射覆盖到 end，数据文件增长后重新映射"""
+        if self._map is None or len(self._map) < end:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            self._index.move_to_end(key)
+            self._dirty = True
+            offset, length = entry
+            return self._mapping(offset + length)[offset:offset + length]
+
+    def put(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(value)
+            self._file.flush()
+            if key in self._index:
+                self.live_bytes -= self._index.pop(key)[1]
+            self._index[key] = (offset, len(value))
+            self.live_bytes += len(value)
+
+            while self.live_bytes > self.max_bytes:
+                _, (_, length) = self._index.popitem(last=False)
+                self.live_bytes -= length
+            if offset + len(value) > 2 * self.max_bytes:
+                self._compact()
+            self._save_index()
+
+    def _compact(self):
+        """只保留有效条目重写数据文件"""
+        temp_file = self.data_file.with_name(self.data_file.name + ".tmp")
+        mapping = self._mapping(os.fstat(self._file.fileno()).st_size)
+        compacted: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        with open(temp_file, 'wb') as f:
+            for key, (offset, length) in self._index.items():
+                compacted[key] = (f.tell(), length)
+                f.write(mapping[offset:offset + length])
+        mapping.close()
+        self._map = None
+        self._file.close()
+        os.replace(temp_file, self.data_file)
+        self._file = open(self.data_file, 'a+b')
+        self._index = compacted
+
+    def _save_index(self):
+        entries = [[key, offset, length] for key, (offset, length) in self._index.items()]
+        atomic_write(self.index_file, json.dumps(entries, separators=(',', ':')))
+        self._dirty = False
+
+    def close(self):
+        """保存最近使用顺序并释放映射"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """按模式回放或转发请求；请求路径原样转发到上游中转商的同一路径"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "vibe-switcher-replay"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _send(self, status: int, headers: Dict[str, str], body: bytes, source: str):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Vibe-Replay", source)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        key = request_key(self.command, self.path, body, self.server.ignored_fields)
+
+        if self.server.mode != "record":
+            cached = self.server.store.get(key)
+            if cached is not None:
+                self.server.count("hit")
+                status, headers, payload = decode_entry(cached)
+                self._send(status, headers, payload, "hit")
+                return
+            if self.server.mode == "replay":
+                self.server.count("miss")
+                error = json.dumps({"error": {"type": "replay_miss", "message": f"no recording for {key}"}})
+                self._send(404, {"Content-Type": "application/json"}, error.encode('utf-8'), "miss")
+                return
+
+        self.server.count("forwarded")
+        self._forward(key, body)
+
+    def _forward(self, key: str, body: bytes):
+        """转发到上游，边接收边返回给客户端，成功的响应完整录制"""
+        upstream = self.server.upstream
+        cls = http.client.HTTPSConnection if upstream.scheme == "https" else http.client.HTTPConnection
+        conn = cls(upstream.hostname, upstream.port, timeout=self.server.timeout)
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in HOP_HEADERS}
+        headers["Accept-Encoding"] = "identity"
+        try:
+            conn.request(self.command, self.path, body=body or None, headers=headers)
+            response = conn.getresponse()
+        except Exception as e:
+            conn.close()
+            error = json.dumps({"error": {"type": "upstream_error", "message": f"{type(e).__name__}: {e}"}})
+            self._send(502, {"Content-Type": "application/json"}, error.encode('utf-8'), "error")
+            return
+
+        kept = {name: value for name, value in response.getheaders() if name.lower() in KEPT_RESPONSE_HEADERS}
+        self.send_response(response.status)
+        for name, value in kept.items():
+            self.send_header(name, value)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Vibe-Replay", "forwarded")
+        self.end_headers()
+
+        chunks = []
+        try:
+            while True:
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return
+        finally:
+            conn.close()
+
+        if 200 <= response.status < 300:
+            self.server.store.put(key, encode_entry(response.status, kept, b"".join(chunks)))
+            self.server.count("recorded")
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """录制 / 回放代理服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, upstream_url: str, store: ReplayStore, mode: str = "auto",
+                 ignored_fields: Iterable[str] = DEFAULT_IGNORED_FIELDS, timeout: float = 300.0,
+                 verbose: bool = False):
+        super().__init__((host, port), ReplayHandler)
+        self.upstream = urlsplit(upstream_url)
+        self.store = store
+        self.mode = mode
+        self.ignored_fields = tuple(ignored_fields)
+        self.timeout = timeout
+        self.verbose = verbose
+        self.counters = {"hit": 0, "miss": 0, "forwarded": 0, "recorded": 0}
+        self._count_lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._count_lock:
+            self.counters[name] += 1
+
+    @property
+    def base_url(self) -> str:
+        """本地地址，保留上游 base_url 的路径前缀，使请求路径可以原样转发"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{self.upstream.path.rstrip('/')}"
@@ -0,0 +1,94 @@
+import copy
+import json
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# 随包发布的默认规则表
+BUNDLED_RULES_FILE = Path(__file__).with_name("provider_rules.json")
+
+# 已编译的规则表，按用户自定义规则的内容缓存，同一进程内只编译一次
+_compiled: Dict[str, "ProviderRules"] = {}
+
+
+class ProviderRules:
+    """
+    Codex 中转商适配规则
+
+    规则表格式::
+
+        {
+          "aliases": {"yes": "yescode"},          # 中转商名称 -> model_provider
+          "rules": {
+            "<model_provider>": {
+              "set": {...},                       # 强制覆盖的设置（null 表示不写入）
+              "defaults": {...},                  # 设置为空时使用的默认值
+              "base_url": "...",                  # 强制使用的 base_url
+              "auth_keys": ["OPENAI_API_KEY"]     # auth.json 中必须写入 API Key 的字段
+            }
+          }
+        }
+
+    中转商的 model_provider 或名称（经过别名映射）命中规则即生效；两者命中不同规则时，
+    使用规则表中靠前的一条。
+    """
+
+    def __init__(self, table: Dict):
+        self.aliases: Dict[str, str] = dict(table.get("aliases") or {})
+        self._lookup: Dict[str, Tuple[int, Dict]] = {
+            key: (index, rule) for index, (key, rule) in enumerate((table.get("rules") or {}).items())
+        }
+
+    def model_provider(self, provider_name: str, provider_config: Dict) -> str:
+        """确定实际的 model_provider：优先使用配置中的值，否则使用别名映射或原始名称"""
+        return provider_config.get("model_provider") or self.aliases.get(provider_name, provider_name)
+
+    def match(self, model_provider: str, provider_name: str) -> Optional[Dict]:
+        """查找适用的规则"""
+        candidates = [
+            found for found in (
+                self._lookup.get(model_provider),
+                self._lookup.get(self.aliases.get(provider_name, provider_name)),
+            ) if found
+        ]
+        return min(candidates, key=lambda found: found[0])[1] if candidates else None
+
+    def apply(self, rule: Dict, settings: Dict, provider_config: Dict):
+        """
+        将规则应用到设置字典
+
+        强制的 base_url 会写回 provider_config，供生成 config.toml 时使用。
+        """
+        settings.update(copy.deepcopy(rule.get("set") or {}))
+        for key, value in (rule.get("defaults") or {}).items():
+            if not settings.get(key):
+                settings[key] = copy.deepcopy(value)
+        if rule.get("base_url"):
+            provider_config["base_url"] = rule["base_url"]
+        required = rule.get("auth_keys")
+        if required:
+            auth_keys = dict(settings.get("auth_keys") or {})
+            for key in required:
+                auth_keys.setdefault(key, "api_key")
+            settings["auth_keys"] = auth_keys
+
+
+def load_rules(overrides: Optional[Dict] = None) -> ProviderRules:
+    """
+    加载并编译规则表
+
+    Args:
+        overrides: config.json 中的 provider_rules，别名与规则按名称覆盖默认规则表
+    """
+    cache_key = json.dumps(overrides or {}, sort_keys=True)
+    rules = _compiled.get(cache_key)
+    if rules is not None:
+        return rules
+
+    with open(BUNDLED_RULES_FILE, 'r', encoding='utf-8') as f:
+        table = json.load(f)
+    if overrides:
+        table["aliases"].update(overrides.get("aliases") or {})
+        table["rules"].update(overrides.get("rules") or {})
+
+    rules = _compiled[cache_key] = ProviderRules(table)
+    return rules
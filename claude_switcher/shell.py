@@ -1,17 +1,66 @@
+import argparse
 import re
 import shutil
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
+from claude_switcher.backends import BASE_ACTIONS, ServiceBackend
+from claude_switcher.fileutil import atomic_write, inherit_owner
+from claude_switcher.liveenv import LiveEnv
 
-class ShellConfigManager:
+if TYPE_CHECKING:
+    from claude_switcher.config import ConfigManager
+
+# 多目标模式下更新的 POSIX shell 配置文件（存在时才更新）
+POSIX_TARGETS = (".zshrc", ".bashrc", ".profile")
+
+# fish 使用 conf.d 中独立的片段文件，整个文件由本工具生成
+FISH_TARGET = Path(".config") / "fish" / "conf.d" / "vibe-switcher.fish"
+
+BLOCK_HEADER = "# Claude Switcher: Claude Code API Configuration"
+
+
+class ShellConfigManager(ServiceBackend):
     """管理 shell 配置文件（.zshrc 和 .bashrc）的修改"""
 
-    def __init__(self):
-        self.home = Path.home()
+    service = "claude"
+    label = "Claude Code"
+    provider_section = "providers"
+    current_key = "current"
+    credential_field = "token"
+    credential_label = "Token"
+    config_label = "Shell 配置"
+    actions = BASE_ACTIONS + ("exec", "tokens", "pool")
+    exec_description = ('将中转商的 Token 和 URL 直接注入子进程环境变量后运行命令，不修改 shell 配置文件，'
+                        '适合多个任务并行使用不同中转商')
+    switch_hint = "已加载 vibe-switcher hook 的终端会在下一次显示提示符时自动生效"
+
+    def __init__(self, home: Optional[Path] = None):
+        """
+        Args:
+            home: 用户主目录，默认为当前用户的 HOME
+        """
+        self.home = Path(home) if home else Path.home()
         self.zshrc = self.home / ".zshrc"
         self.bashrc = self.home / ".bashrc"
+        # 以下由 configure 根据 config.json 与命令参数设置
+        self.all_shells = False
+        self.env_vars: Dict[str, str] = {}
+        self.live_env: Optional[LiveEnv] = None
+
+    @classmethod
+    def add_arguments(cls, action: str, parser: argparse.ArgumentParser):
+        if action == "switch":
+            parser.add_argument('--all-shells', action='store_true',
+                                help='同时更新 .zshrc、.bashrc、.profile 和 fish conf.d'
+                                     '（config.json 中 shell_targets 设为 all 时默认启用）')
+
+    def configure(self, config_mgr: "ConfigManager", args: argparse.Namespace):
+        """多目标模式由 --all-shells 或 config.json 的 shell_targets: all 启用"""
+        self.all_shells = getattr(args, 'all_shells', False) or config_mgr.get_shell_targets() == "all"
+        self.env_vars = config_mgr.get_env_vars()
+        self.live_env = LiveEnv(config_mgr.config_dir)
 
     def detect_shell_config(self) -> Optional[Path]:
         """检测当前使用的 shell 配置文件"""
@@ -23,11 +72,24 @@ class ShellConfigManager:
             return self.bashrc
         return None
 
+    def discover_targets(self) -> List[Tuple[Path, str]]:
+        """
+        发现所有 shell 配置目标
+
+        Returns:
+            [(文件路径, 语法)]，语法为 posix 或 fish；fish 目标在 ~/.config/fish 存在时加入
+        """
+        targets = [(self.home / name, "posix") for name in POSIX_TARGETS if (self.home / name).exists()]
+        if (self.home / FISH_TARGET).parent.parent.is_dir():
+            targets.append((self.home / FISH_TARGET, "fish"))
+        return targets
+
     def backup_config(self, config_file: Path) -> Path:
         """备份配置文件"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_file = config_file.parent / f"{config_file.name}.claude_switcher_backup_{timestamp}"
         shutil.copy2(config_file, backup_file)
+        inherit_owner(backup_file)
         return backup_file
 
     def read_config(self, config_file: Path) -> str:
@@ -36,9 +98,8 @@ class ShellConfigManager:
             return f.read()
 
     def write_config(self, config_file: Path, content: str):
-        """写入配置文件"""
-        with open(config_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        """写入配置文件（原子替换）"""
+        atomic_write(config_file, content)
 
     def find_anthropic_block(self, content: str) -> Tuple[Optional[int], Optional[int]]:
         """
@@ -71,30 +132,101 @@ class ShellConfigManager:
 
         for line in lines:
             stripped = line.strip()
-            # 跳过 ANTHROPIC 相关的 export 语句
+            # 跳过 ANTHROPIC 相关的 export 语句和本工具写入的注释
             if (stripped.startswith('export') and
                 ('ANTHROPIC_AUTH_TOKEN' in stripped or 'ANTHROPIC_BASE_URL' in stripped)):
                 continue
+            if stripped == BLOCK_HEADER:
+                continue
             new_lines.append(line)
 
         return '\n'.join(new_lines)
 
-    def add_anthropic_config(self, content: str, token: str, base_url: str) -> str:
-        """添加 ANTHROPIC 配置到文件末尾"""
+    @staticmethod
+    def render_block(token: str, base_url: str, syntax: str = "posix") -> str:
+        """生成指定语法的 ANTHROPIC 配置块"""
+        if syntax == "fish":
+            return f'''{BLOCK_HEADER}
+set -gx ANTHROPIC_AUTH_TOKEN "{token}"
+set -gx ANTHROPIC_BASE_URL "{base_url}"
+'''
+        return f'''{BLOCK_HEADER}
+export ANTHROPIC_AUTH_TOKEN="{token}"
+export ANTHROPIC_BASE_URL="{base_url}"
+'''
+
+    def replace_block(self, content: str, block: str) -> str:
+        """用已生成的配置块替换文件中的 ANTHROPIC 配置（追加到文件末尾）"""
         # 先移除旧配置
         content = self.remove_anthropic_config(content)
 
-        # 确保文件末尾有空行
-        if not content.endswith('\n'):
+        # 去掉移除旧配置后留下的空行，确保文件末尾有换行
+        content = content.rstrip('\n')
+        if content:
             content += '\n'
 
-        # 添加注释和新配置
-        config_block = f'''
-# Claude Switcher: Claude Code API Configuration
-export ANTHROPIC_AUTH_TOKEN="{token}"
-export ANTHROPIC_BASE_URL="{base_url}"
-'''
-        return content + config_block
+        return content + '\n' + block
+
+    def add_anthropic_config(self, content: str, token: str, base_url: str) -> str:
+        """添加 ANTHROPIC 配置到文件末尾"""
+        return self.replace_block(content, self.render_block(token, base_url))
+
+    def render_all_targets(self, token: str, base_url: str) -> Dict[Path, str]:
+        """
+        渲染所有 shell 目标的新内容，每种语法的配置块只生成一次
+
+        Returns:
+            {文件路径: 文件内容}
+        """
+        targets = self.discover_targets()
+        blocks = {syntax: self.render_block(token, base_url, syntax) for syntax in set(syntax for _, syntax in targets)}
+        rendered = {}
+        for path, syntax in targets:
+            if syntax == "fish":
+                rendered[path] = blocks[syntax]
+            else:
+                rendered[path] = self.replace_block(self.read_config(path), blocks[syntax])
+        return rendered
+
+    def _write_target(self, path: Path, content: str) -> Tuple[Optional[Path], Optional[str]]:
+        """备份并原子替换单个目标，返回 (备份文件, 错误)"""
+        try:
+            backup_file = self.backup_config(path) if path.exists() else None
+            atomic_write(path, content)
+            return backup_file, None
+        except Exception as e:
+            return None, str(e)
+
+    def update_targets(self, rendered: Dict[Path, str]) -> bool:
+        """
+        并发写入多个 shell 配置文件，并输出汇总报告
+
+        Args:
+            rendered: render_all_targets 的结果
+
+        Returns:
+            是否全部写入成功
+        """
+        if not rendered:
+            print("错误: 未找到 .zshrc、.bashrc、.profile 或 fish 配置目录")
+            return False
+
+        # 只在多目标模式下导入线程池，单目标切换和 exec 不需要
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(rendered)) as executor:
+            results = list(executor.map(lambda item: self._write_target(*item), rendered.items()))
+
+        failed = sum(1 for _, error in results if error)
+        print(f"已更新 {len(rendered) - failed}/{len(rendered)} 个 shell 配置文件:")
+        for path, (backup_file, error) in zip(rendered, results):
+            if error:
+                print(f"  ✗ {path}: {error}")
+            elif backup_file:
+                print(f"  ✓ {path}（已备份到 {backup_file.name}）")
+            else:
+                print(f"  ✓ {path}（新建）")
+        return failed == 0
 
     def update_config(self, token: str, base_url: str, config_file: Optional[Path] = None) -> bool:
         """
@@ -116,29 +248,86 @@ export ANTHROPIC_BASE_URL="{base_url}"
             return False
 
         try:
-            # 备份原文件
-            backup_file = self.backup_config(config_file)
-            print(f"已备份配置文件到: {backup_file}")
-
-            # 读取原内容
-            content = self.read_config(config_file)
-
-            # 更新配置
-            new_content = self.add_anthropic_config(content, token, base_url)
-
-            # 写入新内容
-            self.write_config(config_file, new_content)
-
-            print(f"已更新配置文件: {config_file}")
-            print(f"\n请执行以下命令使配置生效:")
-            print(f"  source {config_file}")
-
-            return True
-
+            # 读取原内容并更新配置
+            new_content = self.add_anthropic_config(self.read_config(config_file), token, base_url)
         except Exception as e:
             print(f"更新配置文件时出错: {e}")
             return False
 
+        # 与多目标模式相同：先备份，再原子替换
+        backup_file, error = self._write_target(config_file, new_content)
+        if error:
+            print(f"更新配置文件时出错: {error}")
+            return False
+
+        if backup_file:
+            print(f"已备份配置文件到: {backup_file}")
+        print(f"已更新配置文件: {config_file}")
+        print(f"\n请执行以下命令使配置生效:")
+        print(f"  source {config_file}")
+        return True
+
+    def render_targets(self, provider_name: str, provider: Dict, credential: str) -> Dict[Path, str]:
+        """渲染切换后的 shell 配置文件（多目标模式下为所有目标）"""
+        if self.all_shells:
+            return self.render_all_targets(credential, provider["base_url"])
+        config_file = self.detect_shell_config()
+        if config_file is None:
+            return {}
+        content = self.add_anthropic_config(self.read_config(config_file), credential, provider["base_url"])
+        return {config_file: content}
+
+    def switch(self, provider_name: str, provider: Dict, credential: str) -> bool:
+        if self.all_shells:
+            # 多目标模式：一次渲染所有 shell 配置文件，并发写入
+            return self.update_targets(self.render_all_targets(credential, provider["base_url"]))
+        return self.update_config(credential, provider["base_url"])
+
+    def current(self) -> Optional[Dict]:
+        result = self.show_current_config()
+        if result is None:
+            return None
+        token, base_url = result
+        return {"base_url": base_url, "credential": token}
+
+    def config_files(self) -> List[Path]:
+        if self.all_shells:
+            return [path for path, _ in self.discover_targets()]
+        config_file = self.detect_shell_config()
+        return [config_file] if config_file else []
+
+    def exec_env(self, provider_name: str, provider: Dict, credential: str) -> Dict[str, str]:
+        """exec 模式只注入 Token 和 URL 两个环境变量"""
+        return {
+            self.env_vars.get("token", "ANTHROPIC_AUTH_TOKEN"): credential,
+            self.env_vars.get("base_url", "ANTHROPIC_BASE_URL"): provider["base_url"],
+        }
+
+    def request_settings(self, provider_name: str, provider: Dict) -> Dict[str, str]:
+        return {
+            "base_url": provider["base_url"],
+            "model": provider.get("model") or "claude-3-5-haiku-latest",
+            "wire_api": "messages",
+        }
+
+    def after_switch(self, provider_name: str, provider: Dict, credential: str):
+        """通知已加载 hook 的终端在下一次提示符时重新导出环境变量"""
+        if self.live_env is not None:
+            self.live_env.publish(credential, provider["base_url"], self.env_vars)
+
+    def after_rollback(self, restored: List[str]):
+        """按恢复后的 shell 配置同步已打开的终端"""
+        if not restored:
+            return
+        restored_file = Path(restored[0])
+        shell_config = self.show_current_config(restored_file) if restored_file.exists() else None
+        token, base_url = shell_config if shell_config else (None, None)
+        if self.live_env is not None:
+            self.live_env.publish(token, base_url, self.env_vars)
+        print("\n请执行以下命令使配置生效（已加载 vibe-switcher hook 的终端会自动生效）:")
+        for path in restored:
+            print(f"  source {path}")
+
     def show_current_config(self, config_file: Optional[Path] = None) -> Optional[Tuple[str, str]]:
         """
         显示当前配置文件中的 ANTHROPIC 配置
@@ -161,14 +350,14 @@ export ANTHROPIC_BASE_URL="{base_url}"
 
             for line in lines:
                 stripped = line.strip()
-                if stripped.startswith('export') and 'ANTHROPIC_AUTH_TOKEN' in stripped:
-                    # 提取 token 值
-                    match = re.search(r'ANTHROPIC_AUTH_TOKEN="?([^"\s]+)"?', stripped)
+                if stripped.startswith(('export', 'set -gx')) and 'ANTHROPIC_AUTH_TOKEN' in stripped:
+                    # 提取 token 值（兼容 fish 的 set -gx 语法）
+                    match = re.search(r'ANTHROPIC_AUTH_TOKEN[= ]"?([^"\s]+)"?', stripped)
                     if match:
                         token = match.group(1)
-                elif stripped.startswith('export') and 'ANTHROPIC_BASE_URL' in stripped:
+                elif stripped.startswith(('export', 'set -gx')) and 'ANTHROPIC_BASE_URL' in stripped:
                     # 提取 base_url 值
-                    match = re.search(r'ANTHROPIC_BASE_URL="?([^"\s]+)"?', stripped)
+                    match = re.search(r'ANTHROPIC_BASE_URL[= ]"?([^"\s]+)"?', stripped)
                     if match:
                         base_url = match.group(1)
 
@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import Dict
+
+from claude_switcher.fileutil import atomic_write, shell_path
+
+# 服务类型与 config.json 中当前中转商字段的对应关系
+CURRENT_KEYS = {
+    "claude": "current",
+    "codex": "current_codex",
+}
+
+
+class StateFile:
+    """
+    维护记录当前中转商的单行状态文件
+
+    格式为 "claude=<name> codex=<name>"，每次切换时原子地更新。
+    提示符、tmux 状态栏等高频场景直接读取这一行，无需启动 Python 或解析 config.json。
+    """
+
+    def __init__(self, config_dir: Path):
+        self.state_file = config_dir / "state"
+
+    @staticmethod
+    def render(config: Dict) -> str:
+        """根据配置生成状态行"""
+        items = [f"{service}={config.get(key) or ''}" for service, key in CURRENT_KEYS.items()]
+        return " ".join(items) + "\n"
+
+    def update(self, config: Dict) -> bool:
+        """
+        更新状态文件，内容未变化时不写入
+
+        Returns:
+            是否实际写入了文件
+        """
+        content = self.render(config)
+        try:
+            if self.state_file.read_text(encoding='utf-8') == content:
+                return False
+        except OSError:
+            pass
+        atomic_write(self.state_file, content)
+        return True
+
+    def read(self) -> Dict[str, str]:
+        """
+        读取状态文件
+
+        Returns:
+            {服务类型: 当前中转商名称}，文件不存在时返回空字典
+        """
+        try:
+            line = self.state_file.read_text(encoding='utf-8').strip()
+        except OSError:
+            return {}
+        state = {}
+        for item in line.split():
+            service, _, name = item.partition("=")
+            state[service] = name
+        return state
+
+
+def generate_prompt_function(shell: str, state_file: Path) -> str:
+    """
+    生成读取状态文件的纯 shell 函数 vibe_switcher_current [claude|codex]
+
+    函数只使用 shell 内建命令，适合在 PS1 / tmux 状态栏中每次渲染时调用。
+    """
+    path = shell_path(state_file)
+    if shell == "fish":
+        return f'''# vibe-switcher prompt helper
+function vibe_switcher_current
+    set -l service claude
+    test (count $argv) -gt 0; and set service $argv[1]
+    test -r {path}; or return 1
+    read -l line < {path}
+    for item in (string split ' ' -- $line)
+        set -l pair (string split -m 1 '=' -- $item)
+        if test "$pair[1]" = "$service"; and test -n "$pair[2]"
+            printf '%s' $pair[2]
+            return 0
+        end
+    end
+    return 1
+end
+'''
+
+    return f'''# vibe-switcher prompt helper
+vibe_switcher_current() {{
+    local _vs_service="${{1:-claude}}" _vs_line _vs_value
+    {{ IFS= read -r _vs_line; }} 2>/dev/null < {path} || return 1
+    case " $_vs_line " in
+        *" $_vs_service="*) ;;
+        *) return 1 ;;
+    esac
+    _vs_value=" $_vs_line "
+    _vs_value="${{_vs_value#* $_vs_service=}}"
+    _vs_value="${{_vs_value%% *}}"
+    [ -n "$_vs_value" ] || return 1
+    printf '%s' "$_vs_value"
+}}
+'''
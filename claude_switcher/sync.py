@@ -0,0 +1,181 @@
+import hashlib
+import json
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from claude_switcher.config import ConfigManager
+from claude_switcher.fileutil import atomic_write
+
+# 同步的配置段，以及每段中只保存在本地、不会被远端覆盖的凭证字段
+SYNC_SECTIONS = {
+    "providers": ("token", "tokens"),
+    "codex_providers": ("api_key", "api_keys"),
+}
+
+
+def entry_hash(entry: Dict) -> str:
+    """计算单个中转商配置的哈希，用于判断远端条目是否变化"""
+    encoded = json.dumps(entry, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class RegistrySync:
+    """
+    从团队共享的中转商注册表同步配置
+
+    - URL 来源使用 ETag / If-Modified-Since 条件请求，304 时完全跳过解析
+    - 本地路径来源使用 mtime 和文件大小判断是否变化
+    - 按条目哈希只合并发生变化的中转商，本地凭证和当前中转商保持不变
+    - 所有变更在一次 config.json 写入中提交
+    """
+
+    def __init__(self, config_mgr: ConfigManager, timeout: float = 10.0):
+        self.config_mgr = config_mgr
+        self.state_file = config_mgr.config_dir / "sync_state.json"
+        self.timeout = timeout
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict):
+        atomic_write(self.state_file, json.dumps(state, indent=2, ensure_ascii=False), mode=0o600)
+
+    @staticmethod
+    def _is_url(source: str) -> bool:
+        return source.startswith(("http://", "https://"))
+
+    def fetch(self, source: str, source_state: Dict, force: bool = False) -> Tuple[Optional[bytes], Dict]:
+        """
+        获取注册表内容
+
+        Returns:
+            (内容, 新的校验信息)；内容未变化时返回 (None, 原校验信息)
+        """
+        if not self._is_url(source):
+            path = Path(source).expanduser()
+            stat = path.stat()
+            validators = {"mtime": stat.st_mtime, "size": stat.st_size}
+            if not force and all(source_state.get(key) == value for key, value in validators.items()):
+                return None, source_state
+            return path.read_bytes(), validators
+
+        headers = {"User-Agent": "vibe-switcher", "Accept": "application/json"}
+        if not force:
+            if source_state.get("etag"):
+                headers["If-None-Match"] = source_state["etag"]
+            if source_state.get("last_modified"):
+                headers["If-Modified-Since"] = source_state["last_modified"]
+
+        request = urllib.request.Request(source, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, source_state
+            raise
+        return body, validators
+
+    def plan(self, registry: Dict, previous_hashes: Dict, prune: bool) -> Tuple[Dict, Dict, Dict]:
+        """
+        计算需要合并的变更
+
+        Returns:
+            (updates, removals, hashes)
+            updates: {section: {name: 合并后的条目}}
+            removals: {section: [name]}
+            hashes: {section: {name: 远端条目哈希}}
+        """
+        updates: Dict[str, Dict] = {}
+        removals: Dict[str, List[str]] = {}
+        hashes: Dict[str, Dict] = {}
+        local_sections = {
+            "providers": self.config_mgr.get_providers(),
+            "codex_providers": self.config_mgr.get_codex_providers(),
+        }
+        current = {
+            "providers": self.config_mgr.get_current(),
+            "codex_providers": self.config_mgr.get_current_codex(),
+        }
+
+        for section, credential_keys in SYNC_SECTIONS.items():
+            remote = registry.get(section)
+            if not isinstance(remote, dict):
+                continue
+            local = local_sections[section]
+            seen = previous_hashes.get(section, {})
+            hashes[section] = {}
+
+            for name, entry in remote.items():
+                if not isinstance(entry, dict):
+                    continue
+                digest = entry_hash(entry)
+                hashes[section][name] = digest
+                if seen.get(name) == digest and name in local:
+                    continue
+
+                merged = dict(local.get(name, {}))
+                for key, value in entry.items():
+                    # 本地已配置的凭证优先，远端只在本地为空时提供
+                    if key in credential_keys and merged.get(key):
+                        continue
+                    merged[key] = value
+                merged.setdefault(credential_keys[0], "")
+                if merged != local.get(name):
+                    updates.setdefault(section, {})[name] = merged
+
+            if prune:
+                # 只删除之前由同步引入、且远端已不存在的条目，当前使用中的中转商保留
+                gone = [
+                    name for name in seen
+                    if name not in remote and name in local and name != current[section]
+                ]
+                if gone:
+                    removals[section] = gone
+
+        return updates, removals, hashes
+
+    def sync(self, source: str, prune: bool = False, force: bool = False) -> Dict:
+        """
+        执行同步
+
+        Returns:
+            {"changed": 内容是否变化, "updated": [section/name], "removed": [section/name]}
+        """
+        state = self._load_state()
+        source_state = state.get(source, {})
+
+        body, validators = self.fetch(source, source_state, force=force)
+        if body is None:
+            return {"changed": False, "updated": [], "removed": []}
+
+        registry = json.loads(body.decode('utf-8'))
+        if not isinstance(registry, dict):
+            raise ValueError("注册表内容必须是 JSON 对象")
+
+        previous_hashes = source_state.get("hashes", {})
+        updates, removals, hashes = self.plan(registry, previous_hashes, prune)
+        if updates or removals:
+            self.config_mgr.update_provider_entries(updates, removals)
+
+        # 注册表中没有出现的配置段保留之前的记录，之后该段重新出现时仍能识别并清理由同步引入的条目
+        for section, seen in previous_hashes.items():
+            hashes.setdefault(section, seen)
+        state[source] = dict(validators, hashes=hashes)
+        self._save_state(state)
+
+        return {
+            "changed": True,
+            "updated": [f"{section}/{name}" for section, entries in updates.items() for name in entries],
+            "removed": [f"{section}/{name}" for section, names in removals.items() for name in names],
+        }
@@ -0,0 +1,206 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from claude_switcher.backends import load_backend_class
+from claude_switcher.config import ConfigManager
+from claude_switcher.credentials import credential_entries
+from claude_switcher.events import EventLog
+from claude_switcher.health import probe_url
+
+
+class Watchdog:
+    """
+    后台健康检查：周期性探测当前中转商，持续异常时自动切换到健康的备选中转商
+
+    防抖策略:
+        - 连续 windows 个窗口异常才触发切换，任一正常窗口都会清零计数
+        - 切换后 cooldown 秒内不再自动切换，避免在两个不稳定的中转商之间来回切换
+        - 备选中转商的延迟必须低于阈值乘以 margin，才会被视为健康
+    """
+
+    def __init__(self, config_mgr: ConfigManager, switchers: Dict[str, Callable[[str], int]],
+                 interval: float = 60.0, jitter: float = 0.1, samples: int = 3,
+                 error_rate: float = 0.5, latency: float = 3.0, windows: int = 3,
+                 cooldown: float = 600.0, margin: float = 0.8, timeout: float = 5.0,
+                 probe: Callable[[str, float], Dict] = probe_url, events: Optional[EventLog] = None):
+        """
+        Args:
+            config_mgr: 配置管理器（每个窗口重新读取当前中转商，感知手动切换）
+            switchers: {服务类型: 切换函数}，切换函数接收中转商名称，返回退出码
+            interval: 检查间隔（秒）
+            jitter: 间隔随机抖动比例（0.1 表示 ±10%）
+            samples: 每个窗口对当前中转商的探测次数
+            error_rate: 窗口内失败比例达到该值视为异常
+            latency: 窗口内延迟中位数超过该值（秒）视为异常
+            windows: 连续异常窗口数达到该值时触发切换
+            cooldown: 切换后的冷却时间（秒）
+            margin: 备选中转商的延迟须低于 latency * margin
+            timeout: 单次探测超时（秒）
+            probe: 探测函数，便于替换
+            events: 事件日志，记录每个窗口的探测结果
+        """
+        self.config_mgr = config_mgr
+        self.switchers = switchers
+        self.interval = interval
+        self.jitter = jitter
+        self.samples = max(1, samples)
+        self.error_rate = error_rate
+        self.latency = latency
+        self.windows = max(1, windows)
+        self.cooldown = cooldown
+        self.margin = margin
+        self.timeout = timeout
+        self.probe = probe
+        self.events = events
+
+        # 只用到后端类的配置字段，不需要创建实例
+        self.backends = {service: load_backend_class(service) for service in switchers}
+        self.bad_streak = {service: 0 for service in switchers}
+        self.last_switch = {service: float("-inf") for service in switchers}
+
+    def _log(self, message: str):
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+    def _providers(self, service: str) -> Dict:
+        return self.config_mgr.get_backend_providers(self.backends[service])
+
+    def _current(self, service: str) -> Optional[str]:
+        return self.config_mgr.get_backend_current(self.backends[service])
+
+    def measure_window(self, url: str) -> Dict:
+        """
+        对一个地址进行一个窗口的探测
+
+        Returns:
+            {"error_rate": 失败比例, "latency": 成功请求的延迟中位数（无成功请求时为 None）,
+             "error": 首个错误描述}
+        """
+        results = [self.probe(url, self.timeout) for _ in range(self.samples)]
+        latencies = [r["latency"] for r in results if r["ok"]]
+        failures = sum(1 for r in results if not r["ok"])
+        return {
+            "error_rate": failures / len(results),
+            "latency": statistics.median(latencies) if latencies else None,
+            "error": next((r["error"] for r in results if r["error"]), None),
+        }
+
+    def _record_probe(self, service: str, provider: str, window: Dict, healthy: bool):
+        """记录一次窗口探测事件"""
+        if self.events is None:
+            return
+        fields = {"error_rate": window["error_rate"]}
+        if window["error"]:
+            fields["error"] = window["error"]
+        if window["latency"] is not None:
+            fields["durations"] = {"probe": round(window["latency"], 6)}
+        self.events.record("probe", service, provider=provider, success=healthy, **fields)
+
+    def is_healthy(self, window: Dict, latency_limit: float) -> bool:
+        """判断窗口是否正常"""
+        if window["error_rate"] >= self.error_rate:
+            return False
+        return window["latency"] is not None and window["latency"] <= latency_limit
+
+    def pick_alternative(self, service: str, current: Optional[str]) -> Optional[str]:
+        """并发探测所有备选中转商，返回延迟最低的健康中转商"""
+        candidates = {
+            name: info["base_url"]
+            for name, info in self._providers(service).items()
+            if name != current and credential_entries(service, info) and info.get("base_url")
+        }
+        if not candidates:
+            return None
+
+        with ThreadPoolExecutor(max_workers=min(8, len(candidates))) as executor:
+            windows = dict(zip(candidates, executor.map(self.measure_window, candidates.values())))
+
+        healthy = []
+        for name, window in windows.items():
+            ok = self.is_healthy(window, self.latency * self.margin)
+            self._record_probe(service, name, window, ok)
+            if ok:
+                healthy.append((window["latency"], name))
+        if not healthy:
+            return None
+        return min(healthy)[1]
+
+    def check(self, service: str) -> Optional[str]:
+        """
+        检查一个服务的当前中转商
+
+        Returns:
+            自动切换到的中转商名称；未切换时返回 None
+        """
+        current = self._current(service)
+        provider = self._providers(service).get(current) if current else None
+        if not provider:
+            return None
+
+        window = self.measure_window(provider["base_url"])
+        latency_display = f"{window['latency']:.3f}s" if window["latency"] is not None else "-"
+
+        healthy = self.is_healthy(window, self.latency)
+        self._record_probe(service, current, window, healthy)
+
+        if healthy:
+            if self.bad_streak[service]:
+                self._log(f"{service}/{current} 已恢复正常 (延迟 {latency_display})")
+            self.bad_streak[service] = 0
+            return None
+
+        self.bad_streak[service] += 1
+        self._log(
+            f"{service}/{current} 异常 ({min(self.bad_streak[service], self.windows)}/{self.windows}): "
+            f"失败率 {window['error_rate']:.0%}, 延迟 {latency_display}"
+            + (f", {window['error']}" if window["error"] else "")
+        )
+
+        if self.bad_streak[service] < self.windows:
+            return None
+
+        remaining = self.last_switch[service] + self.cooldown - time.monotonic()
+        if remaining > 0:
+            self._log(f"{service} 处于切换冷却期，{remaining:.0f} 秒后才会再次自动切换")
+            return None
+
+        alternative = self.pick_alternative(service, current)
+        if alternative is None:
+            self._log(f"{service} 没有可用的健康备选中转商，保持 {current}")
+            return None
+
+        self._log(f"{service} 自动切换: {current} -> {alternative}")
+        if self.switchers[service](alternative) != 0:
+            self._log(f"{service} 切换到 {alternative} 失败")
+            return None
+
+        self.bad_streak[service] = 0
+        self.last_switch[service] = time.monotonic()
+        return alternative
+
+    def run(self, iterations: Optional[int] = None) -> List[str]:
+        """
+        运行检查循环
+
+        Args:
+            iterations: 检查轮数，None 表示一直运行
+
+        Returns:
+            期间自动切换过的 "service/provider" 列表
+        """
+        switched = []
+        count = 0
+        while iterations is None or count < iterations:
+            for service in self.switchers:
+                target = self.check(service)
+                if target:
+                    switched.append(f"{service}/{target}")
+            count += 1
+            if iterations is not None and count >= iterations:
+                break
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            time.sleep(max(0.0, delay))
+        return switched
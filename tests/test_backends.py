@@ -0,0 +1,150 @@
+import json
+import sys
+
+import pytest
+
+from claude_switcher import backends as backends_module
+from claude_switcher import cli
+from claude_switcher.backends import ServiceBackend, load_backend_class
+from claude_switcher.codex import CodexConfigManager
+from claude_switcher.config import ConfigManager
+from claude_switcher.credentials import CredentialRotator
+from claude_switcher.fileutil import atomic_write
+from claude_switcher.history import HistoryManager
+from claude_switcher.shell import ShellConfigManager
+
+
+class GeminiBackend(ServiceBackend):
+    service = "gemini"
+    label = "Gemini CLI"
+    provider_section = "gemini_providers"
+    current_key = "current_gemini"
+
+    def _path(self):
+        return self.home / ".gemini" / "settings.json"
+
+    def render_targets(self, provider_name, provider, credential):
+        return {self._path(): json.dumps({"apiKey": credential, "baseUrl": provider["base_url"]})}
+
+    def switch(self, provider_name, provider, credential):
+        for path, content in self.render_targets(provider_name, provider, credential).items():
+            atomic_write(path, content)
+        return True
+
+    def current(self):
+        try:
+            data = json.loads(self._path().read_text())
+        except OSError:
+            return None
+        return {"base_url": data["baseUrl"], "credential": data["apiKey"]}
+
+
+class IncompleteBackend(ServiceBackend):
+    service = "broken"
+
+    def current(self):
+        return None
+
+
+class _EntryPoint:
+    def __init__(self, target):
+        self.target = target
+
+    def load(self):
+        return self.target
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(backends_module, "_entry_points", lambda: {
+        "gemini": _EntryPoint(GeminiBackend),
+        "broken": _EntryPoint(IncompleteBackend),
+        "bogus": _EntryPoint(dict),
+    })
+    return tmp_path
+
+
+def _main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["vibe-switcher", *argv])
+    return cli.main()
+
+
+def test_load_builtin_backends():
+    assert load_backend_class("claude") is ShellConfigManager
+    assert load_backend_class("codex") is CodexConfigManager
+
+
+def test_load_plugin_backend_checks_interface(home):
+    assert load_backend_class("gemini") is GeminiBackend
+    with pytest.raises(TypeError, match="render_targets"):
+        load_backend_class("broken")
+    with pytest.raises(TypeError):
+        load_backend_class("bogus")
+
+
+def test_builtin_backends_win_over_plugins(home, monkeypatch):
+    monkeypatch.setattr(backends_module, "_entry_points", lambda: {"claude": _EntryPoint(GeminiBackend)})
+    assert load_backend_class("claude", backends_module.discover_backends()) is ShellConfigManager
+
+
+def test_plugin_backend_dispatch(home, monkeypatch, capsys):
+    assert _main(monkeypatch, "gemini", "add", "fox", "key-fox", "https://fox") == 0
+    assert _main(monkeypatch, "gemini", "switch", "fox") == 0
+
+    assert json.loads((home / ".gemini" / "settings.json").read_text()) == \
+        {"apiKey": "key-fox", "baseUrl": "https://fox"}
+    config = json.loads((home / ".config" / "claude-switcher" / "config.json").read_text())
+    assert config["gemini_providers"]["fox"] == {"api_key": "key-fox", "base_url": "https://fox"}
+    assert config["current_gemini"] == "fox"
+
+    entry = HistoryManager(home / ".config" / "claude-switcher").resolve(None)
+    assert (entry["service"], entry["to"]) == ("gemini", "fox")
+
+    capsys.readouterr()
+    assert _main(monkeypatch, "gemini", "current", "--short") == 0
+    assert capsys.readouterr().out.strip() == "fox"
+
+    # 插件后端不支持 exec 等子命令
+    with pytest.raises(SystemExit):
+        _main(monkeypatch, "gemini", "exec", "fox", "--", "true")
+
+
+def test_builtin_switch_through_generic_dispatch(home, monkeypatch):
+    (home / ".zshrc").write_text("# zsh\n")
+    assert _main(monkeypatch, "claude", "add", "duck", "tok", "https://duck") == 0
+    assert _main(monkeypatch, "claude", "switch", "duck") == 0
+    assert ShellConfigManager(home=home).current() == {"base_url": "https://duck", "credential": "tok"}
+
+    assert _main(monkeypatch, "codex", "add", "fox", "key", "https://fox/v1", "--network-access", "enabled") == 0
+    assert _main(monkeypatch, "codex", "switch", "fox") == 0
+    assert 'network_access = "enabled"' in (home / ".codex" / "config.toml").read_text()
+
+    assert _main(monkeypatch, "rollback") == 0
+    assert not (home / ".codex" / "config.toml").exists()
+
+
+def test_exec_failure_puts_credential_on_cooldown(home, monkeypatch):
+    config_mgr = ConfigManager()
+    config_mgr.update_provider_entries({"providers": {"duck": {"token": "t1", "tokens": ["t1", "t2"],
+                                                                "base_url": "https://duck"}}})
+    script = "import os, sys; sys.exit(0 if os.environ['ANTHROPIC_AUTH_TOKEN'] == 't2' else 75)"
+
+    assert _main(monkeypatch, "claude", "exec", "duck", "--", sys.executable, "-c", script) == 75
+    assert _main(monkeypatch, "claude", "exec", "duck", "--", sys.executable, "-c", script) == 0
+
+    status = {entry["value"]: entry for entry in CredentialRotator(config_mgr.config_dir).status(
+        "claude", "duck", config_mgr.get_provider("duck"))}
+    assert status["t1"]["failures"] == 1
+    assert status["t1"]["cooldown"] > 0
+    assert status["t2"]["failures"] == 0
+
+
+def test_exec_failure_with_single_credential_records_nothing(home, monkeypatch, capsys):
+    config_mgr = ConfigManager()
+    config_mgr.update_provider_entries({"providers": {"duck": {"token": "t1", "base_url": "https://duck"}}})
+
+    assert _main(monkeypatch, "claude", "exec", "duck", "--", sys.executable, "-c", "raise SystemExit(75)") == 75
+
+    assert "冷却" not in capsys.readouterr().err
+    assert not (config_mgr.config_dir / "credential_state.json").exists()
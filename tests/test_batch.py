@@ -0,0 +1,103 @@
+import io
+import json
+import sys
+
+import pytest
+
+from claude_switcher.backends import load_backend_class
+from claude_switcher.batch import BatchRunner
+from claude_switcher.cli import build_parser
+from claude_switcher.config import ConfigManager
+
+
+def test_parse_line_formats():
+    assert BatchRunner.parse_line("claude switch fox") == ["claude", "switch", "fox"]
+    assert BatchRunner.parse_line("vibe-switcher claude switch fox") == ["claude", "switch", "fox"]
+    assert BatchRunner.parse_line('["codex", "switch", "duck"]') == ["codex", "switch", "duck"]
+    assert BatchRunner.parse_line('{"argv": ["claude", "current", "--short"]}') == ["claude", "current", "--short"]
+    assert BatchRunner.parse_line('{"command": "claude add a \'t k\' http://x"}') == \
+        ["claude", "add", "a", "t k", "http://x"]
+
+
+def test_parse_line_skips_blank_and_comments():
+    assert BatchRunner.parse_line("") is None
+    assert BatchRunner.parse_line("   ") is None
+    assert BatchRunner.parse_line("# claude switch fox") is None
+
+
+def test_parse_line_rejects_json_without_command():
+    with pytest.raises(ValueError):
+        BatchRunner.parse_line('{"args": []}')
+
+
+def _runner(home, **kwargs):
+    config_mgr = ConfigManager(autosave=False, home=home)
+    backends = {
+        "claude": load_backend_class("claude")(home=home),
+        "codex": load_backend_class("codex")(home=home),
+    }
+    return config_mgr, BatchRunner(build_parser(include_plugins=False),
+                                   {"config_mgr": config_mgr, "backends": backends}, **kwargs)
+
+
+def test_run_writes_config_once_at_end(tmp_path):
+    (tmp_path / ".zshrc").write_text("")
+    config_mgr, runner = _runner(tmp_path)
+    lines = [
+        "claude add duck token-duck https://duck.example",
+        "# comment",
+        "claude switch duck",
+        "claude current --short",
+    ]
+    out = io.StringIO()
+
+    assert runner.run(lines, out) == 0
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [result["line"] for result in results] == [1, 3, 4]
+    assert results[-1]["output"] == "duck"
+
+    saved = json.loads(config_mgr.config_file.read_text(encoding="utf-8"))
+    assert saved["providers"]["duck"]["token"] == "token-duck"
+    assert saved["current"] == "duck"
+    assert 'ANTHROPIC_AUTH_TOKEN="token-duck"' in (tmp_path / ".zshrc").read_text()
+
+
+def test_run_reports_failures_and_stops(tmp_path):
+    _, runner = _runner(tmp_path)
+    out = io.StringIO()
+
+    assert runner.run(["claude switch missing", "claude list"], out, stop_on_error=True) == 1
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(results) == 1
+    assert results[0]["exit_code"] == 1
+
+
+def test_run_rejects_nested_batch(tmp_path):
+    _, runner = _runner(tmp_path)
+    result = runner.run_command(["batch"])
+    assert result["exit_code"] == 1
+    assert "batch" in result["error"]
+
+
+def test_codex_rules_do_not_leak_into_saved_config(tmp_path):
+    config_mgr, runner = _runner(tmp_path)
+
+    assert runner.run(["codex add yes kk https://mine/v1", "codex switch yes"], io.StringIO()) == 0
+
+    saved = json.loads(config_mgr.config_file.read_text(encoding="utf-8"))
+    assert saved["codex_providers"]["yes"]["base_url"] == "https://mine/v1"
+    assert 'base_url = "https://cotest.yes.vg/v1"' in (tmp_path / ".codex" / "config.toml").read_text()
+
+
+def test_exec_output_is_captured_in_result(tmp_path, capfd):
+    config_mgr, runner = _runner(tmp_path)
+    config_mgr.update_provider_entries({"providers": {"duck": {"token": "tok", "base_url": "https://duck"}}})
+    script = "import os, sys; print('child', os.environ['ANTHROPIC_AUTH_TOKEN']); print('err', file=sys.stderr)"
+    out = io.StringIO()
+
+    assert runner.run([json.dumps(["claude", "exec", "duck", "--", sys.executable, "-c", script])], out) == 0
+
+    result = json.loads(out.getvalue())
+    assert result["output"].split() == ["child", "tok", "err"]
+    # 子进程没有直接写入文件描述符 1 / 2
+    assert capfd.readouterr() == ("", "")
@@ -0,0 +1,91 @@
+import pytest
+
+from claude_switcher import credentials as credentials_module
+from claude_switcher.credentials import CredentialRotator, credential_entries, credential_id
+
+PROVIDER = {"token": "t1", "tokens": ["t1", "t2", "t3"]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(credentials_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_credential_entries():
+    assert credential_entries("claude", {"token": "only"}) == [{"value": "only", "quota": None}]
+    assert credential_entries("claude", {"token": ""}) == []
+    assert credential_entries("codex", {"api_key": "k", "api_keys": ["", {"value": "a", "quota": 5}, "b"]}) == [
+        {"value": "a", "quota": 5}, {"value": "b", "quota": None}]
+
+
+def test_round_robin(tmp_path):
+    rotator = CredentialRotator(tmp_path)
+    assert [rotator.pick("claude", "fox", PROVIDER) for _ in range(4)] == ["t1", "t2", "t3", "t1"]
+    assert rotator.last_used("claude", "fox") == credential_id("t1")
+
+
+def test_single_credential_is_not_tracked(tmp_path):
+    rotator = CredentialRotator(tmp_path)
+    assert rotator.pick("claude", "fox", {"token": "only"}) == "only"
+    assert rotator.pick("claude", "fox", {"token": ""}) is None
+    assert rotator.last_used("claude", "fox") is None
+    assert rotator.record_failure("claude", "fox") == 0.0
+
+
+def test_cooldown_doubles_up_to_max(tmp_path, clock):
+    rotator = CredentialRotator(tmp_path, base_cooldown=60, max_cooldown=300)
+    token_id = credential_id("t1")
+    cooldowns = [rotator.record_failure("claude", "fox", token_id) for _ in range(5)]
+    assert cooldowns == [60, 120, 240, 300, 300]
+
+    status = {entry["value"]: entry for entry in rotator.status("claude", "fox", PROVIDER)}
+    assert status["t1"]["failures"] == 5
+    assert status["t1"]["cooldown"] == 300
+    assert status["t2"]["cooldown"] == 0
+
+
+def test_pick_skips_cooling_credentials(tmp_path, clock):
+    rotator = CredentialRotator(tmp_path, base_cooldown=60)
+    assert rotator.pick("claude", "fox", PROVIDER) == "t1"
+    # 默认将最近一次选出的凭证置入冷却期
+    assert rotator.record_failure("claude", "fox") == 60
+    assert rotator.pick("claude", "fox", PROVIDER) == "t2"
+    assert rotator.pick("claude", "fox", PROVIDER) == "t3"
+    assert rotator.pick("claude", "fox", PROVIDER) == "t2"
+
+    clock[0] += 61
+    assert rotator.pick("claude", "fox", PROVIDER) == "t3"
+    assert rotator.pick("claude", "fox", PROVIDER) == "t1"
+
+
+def test_all_cooling_picks_earliest_expiry(tmp_path, clock):
+    rotator = CredentialRotator(tmp_path, base_cooldown=60)
+    rotator.record_failure("claude", "fox", credential_id("t1"))
+    rotator.record_failure("claude", "fox", credential_id("t1"))
+    rotator.record_failure("claude", "fox", credential_id("t2"))
+    clock[0] += 10
+    rotator.record_failure("claude", "fox", credential_id("t3"))
+
+    assert rotator.pick("claude", "fox", PROVIDER) == "t2"
+
+
+def test_record_success_resets_backoff(tmp_path, clock):
+    rotator = CredentialRotator(tmp_path, base_cooldown=60)
+    token_id = credential_id("t1")
+    rotator.record_failure("claude", "fox", token_id)
+    rotator.record_failure("claude", "fox", token_id)
+    rotator.record_success("claude", "fox", "t1")
+
+    assert rotator.status("claude", "fox", PROVIDER)[0]["failures"] == 0
+    assert rotator.record_failure("claude", "fox", token_id) == 60
+
+
+def test_quota_rotation_prefers_largest_quota(tmp_path, clock):
+    provider = {"rotation": "quota", "tokens": ["plain", {"value": "low", "quota": 10},
+                                                {"value": "high", "quota": 90}]}
+    rotator = CredentialRotator(tmp_path)
+    assert rotator.pick("claude", "fox", provider) == "high"
+    rotator.record_failure("claude", "fox")
+    assert rotator.pick("claude", "fox", provider) == "low"
@@ -0,0 +1,50 @@
+import json
+import os
+
+import pytest
+
+from claude_switcher.fleet import apply_switch, resolve_homes
+
+NOBODY = 65534
+
+
+def test_resolve_homes(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / "homes" / name).mkdir(parents=True)
+    (tmp_path / "homes" / "file").write_text("")
+    listing = tmp_path / "homes.txt"
+    listing.write_text(f"# fleet\n{tmp_path / 'homes' / 'b'}\n\n{tmp_path / 'missing'}\n")
+
+    assert resolve_homes([str(tmp_path / "homes" / "*"), str(listing)]) == [
+        str(tmp_path / "homes" / "a"), str(tmp_path / "homes" / "b"), str(tmp_path / "missing")]
+
+
+def test_apply_switch_reports_missing_home(tmp_path):
+    result = apply_switch(str(tmp_path / "missing"), "claude", "fox")
+    assert result["ok"] is False
+    assert "目录不存在" in result["error"]
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="需要以 root 身份运行")
+@pytest.mark.parametrize("service, entry", [
+    ("claude", {"token": "tok", "base_url": "https://fox"}),
+    ("codex", {"api_key": "key", "base_url": "https://fox/v1"}),
+])
+def test_apply_switch_as_root_keeps_home_owner(tmp_path, service, entry):
+    home = tmp_path / "home"
+    home.mkdir()
+    (home / ".zshrc").write_text("# zsh\n")
+    for path in (home, home / ".zshrc"):
+        os.chown(path, NOBODY, NOBODY)
+
+    result = apply_switch(str(home), service, "fox", entry)
+    assert result["ok"], result["error"]
+    # 再切换一次，覆盖替换已有文件与追加写入的路径
+    assert apply_switch(str(home), service, "fox")["ok"]
+
+    config = json.loads((home / ".config" / "claude-switcher" / "config.json").read_text())
+    assert config["current" if service == "claude" else "current_codex"] == "fox"
+    paths = [home] + list(home.rglob("*"))
+    assert len(paths) > 10
+    root_owned = [str(path) for path in paths if (path.lstat().st_uid, path.lstat().st_gid) != (NOBODY, NOBODY)]
+    assert root_owned == []
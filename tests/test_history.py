@@ -0,0 +1,153 @@
+import multiprocessing
+import sys
+from datetime import datetime
+
+import pytest
+
+from claude_switcher import cli
+from claude_switcher import history as history_module
+from claude_switcher.config import ConfigManager
+from claude_switcher.history import HistoryManager
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """按顺序返回给定时间的 datetime 替身"""
+    times = []
+
+    class FakeDatetime:
+        @staticmethod
+        def now():
+            return times.pop(0)
+
+    monkeypatch.setattr(history_module, "datetime", FakeDatetime)
+    return times
+
+
+def _record(history, clock, ts, to):
+    clock.append(datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S"))
+    return history.record("claude", None, to, {})
+
+
+def test_record_count_and_get(tmp_path):
+    history = HistoryManager(tmp_path)
+    assert history.count() == 0
+    assert history.get(0) is None
+
+    assert history.record("claude", "fox", "duck", {"a": None}) == 0
+    assert history.record("codex", None, "fox", {}, action="rollback") == 1
+
+    assert history.count() == 2
+    entry = history.get(1)
+    assert entry["seq"] == 1
+    assert entry["service"] == "codex"
+    assert entry["action"] == "rollback"
+    assert history.get(0)["files"] == {"a": None}
+    assert history.get(2) is None
+    assert history.get(-1) is None
+
+
+def test_recent_and_resolve_by_position(tmp_path):
+    history = HistoryManager(tmp_path)
+    for name in ("a", "b", "c"):
+        history.record("claude", None, name, {})
+
+    assert [(n, entry["to"]) for n, entry in history.recent(5)] == [(1, "c"), (2, "b"), (3, "a")]
+    assert history.resolve(None)["to"] == "c"
+    assert history.resolve("1")["to"] == "c"
+    assert history.resolve("3")["to"] == "a"
+    assert history.resolve("0") is None
+    assert history.resolve("4") is None
+
+
+def test_find_by_timestamp(tmp_path, clock):
+    history = HistoryManager(tmp_path)
+    for ts, name in [("2024-10-01T09:00:00", "a"), ("2024-10-02T15:30:45", "b"),
+                     ("2024-10-02T18:00:00", "c"), ("2024-10-05T08:00:00", "d")]:
+        _record(history, clock, ts, name)
+
+    # 返回不早于给定时间的第一条记录
+    assert history.find_by_timestamp("2024-10-02T15:30:45")["to"] == "b"
+    assert history.find_by_timestamp("20241002_153046")["to"] == "c"
+    assert history.find_by_timestamp("20241002")["to"] == "b"
+    assert history.find_by_timestamp("2024-09-01")["to"] == "a"
+    assert history.find_by_timestamp("2024-10-06") is None
+    # 8 位及以上的纯数字按时间戳处理
+    assert history.resolve("20241003")["to"] == "d"
+
+
+def test_snapshot_deduplicates_content(tmp_path):
+    history = HistoryManager(tmp_path / "config")
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    first.write_text("same")
+    second.write_text("same")
+
+    digests = history.snapshot_files([first, second, tmp_path / "missing"])
+    assert digests[str(first)] == digests[str(second)]
+    assert digests[str(tmp_path / "missing")] is None
+    assert history.load_object(digests[str(first)]) == b"same"
+    assert len(list(history.objects_dir.rglob("*"))) == 2  # 一个分组目录和一个对象
+
+
+def test_restore_files_rolls_back_switch(tmp_path):
+    history = HistoryManager(tmp_path / "config")
+    existing = tmp_path / ".zshrc"
+    created = tmp_path / "auth.json"
+    existing.write_text("before\n")
+
+    files = history.snapshot_files([existing, created])
+    history.record("claude", "fox", "duck", files)
+    existing.write_text("after\n")
+    created.write_text("{}")
+
+    restored = history.restore_files(history.resolve(None))
+
+    assert sorted(restored) == sorted([str(existing), str(created)])
+    assert existing.read_text() == "before\n"
+    # 切换前不存在的文件被删除
+    assert not created.exists()
+
+
+def test_failed_switch_can_be_rolled_back(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    (tmp_path / ".zshrc").write_text("# zsh\n")
+    # fish 的 conf.d 是普通文件，写入该目标失败，而 .zshrc 已经写入
+    (tmp_path / ".config" / "fish").mkdir(parents=True)
+    (tmp_path / ".config" / "fish" / "conf.d").write_text("")
+
+    def run(*argv):
+        monkeypatch.setattr(sys, "argv", ["vibe-switcher", *argv])
+        return cli.main()
+
+    assert run("claude", "add", "duck", "tok", "https://duck") == 0
+    assert run("claude", "switch", "duck", "--all-shells") == 1
+    assert "tok" in (tmp_path / ".zshrc").read_text()
+
+    history = HistoryManager(tmp_path / ".config" / "claude-switcher")
+    entry = history.resolve(None)
+    assert (entry["to"], entry["failed"]) == ("duck", True)
+    assert ConfigManager().get_current() is None
+
+    assert run("rollback") == 0
+    assert (tmp_path / ".zshrc").read_text() == "# zsh\n"
+
+
+def _record_many(config_dir, worker, count):
+    history = HistoryManager(config_dir)
+    for i in range(count):
+        history.record("claude", None, f"{worker}-{i}", {})
+
+
+def test_concurrent_records_keep_index_consistent(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_record_many, args=(tmp_path, worker, 200)) for worker in range(8)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    history = HistoryManager(tmp_path)
+    assert history.count() == 1600
+    names = [history.get(seq)["to"] for seq in range(1600)]
+    assert sorted(names) == sorted(f"{worker}-{i}" for worker in range(8) for i in range(200))
@@ -0,0 +1,101 @@
+import json
+import random
+
+import pytest
+
+from claude_switcher import pools as pools_module
+from claude_switcher.config import ConfigManager
+from claude_switcher.pools import PoolManager, build_alias_table, parse_members
+
+
+def _distribution(prob, alias):
+    """别名表隐含的精确抽样分布"""
+    n = len(prob)
+    result = [0.0] * n
+    for i in range(n):
+        result[i] += prob[i] / n
+        result[alias[i]] += (1.0 - prob[i]) / n
+    return result
+
+
+@pytest.mark.parametrize("weights", [[1], [1, 1], [3, 1], [5, 1, 1, 3], [1, 2, 3, 4, 5, 6, 7], [100, 1]])
+def test_alias_table_matches_weights(weights):
+    prob, alias = build_alias_table(weights)
+    total = sum(weights)
+    assert _distribution(prob, alias) == pytest.approx([w / total for w in weights])
+    assert all(0.0 <= p <= 1.0 for p in prob)
+
+
+def test_parse_members():
+    assert parse_members(["duck:3 ", "fox"]) == {"duck": 3, "fox": 1}
+    assert parse_members(["duck:3, fox:1,"]) == {"duck": 3, "fox": 1}
+    with pytest.raises(ValueError):
+        parse_members(["duck:0"])
+    with pytest.raises(ValueError):
+        parse_members([" , "])
+
+
+@pytest.fixture
+def config_mgr(tmp_path):
+    return ConfigManager(home=tmp_path)
+
+
+def test_pick_unknown_pool_and_strategy(config_mgr):
+    manager = PoolManager(config_mgr)
+    with pytest.raises(KeyError):
+        manager.pick("claude", "missing")
+    config_mgr.set_pool("claude", "fast", {"duck": 1})
+    with pytest.raises(ValueError):
+        manager.pick("claude", "fast", "random")
+
+
+def test_weighted_pick_follows_weights(config_mgr):
+    config_mgr.set_pool("claude", "fast", {"duck": 3, "fox": 1})
+    manager = PoolManager(config_mgr)
+    random.seed(1)
+    picks = [manager.pick("claude", "fast") for _ in range(400)]
+    assert 250 < picks.count("duck") < 350
+
+
+def test_lru_rotates_members(config_mgr):
+    config_mgr.set_pool("codex", "all", {"a": 1, "b": 5, "c": 1}, strategy="lru")
+    manager = PoolManager(config_mgr)
+    assert [manager.pick("codex", "all") for _ in range(4)] == ["a", "b", "c", "a"]
+
+
+def test_least_failures_prefers_oldest_failure(config_mgr, monkeypatch):
+    config_mgr.set_pool("claude", "fast", {"a": 1, "b": 1, "c": 1}, strategy="least-failures")
+    manager = PoolManager(config_mgr)
+    now = [1000.0]
+    monkeypatch.setattr(pools_module.time, "time", lambda: now[0])
+
+    manager.record_failure("claude", "a")
+    now[0] = 2000.0
+    manager.record_failure("claude", "b")
+
+    # 从未失败的 c 优先，其次是失败时间最早的 a
+    assert manager.pick("claude", "fast") == "c"
+    now[0] = 3000.0
+    manager.record_failure("claude", "c")
+    assert manager.pick("claude", "fast") == "a"
+
+
+def test_alias_table_rebuilt_only_when_members_change(config_mgr):
+    config_mgr.set_pool("claude", "fast", {"a": 1, "b": 1}, strategy="lru")
+    manager = PoolManager(config_mgr)
+    manager.pick("claude", "fast")
+    state = json.loads(manager.state_file.read_text())
+    digest = state["claude/fast"]["hash"]
+
+    # 只修改策略不会重建
+    config_mgr.set_pool("claude", "fast", {"a": 1, "b": 1}, strategy="weighted")
+    manager.pick("claude", "fast", "lru")
+    assert json.loads(manager.state_file.read_text())["claude/fast"]["hash"] == digest
+
+    # 成员变化时重建，并保留仍在池中成员的使用顺序
+    config_mgr.set_pool("claude", "fast", {"b": 1, "c": 2}, strategy="lru")
+    assert manager.pick("claude", "fast") == "b"
+    compiled = json.loads(manager.state_file.read_text())["claude/fast"]
+    assert compiled["hash"] != digest
+    assert compiled["members"] == ["b", "c"]
+    assert compiled["order"] == ["c", "b"]
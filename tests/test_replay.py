@@ -0,0 +1,177 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from claude_switcher.replay import ReplayServer, ReplayStore, decode_entry, encode_entry, request_key
+
+
+def test_request_key_normalisation():
+    base = request_key("POST", "/v1/messages?b=2&a=1", b'{"model": "m", "max_tokens": 5}')
+    assert request_key("post", "/v1/messages/?a=1&b=2", b'{"max_tokens":5,"model":"m"}') == base
+    # 忽略的字段不参与计算
+    assert request_key("POST", "/v1/messages?a=1&b=2",
+                       b'{"model":"m","max_tokens":5,"metadata":{"user_id":"x"},"user":"u"}') == base
+
+
+def test_request_key_differences():
+    base = request_key("POST", "/v1/messages", b'{"model":"m"}')
+    assert request_key("GET", "/v1/messages", b'{"model":"m"}') != base
+    assert request_key("POST", "/v1/complete", b'{"model":"m"}') != base
+    assert request_key("POST", "/v1/messages?a=1", b'{"model":"m"}') != base
+    assert request_key("POST", "/v1/messages", b'{"model":"n"}') != base
+    assert request_key("POST", "/v1/messages", b'{"model":"m","metadata":1}', ignored=()) != base
+
+
+def test_request_key_non_json_body():
+    assert request_key("POST", "/", b"not json") == request_key("POST", "/", b"not json")
+    assert request_key("POST", "/", b"not json") != request_key("POST", "/", b"not  json")
+    assert request_key("GET", "/", b"") == request_key("GET", "/", b"")
+
+
+def test_encode_decode_entry():
+    data = encode_entry(200, {"Content-Type": "application/json"}, b'{"ok":true}')
+    assert decode_entry(data) == (200, {"Content-Type": "application/json"}, b'{"ok":true}')
+
+
+def test_store_round_trip_and_reopen(tmp_path):
+    store = ReplayStore(tmp_path, max_bytes=1024)
+    store.put("a", b"alpha")
+    store.put("b", b"beta")
+    store.put("a", b"alpha2")
+    assert store.get("a") == b"alpha2"
+    assert store.get("missing") is None
+    assert len(store) == 2
+    assert store.live_bytes == len(b"alpha2") + len(b"beta")
+    store.close()
+
+    reopened = ReplayStore(tmp_path, max_bytes=1024)
+    assert reopened.get("a") == b"alpha2"
+    assert reopened.get("b") == b"beta"
+    reopened.close()
+
+
+def test_store_evicts_least_recently_used(tmp_path):
+    store = ReplayStore(tmp_path, max_bytes=30)
+    store.put("a", b"a" * 10)
+    store.put("b", b"b" * 10)
+    store.put("c", b"c" * 10)
+    assert store.get("a") == b"a" * 10  # a 变为最近使用
+
+    store.put("d", b"d" * 10)
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.get("c") is not None
+    assert store.live_bytes == 30
+
+    # 超过上限的单个响应不录制
+    store.put("big", b"x" * 31)
+    assert store.get("big") is None
+    assert len(store) == 3
+    store.close()
+
+
+def test_store_keeps_recency_across_reopen(tmp_path):
+    store = ReplayStore(tmp_path, max_bytes=20)
+    store.put("a", b"a" * 10)
+    store.put("b", b"b" * 10)
+    store.get("a")
+    store.close()
+
+    store = ReplayStore(tmp_path, max_bytes=20)
+    store.put("c", b"c" * 10)
+    assert store.get("b") is None
+    assert store.get("a") == b"a" * 10
+    store.close()
+
+
+def test_store_compacts_data_file(tmp_path):
+    store = ReplayStore(tmp_path, max_bytes=30)
+    for i in range(10):
+        store.put(f"k{i}", bytes([65 + i]) * 10)
+    # 数据文件超过上限的两倍时压缩，只保留有效条目
+    assert store.data_file.stat().st_size <= 60
+    assert [store.get(f"k{i}") for i in range(7, 10)] == [b"H" * 10, b"I" * 10, b"J" * 10]
+    assert store.get("k0") is None
+    store.close()
+
+    reopened = ReplayStore(tmp_path, max_bytes=30)
+    assert reopened.get("k9") == b"J" * 10
+    reopened.close()
+
+
+def test_store_ignores_truncated_index_entries(tmp_path):
+    store = ReplayStore(tmp_path, max_bytes=1024)
+    store.put("a", b"alpha")
+    store.close()
+    entries = json.loads((tmp_path / "index.json").read_text())
+    entries.append(["b", 5, 100])
+    (tmp_path / "index.json").write_text(json.dumps(entries))
+
+    reopened = ReplayStore(tmp_path, max_bytes=1024)
+    assert len(reopened) == 1
+    assert reopened.get("a") == b"alpha"
+    reopened.close()
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls = 0
+
+    def do_POST(self):
+        type(self).calls += 1
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"n": type(self).calls}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def upstream():
+    _Upstream.calls = 0
+    server = _serve(HTTPServer(("127.0.0.1", 0), _Upstream))
+    yield f"http://127.0.0.1:{server.server_address[1]}/api"
+    server.shutdown()
+    server.server_close()
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.headers["X-Vibe-Replay"], json.loads(response.read())
+
+
+def test_server_records_then_replays(tmp_path, upstream):
+    store = ReplayStore(tmp_path)
+    server = _serve(ReplayServer("127.0.0.1", 0, upstream, store, mode="auto"))
+    try:
+        url = server.base_url + "/v1/messages"
+        assert _post(url, {"model": "m", "metadata": {"user_id": "1"}}) == ("forwarded", {"n": 1})
+        assert _post(url, {"metadata": {"user_id": "2"}, "model": "m"}) == ("hit", {"n": 1})
+        assert _Upstream.calls == 1
+
+        server.mode = "replay"
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _post(url, {"model": "other"})
+        assert excinfo.value.code == 404
+        assert server.counters == {"hit": 1, "miss": 1, "forwarded": 1, "recorded": 1}
+    finally:
+        server.shutdown()
+        server.server_close()
+        store.close()
@@ -0,0 +1,97 @@
+from claude_switcher.codex import CodexConfigManager
+from claude_switcher.rules import load_rules
+
+
+def _settings(tmp_path, name, provider, overrides=None):
+    codex = CodexConfigManager(home=tmp_path)
+    codex.use_rules(overrides)
+    provider = dict(provider)
+    return codex._prepare_provider_settings(name, provider), provider
+
+
+def test_load_rules_is_cached():
+    assert load_rules() is load_rules()
+    assert load_rules({"aliases": {"d": "duck"}}) is not load_rules()
+
+
+def test_duck_rule(tmp_path):
+    settings, _ = _settings(tmp_path, "duck", {"base_url": "https://duck/v1", "env_key": "X",
+                                               "requires_openai_auth": False})
+    assert settings["requires_openai_auth"] is True
+    assert settings["disable_response_storage"] is True
+    assert settings["network_access"] == "enabled"
+    assert settings["env_key"] is None
+    assert settings["auth_keys"] == {"OPENAI_API_KEY": "api_key"}
+
+    settings, _ = _settings(tmp_path, "duck", {"base_url": "https://duck/v1", "network_access": "disabled"})
+    assert settings["network_access"] == "disabled"
+
+
+def test_duck_rule_matches_model_provider(tmp_path):
+    settings, _ = _settings(tmp_path, "mirror", {"base_url": "https://m/v1", "model_provider": "duck"})
+    assert settings["model_provider"] == "duck"
+    assert settings["network_access"] == "enabled"
+
+
+def test_yescode_rule_via_alias(tmp_path):
+    settings, provider = _settings(tmp_path, "yes", {"base_url": "https://wrong/v1", "network_access": "enabled",
+                                                     "requires_openai_auth": True})
+    assert settings["model_provider"] == "yescode"
+    assert settings["requires_openai_auth"] is None
+    assert settings["disable_response_storage"] is None
+    assert settings["network_access"] is None
+    assert settings["env_key"] == "YESCODE_API_KEY"
+    assert settings["auth_keys"] == {"OPENAI_API_KEY": "api_key", "YESCODE_API_KEY": "api_key"}
+    # 强制的 base_url 写回中转商配置
+    assert provider["base_url"] == "https://cotest.yes.vg/v1"
+
+
+def test_yescode_rule_extends_custom_auth_keys(tmp_path):
+    settings, _ = _settings(tmp_path, "yescode", {"base_url": "https://x/v1", "auth_keys": {"EXTRA": "api_key"}})
+    assert settings["auth_keys"] == {"EXTRA": "api_key", "OPENAI_API_KEY": "api_key",
+                                     "YESCODE_API_KEY": "api_key"}
+
+
+def test_earlier_rule_wins_when_name_and_model_provider_differ(tmp_path):
+    settings, _ = _settings(tmp_path, "yes", {"base_url": "https://x/v1", "model_provider": "duck"})
+    assert settings["model_provider"] == "duck"
+    assert settings["requires_openai_auth"] is True
+    assert settings["env_key"] is None
+
+
+def test_unmatched_provider_keeps_its_settings(tmp_path):
+    settings, provider = _settings(tmp_path, "fox", {"base_url": "https://fox/v1", "requires_openai_auth": True,
+                                                     "disable_response_storage": True})
+    assert settings["model_provider"] == "fox"
+    assert settings["requires_openai_auth"] is True
+    assert settings["network_access"] is None
+    assert settings["auth_keys"] == {"OPENAI_API_KEY": "api_key"}
+    assert provider["base_url"] == "https://fox/v1"
+
+
+def test_user_overrides(tmp_path):
+    overrides = {
+        "aliases": {"f": "fox"},
+        "rules": {"fox": {"defaults": {"network_access": "enabled"}, "auth_keys": ["FOX_KEY"]}},
+    }
+    settings, _ = _settings(tmp_path, "f", {"base_url": "https://fox/v1"}, overrides)
+    assert settings["model_provider"] == "fox"
+    assert settings["network_access"] == "enabled"
+    assert settings["auth_keys"] == {"FOX_KEY": "api_key"}
+
+
+def test_rendered_config_for_duck(tmp_path):
+    codex = CodexConfigManager(home=tmp_path)
+    toml = codex.generate_config_toml("duck", {"base_url": "https://jp.duckcoding.com/v1", "wire_api": "responses"})
+    assert 'network_access = "enabled"' in toml
+    assert 'disable_response_storage = true' in toml
+    assert 'base_url = "https://jp.duckcoding.com/v1"' in toml
+    assert "env_key" not in toml
+
+
+def test_request_settings_follow_rules(tmp_path):
+    codex = CodexConfigManager(home=tmp_path)
+    provider = {"base_url": "https://mine/v1", "model": "gpt-5", "wire_api": "chat"}
+    assert codex.request_settings("yes", provider) == {
+        "base_url": "https://cotest.yes.vg/v1", "model": "gpt-5", "wire_api": "chat"}
+    assert provider["base_url"] == "https://mine/v1"
@@ -0,0 +1,122 @@
+import os
+import stat
+
+import pytest
+
+from claude_switcher.fileutil import atomic_write
+from claude_switcher.shell import BLOCK_HEADER, FISH_TARGET, ShellConfigManager
+
+
+@pytest.fixture
+def shell(tmp_path):
+    return ShellConfigManager(home=tmp_path)
+
+
+def test_render_block():
+    assert ShellConfigManager.render_block("tok", "https://a") == (
+        f'{BLOCK_HEADER}\n'
+        'export ANTHROPIC_AUTH_TOKEN="tok"\n'
+        'export ANTHROPIC_BASE_URL="https://a"\n'
+    )
+    assert ShellConfigManager.render_block("tok", "https://a", "fish") == (
+        f'{BLOCK_HEADER}\n'
+        'set -gx ANTHROPIC_AUTH_TOKEN "tok"\n'
+        'set -gx ANTHROPIC_BASE_URL "https://a"\n'
+    )
+
+
+def test_replace_block_replaces_old_configuration(shell):
+    content = (
+        'alias ll="ls -l"\n'
+        f'{BLOCK_HEADER}\n'
+        'export ANTHROPIC_AUTH_TOKEN="old"\n'
+        'export ANTHROPIC_BASE_URL="https://old"\n'
+        'export PATH="$HOME/bin:$PATH"\n'
+    )
+    block = shell.render_block("new", "https://new")
+
+    result = shell.replace_block(content, block)
+
+    assert result == 'alias ll="ls -l"\nexport PATH="$HOME/bin:$PATH"\n\n' + block
+    assert "old" not in result
+    # 重复替换结果不变
+    assert shell.replace_block(result, block) == result
+
+
+def test_replace_block_on_empty_file(shell):
+    block = shell.render_block("tok", "https://a")
+    assert shell.replace_block("", block) == "\n" + block
+    assert shell.replace_block("\n\n", block) == "\n" + block
+
+
+def test_render_all_targets(shell, tmp_path):
+    (tmp_path / ".zshrc").write_text("# zsh\n")
+    (tmp_path / ".profile").write_text('export ANTHROPIC_AUTH_TOKEN="old"\n')
+    (tmp_path / ".config" / "fish").mkdir(parents=True)
+
+    rendered = shell.render_all_targets("tok", "https://a")
+
+    fish_path = tmp_path / FISH_TARGET
+    assert set(rendered) == {tmp_path / ".zshrc", tmp_path / ".profile", fish_path}
+    assert rendered[tmp_path / ".zshrc"] == "# zsh\n\n" + shell.render_block("tok", "https://a")
+    assert rendered[tmp_path / ".profile"] == "\n" + shell.render_block("tok", "https://a")
+    assert rendered[fish_path] == shell.render_block("tok", "https://a", "fish")
+    # 渲染不修改任何文件
+    assert not fish_path.exists()
+
+
+def test_update_targets_writes_and_backs_up(shell, tmp_path, capsys):
+    (tmp_path / ".zshrc").write_text("# zsh\n")
+    (tmp_path / ".bashrc").write_text("# bash\n")
+    (tmp_path / ".config" / "fish").mkdir(parents=True)
+
+    assert shell.update_targets(shell.render_all_targets("tok", "https://a")) is True
+
+    assert shell.show_current_config(tmp_path / ".zshrc") == ("tok", "https://a")
+    assert shell.show_current_config(tmp_path / ".bashrc") == ("tok", "https://a")
+    assert shell.show_current_config(tmp_path / FISH_TARGET) == ("tok", "https://a")
+    assert len(list(tmp_path.glob(".zshrc.claude_switcher_backup_*"))) == 1
+    assert "已更新 3/3 个 shell 配置文件" in capsys.readouterr().out
+
+
+def test_update_targets_reports_failures(shell, tmp_path, capsys):
+    (tmp_path / ".zshrc").write_text("# zsh\n")
+    rendered = shell.render_all_targets("tok", "https://a")
+    rendered[tmp_path / ".zshrc" / "not-a-dir"] = "x"
+
+    assert shell.update_targets(rendered) is False
+    assert "已更新 1/2 个 shell 配置文件" in capsys.readouterr().out
+    assert shell.update_targets({}) is False
+
+
+def test_single_target_switch_prefers_zshrc(shell, tmp_path, capsys):
+    (tmp_path / ".zshrc").write_text("# zsh\n")
+    (tmp_path / ".bashrc").write_text("# bash\n")
+
+    assert shell.switch("duck", {"base_url": "https://a"}, "tok") is True
+
+    assert shell.current() == {"base_url": "https://a", "credential": "tok"}
+    assert (tmp_path / ".bashrc").read_text() == "# bash\n"
+
+
+def test_atomic_write_keeps_symlink_and_mode(tmp_path):
+    target = tmp_path / "dotfiles" / "zshrc"
+    target.parent.mkdir()
+    target.write_text("old")
+    os.chmod(target, 0o640)
+    link = tmp_path / ".zshrc"
+    link.symlink_to(target)
+
+    atomic_write(link, "new")
+
+    assert link.is_symlink()
+    assert target.read_text() == "new"
+    assert stat.S_IMODE(target.stat().st_mode) == 0o640
+    assert [path.name for path in target.parent.iterdir()] == ["zshrc"]
+
+
+def test_atomic_write_explicit_mode(tmp_path):
+    path = tmp_path / "nested" / "secret.json"
+    atomic_write(path, b"{}", mode=0o600)
+    assert path.read_bytes() == b"{}"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
@@ -0,0 +1,131 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from claude_switcher.backends import load_backend_class
+from claude_switcher.config import ConfigManager
+from claude_switcher.sync import RegistrySync, entry_hash
+
+
+@pytest.fixture
+def config_mgr(tmp_path):
+    return ConfigManager(home=tmp_path)
+
+
+def _write_registry(path, registry):
+    path.write_text(json.dumps(registry), encoding="utf-8")
+
+
+def test_entry_hash_ignores_key_order():
+    assert entry_hash({"a": 1, "b": 2}) == entry_hash({"b": 2, "a": 1})
+    assert entry_hash({"a": 1}) != entry_hash({"a": 2})
+
+
+def test_plan_keeps_local_credentials(config_mgr):
+    config_mgr.update_provider_entries({"providers": {"fox": {"token": "local", "base_url": "https://old"}}})
+    registry = {"providers": {
+        "fox": {"token": "remote", "base_url": "https://new"},
+        "team": {"base_url": "https://team"},
+    }}
+
+    updates, removals, hashes = RegistrySync(config_mgr).plan(registry, {}, prune=False)
+
+    assert updates["providers"]["fox"] == {"token": "local", "base_url": "https://new"}
+    assert updates["providers"]["team"] == {"base_url": "https://team", "token": ""}
+    assert removals == {}
+    assert set(hashes["providers"]) == {"fox", "team"}
+
+
+def test_plan_skips_unchanged_entries_and_prunes(config_mgr):
+    config_mgr.update_provider_entries({"providers": {
+        "old": {"token": "", "base_url": "https://old"},
+        "team": {"token": "t", "base_url": "https://team"},
+    }})
+    registry = {"providers": {"team": {"base_url": "https://team"}}}
+    previous = {"providers": {"team": entry_hash(registry["providers"]["team"]), "old": "x", "gone": "y"}}
+
+    updates, removals, _ = RegistrySync(config_mgr).plan(registry, previous, prune=True)
+
+    assert updates == {}
+    # 只删除之前由同步引入且本地仍存在的条目
+    assert removals == {"providers": ["old"]}
+
+
+def test_plan_prune_keeps_current_provider(config_mgr):
+    config_mgr.update_provider_entries({"providers": {"old": {"token": "", "base_url": "https://old"}}})
+    config_mgr.set_backend_current(load_backend_class("claude"), "old")
+
+    _, removals, _ = RegistrySync(config_mgr).plan({"providers": {}}, {"providers": {"old": "x"}}, prune=True)
+
+    assert removals == {}
+
+
+def test_sync_local_file_skips_when_unchanged(config_mgr, tmp_path):
+    source = tmp_path / "registry.json"
+    _write_registry(source, {"codex_providers": {"team": {"base_url": "https://team/v1"}}})
+    sync = RegistrySync(config_mgr)
+
+    result = sync.sync(str(source))
+    assert result == {"changed": True, "updated": ["codex_providers/team"], "removed": []}
+    assert config_mgr.get_codex_provider("team") == {"base_url": "https://team/v1", "api_key": ""}
+
+    assert sync.sync(str(source))["changed"] is False
+    assert sync.sync(str(source), force=True) == {"changed": True, "updated": [], "removed": []}
+
+
+class _RegistryHandler(BaseHTTPRequestHandler):
+    body = b""
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def registry_server():
+    _RegistryHandler.requests = []
+    server = HTTPServer(("127.0.0.1", 0), _RegistryHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/registry.json"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_url_uses_etag(config_mgr, registry_server):
+    _RegistryHandler.body = json.dumps({"providers": {"team": {"base_url": "https://team"}}}).encode()
+    sync = RegistrySync(config_mgr, timeout=5)
+
+    assert sync.sync(registry_server)["updated"] == ["providers/team"]
+    assert sync.sync(registry_server)["changed"] is False
+    assert _RegistryHandler.requests == [None, '"v1"']
+
+
+def test_sync_keeps_hashes_for_missing_sections(config_mgr, tmp_path):
+    source = tmp_path / "registry.json"
+    sync = RegistrySync(config_mgr)
+    _write_registry(source, {"providers": {"team": {"base_url": "https://team"}},
+                             "codex_providers": {"team": {"base_url": "https://team/v1"}}})
+    sync.sync(str(source))
+
+    _write_registry(source, {"providers": {}})
+    assert sync.sync(str(source), prune=True, force=True)["removed"] == ["providers/team"]
+
+    _write_registry(source, {"codex_providers": {}})
+    assert sync.sync(str(source), prune=True, force=True)["removed"] == ["codex_providers/team"]
+    assert config_mgr.get_codex_provider("team") is None